@@ -1,7 +1,6 @@
 from __future__ import print_function
 from lxml import etree as ET
 import os
-import pkg_resources as pkg
 
 from pygcam.config import getConfigDict
 from pygcam.log import getLogger
@@ -116,6 +115,8 @@ class XMLFile(object):
         if not self.schemaPath:
             return True
 
+        import pkg_resources as pkg     # lazy import to speed startup
+
         tree = self.tree
 
         # ensure that the entire directory has been extracted so that 'xs:include' works
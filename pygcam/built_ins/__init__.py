@@ -1,20 +1,22 @@
-from .chart_plugin import ChartCommand
-from .config_plugin import ConfigCommand
-from .diff_plugin import DiffCommand
-from .gcam_plugin import GcamCommand
-from .gui_plugin import GUICommand
-from .init_plugin import InitCommand
-from .mcs_plugin import MCSCommand
-from .mi_plugin import ModelInterfaceCommand
-from .new_plugin import NewProjectCommand
-from .protect_plugin import ProtectLandCommand
-from .query_plugin import QueryCommand
-from .run_plugin import RunCommand
-from .sandbox_plugin import SandboxCommand
-from .setup_plugin import SetupCommand
-from .compare_plugin import CompareCommand
+# The built-in sub-commands, as (module, class) pairs. The modules are imported
+# only when the sub-command is run (or help is requested); see pygcam.pluginIndex.
+#
+# For now, these are not offered as command-line options. Needs more testing:
+# ('bioConstraint_plugin', 'BioConstraintsCommand'), ('deltaConstraint_plugin', 'DeltaConstraintsCommand')
 
-BuiltinSubcommands = [ChartCommand, CompareCommand, ConfigCommand, DiffCommand,
-                      GcamCommand, GUICommand, InitCommand, MCSCommand,
-                      ModelInterfaceCommand, NewProjectCommand, ProtectLandCommand,
-                      QueryCommand, RunCommand, SandboxCommand, SetupCommand]
+BuiltinSubcommands = [('chart_plugin',     'ChartCommand'),
+                      ('compare_plugin',   'CompareCommand'),
+                      ('config_plugin',    'ConfigCommand'),
+                      ('diff_plugin',      'DiffCommand'),
+                      ('gcam_plugin',      'GcamCommand'),
+                      ('gui_plugin',       'GUICommand'),
+                      ('init_plugin',      'InitCommand'),
+                      ('mcs_plugin',       'MCSCommand'),
+                      ('mi_plugin',        'ModelInterfaceCommand'),
+                      ('new_plugin',       'NewProjectCommand'),
+                      ('protect_plugin',   'ProtectLandCommand'),
+                      ('query_plugin',     'QueryCommand'),
+                      ('run_plugin',       'RunCommand'),
+                      ('sandbox_plugin',   'SandboxCommand'),
+                      ('setup_plugin',     'SetupCommand'),
+                      ('xmlStore_plugin',  'XmlStoreCommand')]
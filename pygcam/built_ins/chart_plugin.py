@@ -55,8 +55,9 @@ class ChartCommand(SubcommandABC):
         parser.add_argument('-C', '--constraint',
                             help='''Apply a constraint to limit the rows of data to plot. The constraint
                             can be any constraint string that is valid for the DataFrame.query() method,
-                            e.g., -C 'input == "biomass"'
-                            ''')
+                            e.g., -C 'input == "biomass"'. Constraints comparing columns to quoted
+                            strings with "==" or "!=", joined by "and", are applied without evaluating
+                            the string for each row.''')
 
         parser.add_argument('-d', '--outputDir', default=".",
                             help='''The directory into which to write image files. Default is "."''')
@@ -73,6 +74,13 @@ class ChartCommand(SubcommandABC):
                             These are read as if chartGCAM.py were called on each line individually,
                             but avoiding the ~2 sec startup time for the bigger python packages.''')
 
+        parser.add_argument('--force', action="store_true",
+                            help='''Render charts even if they are up to date. By default, a chart is
+                            rendered only if the contents of its CSV file, its arguments, or the values of
+                            unit conversions it uses have changed since the image files were last created.
+                            Keys identifying the rendered charts are stored in the subdirectory ".chartCache"
+                            of the output directory.''')
+
         group2.add_argument('-F', '--divisorFile',
                             help='''A file containing a floating point value to divide data by
                             before plotting. See also -V.''')
@@ -92,6 +100,11 @@ class ChartCommand(SubcommandABC):
                             help='''A column to use as the index column, or blank for None. This column
                             is displayed on the X-axis of stacked barcharts. Default value is "region".''')
 
+        parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help='''The number of processes to use to render charts. With --fromFile,
+                            charts are grouped by the CSV file they plot, which is read only once. Otherwise,
+                            with --byRegion, the per-region charts are rendered concurrently. Default is 1.''')
+
         parser.add_argument('-k', '--yticks', action="store_true",
                             help="Show tick marks on Y-axis. Default is no tick marks.")
 
@@ -16,6 +16,12 @@ class DiffCommand(SubcommandABC):
                     as the reference file whose time-series data is subtracted from that of each other
                     file. If missing, ".csv" suffixes are added to all arguments (the ".csv" is optional).''')
 
+        parser.add_argument('-a', '--all', action="store_true",
+                            help='''Compute differences for all queries whose results are found in the
+                            baseline's query results directory. As with --queryFile, the positional arguments
+                            must be the baseline name followed by one or more policy names. Each baseline result
+                            is read just once for all policies.''')
+
         parser.add_argument('-D', '--workingDir', default='.',
                             help='''The directory to change to before performing any operations''')
 
@@ -27,6 +33,12 @@ class DiffCommand(SubcommandABC):
         parser.add_argument('-i', '--interpolate', action="store_true",
                             help="Interpolate (linearly) annual values between timesteps.")
 
+        parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help='''With --queryFile or --all, the number of processes to use to compute
+                            differences for different queries in parallel. With --convertOnly, the number
+                            of processes used to read and prepare CSV files while the workbook is written.
+                            Default is 1.''')
+
         parser.add_argument('-o', '--outFile', default='differences.csv',
                             help='''The name of the ".csv" or ".xlsx" file containing the differences
                             between each scenario and the reference. Default is "differences.csv".''')
@@ -39,8 +51,8 @@ class DiffCommand(SubcommandABC):
                             holding a list of queries to run, with optional mappings specified to rewrite output.
                             This file has the same structure as the <queries> element in project.xml. If the file
                             doesn't end in ".xml", it must be a text file listing the names of queries to process,
-                            one per line. NOTE: When --queryFile is specified, the two positional arguments are
-                            required: the names of the baseline and policy scenarios, in that order.''')
+                            one per line. NOTE: When --queryFile is specified, the positional arguments must be
+                            the names of the baseline and one or more policy scenarios, in that order.''')
 
         parser.add_argument('-r', '--rewriteSetsFile',
                             help='''An XML file defining query maps by name (default taken from
@@ -48,6 +48,12 @@ class QueryCommand(SubcommandABC):
                             help='''The scenario group directory name, if any. Used with to compute default
                             for --workspace argument.''')
 
+        parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help='''The maximum number of scenarios to query concurrently, each using
+                            a separate ModelInterface process. The number of concurrent processes is
+                            further limited by the memory each requires, per the -Xmx flag in config
+                            variable GCAM.MI.JavaArgs. Default is 1.''')
+
         parser.add_argument('-n', '--noRun', action="store_true",
                             help="Show the command to be run, but don't run it")
 
@@ -78,7 +84,10 @@ class QueryCommand(SubcommandABC):
 
         parser.add_argument('-s', '--scenario', default='Reference',
                             help='''The scenario to run the query/queries for (default is "Reference")
-                                    Note that this must refers to a scenarios in the XML database.''')
+                                    Note that this must refers to a scenarios in the XML database.
+                                    Multiple scenarios can be given as a comma-delimited list, in
+                                    which case each is queried in its own workspace, as per the
+                                    --workspace and --xmldb flags. See also --jobs.''')
 
         parser.add_argument('-S', '--rewriteSetsFile',
                             help='''An XML file defining query maps by name (default taken from
@@ -32,6 +32,10 @@ class RunCommand(SubcommandABC):
                             variable GCAM.ProjectXmlFile, if defined, otherwise the default
                             is './project.xml'.''')
 
+        parser.add_argument('--force', action='store_true',
+                            help='''Run the requested steps even if their outputs are up to date. (See
+                            the "inputs" and "outputs" attributes of <step> in project.xml.)''')
+
         parser.add_argument('-g', '--group',
                             help='''The name of the scenario group to process. If not specified,
                             the group with attribute default="1" is processed.''')
@@ -39,6 +43,12 @@ class RunCommand(SubcommandABC):
         parser.add_argument('-G', '--listGroups', action='store_true',
                             help='''List the scenario groups defined in the project file and exit.''')
 
+        parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help='''Run up to the given number of scenarios at once on this computer,
+                            each in its own "gt" process writing to {GCAM.BatchLogDir}/{scenario}.log.
+                            If the baseline is among the scenarios, it is run first. Default is 1,
+                            i.e., run scenarios one after another in this process. Ignored with -D.''')
+
         parser.add_argument('-k', '--skipStep', dest='skipSteps', action='append',
                             help='''Steps to skip. These must be names of steps defined in the
                             project.xml file. Multiple steps can be given in a single (comma-delimited)
@@ -61,6 +71,13 @@ class RunCommand(SubcommandABC):
         parser.add_argument('-n', '--noRun', action='store_true',
                             help='''Display the commands that would be run, but don't run them.''')
 
+        parser.add_argument('--profile', nargs='?', const='', metavar='FILE',
+                            help='''Record the wall time, CPU time (of gt and of the programs it runs),
+                            peak memory use, and exit status of each step run for each scenario. Writes
+                            these to the given JSON file (default is
+                            {GCAM.BatchLogDir}/profile-{date}-{time}.json) and prints a summary table
+                            when the run ends.''')
+
         parser.add_argument('-q', '--noQuit', action='store_true',
                             help='''Don't quit if an error occurs when processing a scenario, just
                             move on to processing the next scenario, if any.''')
@@ -20,6 +20,10 @@ class SetupCommand(SubcommandABC):
         group1 = parser.add_mutually_exclusive_group()  # --dynamicOnly, --staticOnly
         group2 = parser.add_mutually_exclusive_group()  # --modulePath, --moduleSpec, --setupXml
 
+        parser.add_argument('-a', '--allScenarios', action='store_true',
+                            help='''Set up all active scenarios in the scenario group (see -g) defined in
+                            the scenario setup XML file. Use -j to set up several at once.''')
+
         parser.add_argument('-b', '--baseline',
                             help='''Identify the baseline the selected scenario is based on.
                                  Note: at least one of --baseline (-b) / --scenario (-s) must be used.''')
@@ -29,7 +33,11 @@ class SetupCommand(SubcommandABC):
                             help='''Generate only dynamic XML for dyn-xml: don't create static XML.''')
 
         parser.add_argument('-f', '--forceCreate', action='store_true',
-                            help='''Re-create the workspace, even if it already exists.''')
+                            help='''Re-create the workspace, even if it already exists. Implies --force.''')
+
+        parser.add_argument('--force', action='store_true',
+                            help='''Regenerate static XML files even if the scenario's inputs are unchanged
+                            since they were last generated. See config variable GCAM.IncrementalSetup.''')
 
         parser.add_argument('-g', '--group',
                             help='The scenario group to process. Defaults to the group labeled default="1".')
@@ -40,6 +48,11 @@ class SetupCommand(SubcommandABC):
                             If --useGroupDir is specified, srcGroupDir defaults to the scenario group name.
                             Using --srcGroupDir implies --useGroupDir.''')
 
+        parser.add_argument('-j', '--jobs', type=int, default=1,
+                            help='''The number of scenarios to set up at once, each in its own process,
+                            when setting up more than one scenario (see -a and -s). Policy scenarios are
+                            set up after the baseline they build on. Default is 1.''')
+
         # mutually exclusive with --moduleSpec and --setupXml
         group2.add_argument('-m', '--modulePath',
                             help='''The path to a scenario definition module. See -M flag for more info.''')
@@ -63,8 +76,9 @@ class SetupCommand(SubcommandABC):
                             help='The parent directory holding the GCAM output workspaces')
 
         parser.add_argument('-s', '--scenario',
-                            help='''Identify the scenario to run.
-                            Note: at least one of --baseline (-b) / --scenario (-s) must be used.''')
+                            help='''Identify the scenario to run, or a comma-delimited list of scenarios
+                            to set up (see -j). Note: at least one of --baseline (-b) / --scenario (-s) must
+                            be used, unless --allScenarios (-a) is specified.''')
 
         parser.add_argument('-S', '--subdir', default="",
                             help='A sub-directory to use instead of scenario name')
@@ -99,89 +113,12 @@ class SetupCommand(SubcommandABC):
 
 
     def run(self, args, tool):
-        import os
-        from importlib import import_module
-
-        from ..config import getParam
-        from ..error import SetupException
-        from ..log import getLogger
-        from ..scenarioSetup import createSandbox
-        from ..utils import loadModuleFromPath, pathjoin
-
-        _logger = getLogger(__name__)
-
-        scenario = args.scenario or args.baseline
-        if not scenario:
-            raise SetupException('At least one of --baseline (-b) / --scenario (-s) must be used.')
-
-        projectDir = getParam('GCAM.ProjectDir')
-        groupName = args.group if args.useGroupDir else ''
-        srcGroupDir = args.srcGroupDir or groupName
-
-        if args.workspace:
-            workspace = args.workspace
-        else:
-            groupDir  = os.path.normpath(pathjoin(projectDir, groupName))
-            workspace = pathjoin(groupDir, scenario)
+        from ..scenarioSetup import setupScenario, setupScenarios
 
         mcsMode = tool.getMcsMode()
-        forceCreate = args.forceCreate or bool(mcsMode)
-
-        if not mcsMode or mcsMode == 'trial':
-            createSandbox(workspace, srcWorkspace=args.refWorkspace, forceCreate=forceCreate, mcsMode=mcsMode)
-
-        xmlSourceDir = args.xmlSourceDir or getParam('GCAM.XmlSrc')
-
-        # If a setup XML file is defined, use the defined (or default) XMLEditor subclass
-        setupXml = args.setupXml or getParam('GCAM.ScenarioSetupFile')
-        if setupXml:
-            from ..xmlSetup import createXmlEditorSubclass
-            _logger.debug('Setup using %s, mcsMode=%s', setupXml, mcsMode)
-            scenClass = createXmlEditorSubclass(setupXml, mcsMode=mcsMode)
+        scenarios = args.scenario.split(',') if args.scenario else []
 
+        if args.allScenarios or len(scenarios) > 1:
+            setupScenarios(args, scenarios=scenarios, jobs=args.jobs, mcsMode=mcsMode)
         else:
-            # If neither is defined, we assume a custom scenarios.py file is used
-            try:
-                if args.moduleSpec:
-                    module = import_module(args.moduleSpec, package=None)
-                else:
-                    modulePath = args.modulePath or pathjoin(xmlSourceDir, srcGroupDir, 'scenarios.py')
-                    _logger.debug('Setup using %s', modulePath)
-                    module = loadModuleFromPath(modulePath)
-
-            except Exception as e:
-                moduleName = args.moduleSpec or modulePath
-                raise SetupException('Failed to load scenarioMapper or ClassMap from module %s: %s' % (moduleName, e))
-
-            try:
-                # First look for a function called scenarioMapper
-                scenarioMapper = getattr(module, 'scenarioMapper', None)
-                if scenarioMapper:
-                    scenClass = scenarioMapper(scenario)
-
-                else:
-                    # Look for 'ClassMap' in the specified module
-                    classMap  = getattr(module, 'ClassMap')
-                    scenClass = classMap[scenario]
-
-            except KeyError:
-                raise SetupException('Failed to map scenario "%s" to a class in %s' % (scenario, module.__file__))
-
-        subdir = args.subdir or scenario
-        refWorkspace  = args.refWorkspace or getParam('GCAM.RefWorkspace')
-        xmlOutputRoot = args.xmlOutputRoot or workspace
-
-        # When called from gcammcs in 'trial' mode, we only run dynamic setup. When run
-        # in 'gensim' mode, we do only static setup.
-        args.dynamicOnly = args.dynamicOnly or mcsMode == 'trial'
-
-        if mcsMode == 'gensim':
-            args.dynamicOnly = False
-            args.staticOnly  = True
-
-        # TBD: Document that all setup classes must conform to this protocol
-        obj = scenClass(args.baseline, args.scenario, xmlOutputRoot, xmlSourceDir,
-                        refWorkspace, groupName, srcGroupDir, subdir)
-
-        obj.mcsMode = mcsMode
-        obj.setup(args)
+            setupScenario(args, mcsMode=mcsMode)
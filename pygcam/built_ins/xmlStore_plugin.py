@@ -0,0 +1,59 @@
+"""
+.. Manage the store of generated XML files shared by scenarios.
+
+.. Copyright (c) 2017 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+"""
+from __future__ import print_function
+from ..subcommand import SubcommandABC
+
+class XmlStoreCommand(SubcommandABC):
+    def __init__(self, subparsers):
+        kwargs = {'help' : '''Manage the content-addressed store of generated XML files
+                  identified by config variable GCAM.XmlStoreDir.'''}
+
+        super(XmlStoreCommand, self).__init__('xmlstore', subparsers, kwargs, group='utils')
+
+    def addArgs(self, parser):
+        parser.add_argument('-a', '--add', action='append', default=[], metavar='DIR',
+                            help='''Move the files in the given directory (e.g., a scenario's local-xml
+                            directory created before the store was enabled) to the store, replacing each
+                            with a link to the stored copy. Can be repeated.''')
+
+        parser.add_argument('-g', '--gc', action='store_true',
+                            help='''Delete stored files that are no longer linked to by any scenario.''')
+
+        parser.add_argument('-n', '--noExecute', action='store_true',
+                            help='''With --gc, show the files that would be deleted without deleting them.''')
+
+        parser.add_argument('-r', '--root', action='append', default=[], metavar='DIR',
+                            help='''A directory to search for symlinks to stored files when using --gc.
+                            Can be repeated. Defaults to the directory containing the store. (Hard links
+                            to stored files are found without searching.)''')
+
+        parser.add_argument('-s', '--stats', action='store_true',
+                            help='''Print the number and total size of stored files.''')
+
+        return parser   # for auto-doc generation
+
+    def run(self, args, tool):
+        from ..error import CommandlineError
+        from ..xmlStore import XmlStore
+
+        store = XmlStore.getInstance()
+        if not store:
+            raise CommandlineError("xmlstore: config variable GCAM.XmlStoreDir is not set")
+
+        for dirname in args.add:
+            count, freed = store.addTree(dirname)
+            print("Stored %d files from %s; freed %d bytes" % (count, dirname, freed))
+
+        if args.gc:
+            count, freed = store.collectGarbage(roots=args.root, dryRun=args.noExecute)
+            verb = 'Would delete' if args.noExecute else 'Deleted'
+            print("%s %d unused files (%d bytes) from %s" % (verb, count, freed, store.storeDir))
+
+        if args.stats or not (args.add or args.gc):
+            stats = store.stats()
+            print("%s: %d files, %d bytes, %d links" % (store.storeDir, stats['files'],
+                                                        stats['bytes'], stats['links']))
@@ -3,6 +3,7 @@
    See the https://opensource.org/licenses/MIT for license details.
 '''
 from pygcam.constants import GCAM_32_REGIONS
+from pygcam.xmlStore import unshareFile
 
 fixedTaxTemplate = '                <fixedTax year="{year}">{tax}</fixedTax>'
 
@@ -85,6 +86,7 @@ def genCarbonTaxFile(filename, value, startYear=2020, endYear=2100, timestep=5,
     '''
     years = range(startYear, endYear + timestep, timestep)
     text = genCarbonTax(value, years, rate, regions=regions, market=market)
+    unshareFile(filename)
     with open(filename, 'w') as f:
         f.write(text)
 
@@ -179,6 +181,7 @@ def genLinkedBioCarbonPolicyFile(filename, market='global', regions=None, forTax
     parts.append(footer)
     xml = ''.join(parts)
 
+    unshareFile(filename)
     with open(filename, 'w') as f:
         f.write(xml)
 
@@ -6,6 +6,7 @@
    See the https://opensource.org/licenses/MIT for license details.
 '''
 import argparse
+import hashlib
 import os
 
 from .matplotlibFix import plt
@@ -15,10 +16,12 @@ import numpy as np
 import seaborn as sns
 import shlex
 
+from .csvCache import fileDigest
 from .error import CommandlineError
 from .log import getLogger
-from .query import dropExtraCols, readCsv
-from .utils import systemOpenFile, pathjoin
+from .query import dropExtraCols, yearColumns
+from .queryResult import QueryResult, parseConstraint
+from .utils import systemOpenFile, pathjoin, mkdirs
 
 _logger = getLogger(__name__)
 
@@ -328,7 +331,85 @@ def plotTimeSeries(df, xlabel='', ylabel='', box=False, zeroLine=False, title=""
     return (fig, ax)
 
 
-def chartGCAM(args, num=None, negate=False):
+def _readChartData(args):
+    """
+    Read the CSV file named in chart arguments `args` as a QueryResult.
+    """
+    if args.years:
+        yearStrs = args.years.split('-')
+        assert len(yearStrs) == 2, "Year range must be given as YYYY-YYYY"
+    else:
+        yearStrs = None
+
+    return QueryResult.read(args.csvFile, skiprows=args.skiprows, years=yearStrs, interpolate=args.interpolate)
+
+def _chartDataKey(args):
+    """
+    Charts whose arguments produce the same key can share the data read from the CSV file.
+    """
+    return (os.path.abspath(args.csvFile), args.skiprows, args.years, bool(args.interpolate))
+
+# The subdirectory of a chart's output directory holding records of rendered charts
+RenderCacheDir = '.chartCache'
+
+# Arguments to "gt" itself, which precede the sub-command name and don't affect charts
+_ToolArgs = ('batch', 'configVars', 'enviroVars', 'jobName', 'logFile', 'logLevel', 'mcsMode',
+             'minutes', 'projectName', 'queueName', 'resources', 'showBatch', 'subcommand',
+             'verbose', 'VERSION')
+
+# Arguments that don't affect the images produced
+_NonRenderingArgs = ('enumerate', 'force', 'fromFile', 'jobs', 'open', 'reference', 'scenario',
+                     'workingDir') + _ToolArgs
+
+def _renderKey(args, num, negate):
+    """
+    Compute a digest of everything determining the images produced by a chart:
+    the contents of the CSV file and any multiplier or divisor file, the chart
+    arguments, the filename number, and whether values are negated. Unit
+    conversion names given to --multiplier and --divisor are converted to
+    values when arguments are parsed, so a change to a conversion defined in
+    :doc:`pygcam.units` also changes the key.
+    """
+    from .version import VERSION
+
+    items = sorted([(name, value) for name, value in vars(args).items() if name not in _NonRenderingArgs])
+    digests = [fileDigest(name) if name else None for name in (args.csvFile, args.multiplierFile, args.divisorFile)]
+    text = repr((VERSION, items, digests, num, bool(negate)))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def _renderRecord(outFile):
+    """
+    Return the pathname of the file recording the key used to render `outFile`
+    and the names of the image files produced.
+    """
+    dirname, basename = os.path.split(outFile)
+    return pathjoin(dirname, RenderCacheDir, basename + '.key')
+
+def _renderIsCurrent(outFile, key):
+    """
+    Return True if the chart for `outFile` was last rendered using the given
+    key and all the image files it produced still exist.
+    """
+    try:
+        with open(_renderRecord(outFile)) as f:
+            lines = f.read().splitlines()
+    except IOError:
+        return False
+
+    if not lines or lines[0] != key:
+        return False
+
+    dirname = os.path.dirname(outFile)
+    return all([os.path.exists(pathjoin(dirname, name)) for name in lines[1:]])
+
+def _saveRenderKey(outFile, key, imgFiles):
+    recordFile = _renderRecord(outFile)
+    mkdirs(os.path.dirname(recordFile))
+
+    with open(recordFile, 'w') as f:
+        f.write('\n'.join([key] + imgFiles) + '\n')
+
+def chartGCAM(args, num=None, negate=False, reader=_readChartData):
     """
     Generate a chart from GCAM data. This function is called to process
     the ``chart`` sub-command for a single scenario. See the command-line
@@ -340,41 +421,18 @@ def chartGCAM(args, num=None, negate=False):
         filename to allow files to have numerical sequence.
     :param negate: (bool) if True, all values in year columns are multiplied
         by -1 before plotting.
+    :param reader: (function) called with `args` to read the data from
+        ``args.csvFile`` as a QueryResult, which is not modified. See
+        :py:func:`chartBatch`, which uses this to read each file only once.
     :return: none
     """
-    barWidth   = args.barWidth
-    box        = args.box
     byRegion   = args.byRegion
-    columns    = args.columns
     constraint = args.constraint
     csvFile    = args.csvFile
-    indexCol   = args.indexCol or None
-    label      = args.label
-    labelColor = args.labelColor
-    legendY    = args.legendY
-    ncol       = args.ncol
-    openFile   = args.open
     outFile    = args.outFile
     outputDir  = args.outputDir
-    palette    = args.palette
     region     = args.region
-    rotation   = args.rotation
-    sumYears   = args.sumYears
-    timeseries = args.timeseries
     title      = args.title
-    transparent= args.transparent
-    unstackCol  = args.unstackedCol
-    unstackReg = args.unstackedRegion
-    valueCol   = args.valueCol
-    xlabel     = args.xlabel
-    yFormat    = args.format
-    yearStep   = args.yearStep
-    ygrid      = args.ygrid
-    ylabel     = args.ylabel
-    ymax       = args.ymax
-    ymin       = args.ymin
-    yticks     = args.yticks
-    zeroLine   = args.zeroLine
 
     # DOCUMENT
     # use outputDir if provided, else use parent dir of outFile
@@ -396,99 +454,217 @@ def chartGCAM(args, num=None, negate=False):
 
     outFile = pathjoin(outputDir, imgFile)
 
-    _logger.debug("Generating %s", os.path.abspath(outFile))
+    if negate:
+        outFile = _amendFilename(outFile, 'negated')
+        imgFile = _amendFilename(imgFile, 'negated')
 
-    if args.years:
-        yearStrs = args.years.split('-')
-        assert len(yearStrs) == 2, "Year range must be given as YYYY-YYYY"
-    else:
-        yearStrs = None
+    # Skip charts whose data and arguments haven't changed since they were last rendered
+    key = _renderKey(args, num, negate)
+    if not getattr(args, 'force', False) and _renderIsCurrent(outFile, key):
+        _logger.info("Chart cache hit: %s is up to date", os.path.abspath(outFile))
+        if args.open and not byRegion:
+            systemOpenFile(outFile)
+        return
+
+    _logger.debug("Generating %s", os.path.abspath(outFile))
 
     # e.g., "/Users/rjp/ws-ext/new-reference/batch-new-reference/LUC_Emission_by_Aggregated_LUT_EM-new-reference." % scenario
-    df = readCsv(csvFile, skiprows=args.skiprows, years=yearStrs, interpolate=args.interpolate)
+    result = reader(args)
 
     if region:
         try:
-            df = df.query('region == "%s"' % region)
+            result = result.select(region=region)
         except Exception as e:
             raise CommandlineError("Failed to slice by region %s\n  -- %s" % (region, e))
 
-        if df.shape[0] == 0:
+        if len(result) == 0:
             raise CommandlineError('Region "%s" was not found in %s' % (region, csvFile))
 
-    if constraint:
+    # Constraints comparing columns to strings select rows by categorical codes;
+    # anything else is evaluated by DataFrame.query() after conversion, below.
+    selectors = parseConstraint(constraint) if constraint else None
+    if selectors:
         try:
-            df = df.query(constraint)
+            result = result.select(selectors)
         except Exception as e:
             raise CommandlineError("Failed to apply constraint: %s\n  -- %s" % (constraint, e))
 
-    yearCols = filter(str.isdigit, df.columns)
+    values = result.values
 
     multiplier = args.multiplier or _getFloatFromFile(args.multiplierFile)
     if multiplier:
-        df[yearCols] *= multiplier
+        values = values * multiplier
 
     divisor = args.divisor or _getFloatFromFile(args.divisorFile)
     if divisor:
-        df[yearCols] /= divisor
+        values = values / divisor
 
     if negate:
-        outFile = _amendFilename(outFile, 'negated')
-        imgFile = _amendFilename(imgFile, 'negated')
-        df[yearCols] *= -1
-
-    regions = df.region.unique() if byRegion else [None]    # allows loop to work when not byRegion
-
-    outFileOrig = outFile
-    imgFileOrig = imgFile
-    titleOrig   = title
-    dfOrig = df
-
-    for reg in regions:
-        if reg:
-            df = dfOrig.query('region == "%s"' % reg)
-            title = titleOrig + " (%s)" % reg
-            outFile = _amendFilename(outFileOrig, reg)
-            imgFile = _amendFilename(imgFileOrig, reg)
-            _logger.debug("Processing %s", reg)
-
-        sideLabel = imgFile if label else ''
-
-        if unstackCol:
-            otherRegion = 'Rest of world'
-            mainRegion  = reg or unstackReg
-
-            plotUnstackedRegionComparison(df, unstackCol, valueCol=valueCol, region=mainRegion,
-                                          otherRegion=otherRegion, box=box, title=title, ncol=ncol,
-                                          xlabel=xlabel, ylabel=ylabel, ygrid=ygrid, yticks=yticks,
-                                          ymin=ymin, ymax=ymax, legendY=legendY, palette=palette,
-                                          outFile=outFile, sideLabel=sideLabel, labelColor=labelColor,
-                                          yFormat=yFormat, transparent=transparent, openFile=openFile)
-        elif sumYears or valueCol:
-            if sumYears:
-                # create a new value column by summing year columns
-                valueCol = '_total_'
-                df[valueCol] = df[yearCols].sum(axis=1)
-
-            plotStackedBarsScalar(df, indexCol, columns, valueCol, box=box, zeroLine=zeroLine,
-                                  title=title, xlabel=xlabel, ylabel=ylabel, ygrid=ygrid, yticks=yticks,
-                                  ymin=ymin, ymax=ymax, rotation=rotation, ncol=ncol, barWidth=barWidth,
-                                  legendY=legendY, palette=palette, outFile=outFile, sideLabel=sideLabel,
-                                  labelColor=labelColor, yFormat=yFormat, transparent=transparent,
-                                  openFile=openFile)
-
-        elif timeseries:
-            plotTimeSeries(df, xlabel=xlabel, ylabel=ylabel, box=box, zeroLine=zeroLine, title=title, ygrid=ygrid,
-                           yticks=yticks, ymin=ymin, ymax=ymax, legend=False, legendY=legendY, yearStep=yearStep,
-                           outFile=outFile, sideLabel=sideLabel, labelColor=labelColor, yFormat=yFormat,
-                           transparent=transparent, openFile=openFile)
-
-        else:
-            plotStackedTimeSeries(df, index=indexCol, yearStep=yearStep, ygrid=ygrid, yticks=yticks,
-                                  ymin=ymin, ymax=ymax, zeroLine=zeroLine, title=title, legendY=legendY,
-                                  box=box, xlabel=xlabel, ylabel=ylabel, ncol=ncol, barWidth=barWidth,
-                                  palette=palette, outFile=outFile, sideLabel=sideLabel, labelColor=labelColor,
-                                  yFormat=yFormat, transparent=transparent, openFile=openFile)
+        values = values * -1
+
+    if values is not result.values:
+        result = QueryResult(result.dims, result.years, values, columns=result.columns, title=result.title)
+
+    # The data are converted to DataFrames only for plotting
+    if constraint and not selectors:
+        try:
+            df = result.toDataFrame().query(constraint)
+        except Exception as e:
+            raise CommandlineError("Failed to apply constraint: %s\n  -- %s" % (constraint, e))
+
+        regionDFs = df.groupby('region', sort=False)
+    else:
+        df = None if byRegion else result.toDataFrame()
+        regionDFs = ((reg, group.toDataFrame()) for reg, group in result.groups('region'))
+
+    if byRegion:
+        # Split the data by region in a single pass, and give each region's chart only its slice
+        tasks = [(regionDF, args, reg, title + " (%s)" % reg,
+                  _amendFilename(outFile, reg), _amendFilename(imgFile, reg))
+                 for reg, regionDF in regionDFs]
+    else:
+        tasks = [(df, args, None, title, outFile, imgFile)]
+
+    jobs = min(getattr(args, 'jobs', 1) or 1, len(tasks))
+
+    if jobs > 1:
+        from multiprocessing import Pool
+
+        pool = Pool(jobs)
+        try:
+            pool.map(_plotChart, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for task in tasks:
+            _plotChart(task)
+
+    _saveRenderKey(outFile, key, [task[-1] for task in tasks])
+
+def _plotChart(task):
+    """
+    Render a single chart. Defined at top level so it can be run in a worker process.
+
+    :param task: (tuple) the DataFrame to plot, the chart arguments (argparse.Namespace),
+        the region being plotted or None, the chart title, and the pathname and basename
+        of the image file to create.
+    :return: none
+    """
+    df, args, reg, title, outFile, imgFile = task
+
+    if reg:
+        _logger.debug("Processing %s", reg)
+
+    indexCol   = args.indexCol or None
+    valueCol   = args.valueCol
+    yearCols   = yearColumns(df)
+    sideLabel  = imgFile if args.label else ''
+
+    if args.unstackedCol:
+        otherRegion = 'Rest of world'
+        mainRegion  = reg or args.unstackedRegion
+
+        plotUnstackedRegionComparison(df, args.unstackedCol, valueCol=valueCol, region=mainRegion,
+                                      otherRegion=otherRegion, box=args.box, title=title, ncol=args.ncol,
+                                      xlabel=args.xlabel, ylabel=args.ylabel, ygrid=args.ygrid, yticks=args.yticks,
+                                      ymin=args.ymin, ymax=args.ymax, legendY=args.legendY, palette=args.palette,
+                                      outFile=outFile, sideLabel=sideLabel, labelColor=args.labelColor,
+                                      yFormat=args.format, transparent=args.transparent, openFile=args.open)
+    elif args.sumYears or valueCol:
+        if args.sumYears:
+            # create a new value column by summing year columns
+            valueCol = '_total_'
+            df[valueCol] = df[yearCols].sum(axis=1)
+
+        plotStackedBarsScalar(df, indexCol, args.columns, valueCol, box=args.box, zeroLine=args.zeroLine,
+                              title=title, xlabel=args.xlabel, ylabel=args.ylabel, ygrid=args.ygrid,
+                              yticks=args.yticks, ymin=args.ymin, ymax=args.ymax, rotation=args.rotation,
+                              ncol=args.ncol, barWidth=args.barWidth, legendY=args.legendY, palette=args.palette,
+                              outFile=outFile, sideLabel=sideLabel, labelColor=args.labelColor,
+                              yFormat=args.format, transparent=args.transparent, openFile=args.open)
+
+    elif args.timeseries:
+        plotTimeSeries(df, xlabel=args.xlabel, ylabel=args.ylabel, box=args.box, zeroLine=args.zeroLine,
+                       title=title, ygrid=args.ygrid, yticks=args.yticks, ymin=args.ymin, ymax=args.ymax,
+                       legend=False, legendY=args.legendY, yearStep=args.yearStep, outFile=outFile,
+                       sideLabel=sideLabel, labelColor=args.labelColor, yFormat=args.format,
+                       transparent=args.transparent, openFile=args.open)
+
+    else:
+        plotStackedTimeSeries(df, index=indexCol, yearStep=args.yearStep, ygrid=args.ygrid, yticks=args.yticks,
+                              ymin=args.ymin, ymax=args.ymax, zeroLine=args.zeroLine, title=title,
+                              legendY=args.legendY, box=args.box, xlabel=args.xlabel, ylabel=args.ylabel,
+                              ncol=args.ncol, barWidth=args.barWidth, palette=args.palette, outFile=outFile,
+                              sideLabel=sideLabel, labelColor=args.labelColor, yFormat=args.format,
+                              transparent=args.transparent, openFile=args.open)
+
+def _chartGroup(task):
+    """
+    Render all the charts using one CSV file, reading it just once. Defined
+    at top level so it can be run in a worker process.
+
+    :param task: (tuple of (list of (dict, int)), bool) the chart arguments (as
+        dicts) and numbers, and whether to negate values.
+    :return: (int) the number of charts processed, including those already up to date
+    """
+    specs, negate = task
+    results = []
+
+    def reader(args):
+        if not results:
+            results.append(_readChartData(args))
+        return results[0]
+
+    for argDict, num in specs:
+        args = argparse.Namespace(**argDict)
+        chartGCAM(args, num=num, negate=negate, reader=reader)
+
+    return len(specs)
+
+def chartBatch(specs, negate=False, jobs=1):
+    """
+    Render many charts, reading each CSV file only once. Charts are grouped by
+    the data they use, and the groups can be rendered in parallel by a pool of
+    processes, each using matplotlib's non-interactive Agg backend. Output
+    filenames are determined solely by each chart's arguments and number, so
+    they don't depend on the order in which charts are rendered.
+
+    :param specs: (list of (argparse.Namespace, int or None)) the arguments for
+        each chart, and the number to prepend to its filename, if any.
+    :param negate: (bool) if True, all values in year columns are multiplied
+        by -1 before plotting.
+    :param jobs: (int) the number of processes to use
+    :return: none
+    """
+    from collections import OrderedDict
+
+    groups = OrderedDict()
+    for args, num in specs:
+        groups.setdefault(_chartDataKey(args), []).append((dict(vars(args)), num))
+
+    tasks = [(group, negate) for group in groups.values()]
+    jobs = min(jobs, len(tasks))
+
+    # Worker processes can't create pools of their own, so --byRegion charts are rendered serially
+    for group, _ in tasks:
+        for argDict, num in group:
+            argDict['jobs'] = 1 if jobs > 1 else argDict.get('jobs', 1)
+
+    _logger.info("Rendering %d charts from %d files using %d process(es)", len(specs), len(tasks), max(jobs, 1))
+
+    if jobs > 1:
+        from multiprocessing import Pool
+
+        pool = Pool(jobs)
+        try:
+            pool.map(_chartGroup, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for task in tasks:
+            _chartGroup(task)
 
 def chartMain(mainArgs, tool, parser):
     # DOCUMENT '*null*', if still useful
@@ -505,7 +681,9 @@ def chartMain(mainArgs, tool, parser):
         del mainArgs.csvFile    # whatever is passed, e.g., "-", is ignored
 
         enumerate = mainArgs.enumerate
+        jobs = mainArgs.jobs
         num = 1
+        specs = []
 
         with open(mainArgs.fromFile) as f:
             lines = f.readlines()
@@ -517,32 +695,36 @@ def chartMain(mainArgs, tool, parser):
 
         scenarios = mainArgs.scenario.split(',')
 
-        for scenario in scenarios:
-            substDict['scenario'] = scenario
-            argDict = vars(mainArgs)
-            argDict['scenario'] = scenario  # for each call, pass the current scenario only
+        # Parse all the lines first so charts can be grouped by input file
+        def parseLines():
+            for scenario in scenarios:
+                substDict['scenario'] = scenario
+                argDict = vars(mainArgs)
+                argDict['scenario'] = scenario  # for each call, pass the current scenario only
 
-            # Merge command-line args with those from the file,
-            # allowing the ones from the file to override.
-            for line in lines:
-                # ignore comment lines
-                line = line.strip()
-                if not line or line[0] == '#':
-                    continue
+                # Merge command-line args with those from the file,
+                # allowing the ones from the file to override.
+                for line in lines:
+                    # ignore comment lines
+                    line = line.strip()
+                    if not line or line[0] == '#':
+                        continue
 
-                if line == 'exit':
-                    return
+                    if line == 'exit':
+                        return
 
-                line = line.format(**substDict)
-                fileArgs = shlex.split(line)
+                    line = line.format(**substDict)
+                    fileArgs = shlex.split(line)
 
-                argsNS  = argparse.Namespace(**argDict)
-                allArgs = parser.parse_args(args=fileArgs, namespace=argsNS)
+                    argsNS  = argparse.Namespace(**argDict)
+                    yield parser.parse_args(args=fileArgs, namespace=argsNS)
 
-                nextNum = num if enumerate else None
-                num += 1
+        for allArgs in parseLines():
+            nextNum = num if enumerate else None
+            num += 1
+            specs.append((allArgs, nextNum))
 
-                chartGCAM(allArgs, num=nextNum, negate=negate)
+        chartBatch(specs, negate=negate, jobs=jobs)
 
     else:
         chartGCAM(mainArgs, negate=negate)
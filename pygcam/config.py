@@ -4,8 +4,8 @@
 '''
 from __future__ import print_function
 import os
+import pkgutil
 import platform
-from pkg_resources import resource_string
 from backports import configparser
 from .error import ConfigFileError, PygcamException
 
@@ -19,6 +19,17 @@ _ConfigParser = None
 
 _ProjectSection = DEFAULT_SECTION
 
+# Interpolated values of variables, keyed by (section, name, raw), and of whole
+# sections, keyed by (section, raw). A variable's value can depend on others, so
+# any change to the configuration clears both caches. (Changing the default
+# section needn't, since the keys hold the section actually read.)
+_ParamCache = {}
+_SectionCache = {}
+
+def _clearCaches():
+    _ParamCache.clear()
+    _SectionCache.clear()
+
 
 def getSection():
     return _ProjectSection
@@ -59,7 +70,7 @@ def getConfig(reload=False, allowMissing=False):
 
 def _readConfigResourceFile(filename, package='pygcam', raiseError=True):
     try:
-        data = resource_string(package, filename)
+        data = pkgutil.get_data(package, filename)   # avoids slow import of pkg_resources
     except IOError:
         if raiseError:
             raise
@@ -207,6 +218,8 @@ def readConfigFiles(allowMissing=False):
     """
     global _ConfigParser
 
+    _clearCaches()
+
     # Strict mode prevents duplicate sections, which we do not restrict
     _ConfigParser = configparser.ConfigParser(comment_prefixes=('#'),
                                               strict=False,
@@ -274,6 +287,8 @@ def readConfigFiles(allowMissing=False):
                 _ConfigParser.get(section, projectNameVar)):            # and not be blank
             _ConfigParser.set(section, projectNameVar, section)
 
+    _clearCaches()      # values read above may refer to GCAM.ProjectName
+
     projectName = getParam('GCAM.DefaultProject', section=DEFAULT_SECTION)
     if projectName:
         setSection(projectName)
@@ -289,15 +304,23 @@ def getSections():
 
 def getConfigDict(section=DEFAULT_SECTION, raw=False):
     """
-    Return all variables defined in `section` as a dictionary.
+    Return all variables defined in `section` as a dictionary. The values
+    are cached, as are those returned by :py:func:`getParam`, which this
+    makes a fast way to resolve all the variables in a section at once.
 
     :param section: (str) the name of a section in the config file
     :param raw: (bool) whether to return raw or interpolated values.
     :return: (dict) all variables defined in the section (which includes
        those defined in DEFAULT.)
     """
-    d = {key : value for key, value in _ConfigParser.items(section, raw=raw)}
-    return d
+    key = (section, raw)
+    d = _SectionCache.get(key)
+
+    if d is None:
+        d = _SectionCache[key] = {name : value for name, value in _ConfigParser.items(section, raw=raw)}
+        _ParamCache.update(((section, name, raw), value) for name, value in d.items())
+
+    return dict(d)      # a copy, so callers can modify it
 
 def setParam(name, value, section=None):
     """
@@ -312,12 +335,14 @@ def setParam(name, value, section=None):
     """
     section = section or getSection()
     _ConfigParser.set(section, name, value)
+    _clearCaches()
     return value
 
 def getParam(name, section=None, raw=False, raiseError=True):
     """
     Get the value of the configuration parameter `name`. Calls
-    :py:func:`getConfig` if needed.
+    :py:func:`getConfig` if needed. Values are cached until the
+    configuration is changed by :py:func:`setParam` or re-read.
 
     :param name: (str) the name of a configuration parameters. Note
        that variable names are case-insensitive. Note that environment
@@ -340,6 +365,12 @@ def getParam(name, section=None, raw=False, raiseError=True):
     if not _ConfigParser:
         getConfig()
 
+    key = (section, name, raw)
+    try:
+        return _ParamCache[key]
+    except KeyError:
+        pass
+
     try:
         value = _ConfigParser.get(section, name, raw=raw)
 
@@ -355,6 +386,7 @@ def getParam(name, section=None, raw=False, raiseError=True):
         else:
             return None
 
+    _ParamCache[key] = value
     return value
 
 def getParamAsBoolean(name, section=None):
@@ -12,6 +12,7 @@ from .constants import LOCAL_XML_NAME
 from .log import getLogger
 from .query import readQueryResult
 from .utils import mkdirs, pathjoin, getBatchDir, getYearCols, printSeries, symlinkOrCopyFile
+from .xmlStore import unshareFile
 
 _logger = getLogger(__name__)
 
@@ -83,6 +84,7 @@ def _saveConstraintFile(xml, dirname, constraintName, policyType, scenario, grou
 
     pathname = pathjoin(fullDirname, constraintFile)
     _logger.debug("Generating constraint file: %s", pathname)
+    unshareFile(pathname)
     with open(pathname, 'w') as f:
         f.write(xml)
 
@@ -0,0 +1,252 @@
+'''
+.. Persistent on-disk cache of parsed GCAM query results.
+
+   Each parsed CSV file is stored in pandas' binary pickle format, keyed by
+   the file's absolute path, size, and modification time, so a file that
+   changes on disk is simply re-read. The total size of the cache is bounded
+   by ``GCAM.CsvCacheSize`` (in MB); least-recently used entries are removed
+   first when this limit is exceeded.
+
+.. Copyright (c) 2017 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+import os
+import hashlib
+from glob import glob
+from six.moves import cPickle as pickle
+
+from .config import getParam, getParamAsFloat
+from .log import getLogger
+from .windows import IsWindows
+
+_logger = getLogger(__name__)
+
+_EntrySuffix = '.pkl'
+
+def fileSignature(filename):
+    """
+    Return the values used to detect that a file has changed.
+
+    :param filename: (str) the pathname of a file
+    :return: (tuple) the absolute path, size, and modification time of
+       `filename`, or None if the file cannot be stat'ed.
+    """
+    path = os.path.abspath(filename)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    return (path, st.st_size, st.st_mtime)
+
+_digests = {}
+
+def fileDigest(filename, blockSize=1 << 20):
+    """
+    Return the SHA-1 digest of the contents of a file. Digests are remembered
+    for the life of the process, keyed by :py:func:`fileSignature`, so a file
+    that hasn't changed is read only once.
+
+    :param filename: (str) the pathname of a file
+    :param blockSize: (int) the number of bytes to read at a time
+    :return: (str) the hexadecimal digest, or None if the file doesn't exist
+    """
+    signature = fileSignature(filename)
+    if signature is None:
+        return None
+
+    digest = _digests.get(signature)
+    if digest is None:
+        sha = hashlib.sha1()
+        with open(signature[0], 'rb') as f:
+            for block in iter(lambda: f.read(blockSize), b''):
+                sha.update(block)
+
+        digest = _digests[signature] = sha.hexdigest()
+
+    return digest
+
+
+class FileCache(object):
+    """
+    A size-bounded, least-recently-used cache of objects derived from files,
+    stored in the directory `cacheDir`. Entries are keyed by the path, size
+    and modification time of the file they were derived from, plus a tag.
+    """
+    def __init__(self, cacheDir, maxBytes):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+
+    def entryPath(self, filename, tag):
+        """
+        Compute the pathname of the cache entry for `filename` parsed
+        as indicated by `tag`.
+
+        :param filename: (str) the pathname of the source file
+        :param tag: (str) identifies how the file is parsed, so different
+           readers of the same file don't share entries.
+        :return: (str) the pathname of the cache entry, or None if
+           `filename` cannot be stat'ed.
+        """
+        sig = fileSignature(filename)
+        if sig is None:
+            return None
+
+        key = '%s|%d|%r|%s' % (sig + (tag,))
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cacheDir, digest + _EntrySuffix)
+
+    def load(self, filename, tag):
+        """
+        Return the object cached for `filename` and `tag`, or None if there
+        is no valid entry.
+        """
+        entry = self.entryPath(filename, tag)
+        if not entry or not os.path.exists(entry):
+            return None
+
+        try:
+            with open(entry, 'rb') as f:
+                obj = pickle.load(f)
+
+        except Exception as e:
+            # e.g., written by an incompatible version of pandas
+            _logger.debug("Discarding unreadable cache entry %s: %s", entry, e)
+            self._remove(entry)
+            return None
+
+        try:
+            os.utime(entry, None)   # mark as recently used
+        except OSError:
+            pass
+
+        _logger.debug("Found %s in cache %s", filename, self.cacheDir)
+        return obj
+
+    def save(self, filename, tag, obj):
+        """
+        Store `obj` as the cached value for `filename` and `tag`, then remove
+        least-recently used entries if the cache exceeds its size limit.
+        Errors are logged and otherwise ignored, since the cache is only an
+        optimization.
+        """
+        from .utils import mkdirs
+
+        entry = self.entryPath(filename, tag)
+        if not entry:
+            return
+
+        tmpFile = '%s.%d.tmp' % (entry, os.getpid())
+        try:
+            mkdirs(self.cacheDir)
+            with open(tmpFile, 'wb') as f:
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            # rename is atomic, so concurrent readers never see a partial entry
+            if IsWindows:
+                self._remove(entry)     # Windows won't rename over an existing file
+            os.rename(tmpFile, entry)
+
+        except Exception as e:
+            _logger.warning("Failed to write cache entry for %s: %s", filename, e)
+            self._remove(tmpFile)
+            return
+
+        self.prune()
+
+    def prune(self):
+        """
+        Delete the least-recently used entries until the total size of the
+        cache is no greater than ``self.maxBytes``.
+
+        :return: (int) the number of entries deleted
+        """
+        entries = []
+        for path in glob(os.path.join(self.cacheDir, '*' + _EntrySuffix)):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue        # removed by another process
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum([size for (_, size, _) in entries])
+        count = 0
+
+        for _, size, path in sorted(entries):
+            if total <= self.maxBytes:
+                break
+
+            self._remove(path)
+            total -= size
+            count += 1
+
+        if count:
+            _logger.debug("Removed %d entries from cache %s", count, self.cacheDir)
+
+        return count
+
+    def clear(self):
+        """
+        Delete all entries in the cache.
+        """
+        for path in glob(os.path.join(self.cacheDir, '*' + _EntrySuffix)):
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class CsvCache(FileCache):
+    """
+    The cache of parsed CSV files, located and sized by config variables.
+    """
+    _instance = None
+
+    @classmethod
+    def getInstance(cls):
+        """
+        Return the cache described by config variables ``GCAM.CsvCacheDir``
+        and ``GCAM.CsvCacheSize``, or None if ``GCAM.CsvCacheDir`` is empty.
+        The instance is recreated if either value has changed.
+        """
+        cacheDir = getParam('GCAM.CsvCacheDir', raiseError=False)
+        if not cacheDir:
+            return None
+
+        maxBytes = int(getParamAsFloat('GCAM.CsvCacheSize') * 1024 * 1024)
+
+        obj = cls._instance
+        if obj is None or obj.cacheDir != cacheDir or obj.maxBytes != maxBytes:
+            obj = cls._instance = cls(cacheDir, maxBytes)
+
+        return obj
+
+
+def readCachedCsv(filename, tag, reader):
+    """
+    Return the value cached for `filename` and `tag`, or call ``reader(filename)``
+    and cache the result. If the cache is disabled, `reader` is just called.
+
+    :param filename: (str) the pathname of a CSV file
+    :param tag: (str) identifies how `reader` parses the file
+    :param reader: (callable) function of one argument (the filename) that
+       returns a picklable value, typically a DataFrame or a tuple holding one.
+    :return: the value returned by `reader`, or an equal one read from the cache.
+    """
+    cache = CsvCache.getInstance()
+
+    if cache:
+        obj = cache.load(filename, tag)
+        if obj is not None:
+            return obj
+
+    obj = reader(filename)
+
+    if cache:
+        cache.save(filename, tag, obj)
+
+    return obj
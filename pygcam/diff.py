@@ -4,60 +4,142 @@
   See the https://opensource.org/licenses/MIT for license details.
 '''
 import os
+from collections import OrderedDict
+
 from .log import getLogger
 from .error import CommandlineError, FileFormatError
 from .utils import mkdirs, pathjoin, ensureCSV, QueryResultsDir
-from .query import readCsv, dropExtraCols, csv2xlsx, sumYears, sumYearsByGroup, QueryFile
+from .query import dropExtraCols, extraColumns, csv2xlsx, sumYears, sumYearsByGroup, QueryFile
+from .queryResult import QueryResult
 
 _logger = getLogger(__name__)
 
 
-def computeDifference(df1, df2, resetIndex=True, dropna=True):
+def _asQueryResult(obj):
+    return obj if isinstance(obj, QueryResult) else QueryResult.fromDataFrame(obj)
+
+def _valueFrame(result, names):
+    """
+    Return the year values of `result` as a DataFrame indexed by the dimensions
+    `names`. The index is built from the dimensions' categorical codes, so the
+    dimension values aren't copied into object arrays.
     """
-    Compute the difference between two DataFrames.
+    import pandas as pd
 
-    :param df1: a pandas DataFrame instance
-    :param obj2: a pandas DataFrame instance
-    :param resetIndex: (bool) if True (the default), the index in the DataFrame
-      holding the computed difference is reset so that data in non-year columns
-      appear in individual columns. Otherwise, the index in the returned
-      DataFrame is based on all non-year columns.
-    :param dropna: (bool) if True, drop rows with NaN values after computing difference
-    :return: a pandas DataFrame with the difference in all the year columns, computed
-      as (df2 - df1).
+    index = pd.MultiIndex.from_arrays([result.dims[name] for name in names], names=names)
+    return pd.DataFrame(result.values, index=index, columns=[str(y) for y in result.years])
+
+def _fromValueFrame(df, columns):
     """
-    df1 = dropExtraCols(df1, inplace=False)
-    df2 = dropExtraCols(df2, inplace=False)
+    Convert a DataFrame in the form returned by :py:func:`_valueFrame` to a
+    QueryResult with the given column order.
+    """
+    import numpy as np
+    import pandas as pd
 
-    if set(df1.columns) != set(df2.columns):
-        raise FileFormatError("Can't compute difference because result sets have different columns. df1:%s, df2:%s" \
-                              % (df1.columns, df2.columns))
+    index = df.index
+    codes = index.codes if hasattr(index, 'codes') else index.labels   # "labels" in pandas < 0.24
 
-    # Handle corner case in which query results for non-existent data have zero in Units column
-    if 'Units' in df1.columns:
-        units = list(df1.Units.unique())
-        if len(units) == 2 and '0.0' in units:
-            units.remove('0.0')
-            realUnits = units[0]
-            df1.Units = realUnits
-            df2.Units = realUnits
+    dims = OrderedDict([(name, pd.Categorical.from_codes(np.asarray(codes[i]), index.levels[i]))
+                        for i, name in enumerate(index.names)])
+    years = [int(col) for col in df.columns]
+    return QueryResult(dims, years, np.ascontiguousarray(df.values, dtype=float), columns=columns)
 
-    yearCols = filter(str.isdigit, df1.columns)
-    nonYearCols = list(set(df1.columns) - set(yearCols))
+def _withUnits(result, units):
+    """
+    Return a QueryResult sharing the data of `result`, but with `units` in every row.
+    """
+    import numpy as np
+    import pandas as pd
 
-    df1.set_index(nonYearCols, inplace=True)
-    df2.set_index(nonYearCols, inplace=True)
+    dims = OrderedDict(result.dims)
+    dims['Units'] = pd.Categorical.from_codes(np.zeros(len(result), dtype=int), [units])
+    return QueryResult(dims, result.years, result.values, columns=result.columns, title=result.title)
 
-    # Compute difference for timeseries values
-    diff = df2 - df1
+class DiffReference(object):
+    """
+    A reference (e.g., baseline) query result prepared once for computing its
+    difference from any number of other results with the same structure. Extra
+    columns are dropped and the MultiIndex of non-year columns is built just once.
+    """
+    def __init__(self, ref):
+        """
+        :param ref: a :py:class:`pygcam.queryResult.QueryResult` instance or a
+            pandas DataFrame holding the reference results
+        """
+        ref = _asQueryResult(ref)
+        ref = ref.drop(extraColumns(ref.dims.keys()))
+        self.columns = ref.columns
+        self.units = None
+
+        # Handle corner case in which query results for non-existent data have zero in Units column
+        if 'Units' in ref.dims:
+            cat = ref.dims['Units']
+            units = list(cat.categories[sorted(set(cat.codes) - {-1})])
+            if len(units) == 2 and '0.0' in units:
+                units.remove('0.0')
+                self.units = units[0]
+                ref = _withUnits(ref, self.units)
+
+        self.nonYearCols = list(ref.dims.keys())
+        self.df = _valueFrame(ref, self.nonYearCols)
+
+    def difference(self, other, resetIndex=True, dropna=True):
+        """
+        Compute the difference (other - reference) for all year columns.
+
+        :param other: a :py:class:`pygcam.queryResult.QueryResult` instance or a
+            pandas DataFrame
+        :param resetIndex: (bool) see :py:func:`computeDifference`. Ignored if `other`
+            is a QueryResult.
+        :param dropna: (bool) if True, drop rows with NaN values after computing difference
+        :return: the difference in all the year columns, as a QueryResult if `other`
+            is one, otherwise as a pandas DataFrame.
+        """
+        isResult = isinstance(other, QueryResult)
+        other = _asQueryResult(other)
+        other = other.drop(extraColumns(other.dims.keys()))
+
+        if set(self.columns) != set(other.columns):
+            raise FileFormatError("Can't compute difference because result sets have different columns. df1:%s, df2:%s" \
+                                  % (self.columns, other.columns))
+
+        if self.units:
+            other = _withUnits(other, self.units)
+
+        # Compute difference for timeseries values
+        diff = _valueFrame(other, self.nonYearCols) - self.df
+
+        if dropna:
+            diff.dropna(inplace=True)
+
+        result = _fromValueFrame(diff, self.columns)
+        if isResult:
+            return result
+
+        df = result.toDataFrame()
+        if not resetIndex:
+            df.set_index(self.nonYearCols, inplace=True)
+
+        return df
 
-    if dropna:
-        diff.dropna(inplace=True)
 
-    if resetIndex:
-        diff.reset_index(inplace=True)      # convert multi-index back to regular column values
+def computeDifference(df1, df2, resetIndex=True, dropna=True):
+    """
+    Compute the difference between two query results. To compute differences
+    from the same reference result repeatedly, use :py:class:`DiffReference`.
 
-    return diff
+    :param df1: a pandas DataFrame or :py:class:`pygcam.queryResult.QueryResult` instance
+    :param df2: a pandas DataFrame or :py:class:`pygcam.queryResult.QueryResult` instance
+    :param resetIndex: (bool) if True (the default), the index in the DataFrame
+      holding the computed difference is reset so that data in non-year columns
+      appear in individual columns. Otherwise, the index in the returned
+      DataFrame is based on all non-year columns. Ignored if `df2` is a QueryResult.
+    :param dropna: (bool) if True, drop rows with NaN values after computing difference
+    :return: the difference in all the year columns, computed as (df2 - df1), as a
+      QueryResult if `df2` is one, otherwise as a pandas DataFrame.
+    """
+    return DiffReference(df1).difference(df2, resetIndex=resetIndex, dropna=dropna)
 
 
 def writeDiffsToCSV(outFile, referenceFile, otherFiles, skiprows=1, interpolate=False,
@@ -81,17 +163,18 @@ def writeDiffsToCSV(outFile, referenceFile, otherFiles, skiprows=1, interpolate=
        Defaults to the first year in `years`.
     :return: none
     """
-    refDF = readCsv(referenceFile, skiprows=skiprows, interpolate=interpolate,
-                    years=years, startYear=startYear)
+    refResult = QueryResult.read(referenceFile, skiprows=skiprows, interpolate=interpolate,
+                                 years=years, startYear=startYear)
+    ref = DiffReference(refResult)
 
     with open(outFile, 'w') as f:
         for otherFile in otherFiles:
             otherFile = ensureCSV(otherFile)   # add csv extension if needed
-            otherDF   = readCsv(otherFile, skiprows=skiprows, interpolate=interpolate,
-                                years=years, startYear=startYear)
+            other = QueryResult.read(otherFile, skiprows=skiprows, interpolate=interpolate,
+                                     years=years, startYear=startYear)
 
-            diff = computeDifference(refDF, otherDF)
-            csvText = diff.to_csv(index=None)
+            diff = ref.difference(other)
+            csvText = diff.toDataFrame().to_csv(index=None)
             label = "[%s] minus [%s]" % (otherFile, referenceFile)
             f.write("%s\n%s" % (label, csvText))    # csvText has "\n" already
 
@@ -123,19 +206,20 @@ def writeDiffsToXLSX(outFile, referenceFile, otherFiles, skiprows=1, interpolate
     with pd.ExcelWriter(outFile, engine='xlsxwriter') as writer:
         sheetNum = 1
         _logger.debug("Reading reference file:", referenceFile)
-        refDF = readCsv(referenceFile, skiprows=skiprows, interpolate=interpolate,
-                        years=years, startYear=startYear)
+        refResult = QueryResult.read(referenceFile, skiprows=skiprows, interpolate=interpolate,
+                                     years=years, startYear=startYear)
+        ref = DiffReference(refResult)
 
         for otherFile in otherFiles:
             otherFile = ensureCSV(otherFile)   # add csv extension if needed
             _logger.debug("Reading other file:", otherFile)
-            otherDF = readCsv(otherFile, skiprows=skiprows, interpolate=interpolate,
-                              years=years, startYear=startYear)
+            other = QueryResult.read(otherFile, skiprows=skiprows, interpolate=interpolate,
+                                     years=years, startYear=startYear)
 
             sheetName = 'Diff%d' % sheetNum
             sheetNum += 1
 
-            diff = computeDifference(refDF, otherDF)
+            diff = ref.difference(other).toDataFrame()
             diff.to_excel(writer, index=None, sheet_name=sheetName, startrow=2, startcol=0)
 
             worksheet = writer.sheets[sheetName]
@@ -145,10 +229,10 @@ def writeDiffsToXLSX(outFile, referenceFile, otherFiles, skiprows=1, interpolate
             startRow = diff.shape[0] + 4
             worksheet.write_string(startRow, 0, otherFile)
             startRow += 2
-            otherDF.reset_index(inplace=True)
+            otherDF = other.toDataFrame()
             otherDF.to_excel(writer, index=None, sheet_name=sheetName, startrow=startRow, startcol=0)
 
-        dropExtraCols(refDF, inplace=True)
+        refDF = dropExtraCols(refResult.toDataFrame(), inplace=False)
         _logger.debug("writing DF to excel file", outFile)
         refDF.to_excel(writer, index=None, sheet_name='Reference', startrow=0, startcol=0)
 
@@ -215,6 +299,100 @@ def queryCsvPathname(query, scenario, workingDir='.'):
     pathname = pathjoin(workingDir, scenario, QueryResultsDir, '%s-%s.csv' % (query, scenario))
     return pathname
 
+def _diffQuery(query, baseline, policies, workingDir='.', skiprows=1, interpolate=False,
+               years=None, startYear=0):
+    """
+    Compute and write the differences between each policy and the baseline for
+    one query, reading the baseline result and preparing its index just once.
+
+    :return: (list of str) the pathnames of the difference files written
+    """
+    baselineFile = queryCsvPathname(query, baseline, workingDir=workingDir)
+    refResult = QueryResult.read(baselineFile, skiprows=skiprows, interpolate=interpolate,
+                                 years=years, startYear=startYear)
+    ref = DiffReference(refResult)
+
+    outFiles = []
+    for policy in policies:
+        policyFile = queryCsvPathname(query, policy, workingDir=workingDir)
+        policyResult = QueryResult.read(policyFile, skiprows=skiprows, interpolate=interpolate,
+                                        years=years, startYear=startYear)
+
+        outFile = diffCsvPathname(query, baseline, policy, workingDir=workingDir, createDir=True)
+        _logger.info("Writing %s", outFile)
+
+        # Same format as produced by writeDiffsToCSV
+        diff = ref.difference(policyResult).toDataFrame()
+        with open(outFile, 'w') as f:
+            label = "[%s] minus [%s]" % (policyFile, baselineFile)
+            f.write("%s\n%s" % (label, diff.to_csv(index=None)))
+
+        outFiles.append(outFile)
+
+    return outFiles
+
+def _diffQueryStar(args):
+    # Unpack arguments for use with multiprocessing.Pool.map
+    query, baseline, policies, kwargs = args
+    return _diffQuery(query, baseline, policies, **kwargs)
+
+def diffScenarios(baseline, policies, queries, workingDir='.', skiprows=1, interpolate=False,
+                  years=None, startYear=0, jobs=1):
+    """
+    Compute the differences between the baseline and each policy scenario for each
+    query, writing each to the file given by :py:func:`diffCsvPathname`. Each baseline
+    result is read and indexed just once, however many policies there are. Queries
+    are independent, so they can be processed by a pool of `jobs` processes.
+
+    :param baseline: (str) the name of the baseline scenario
+    :param policies: (list of str) the names of the policy scenarios
+    :param queries: (list of str) the base file names of the query results
+    :param workingDir: (str) the directory immediately above the baseline
+        and policy sandboxes.
+    :param skiprows: (int) should be 1 for GCAM files, to skip header info before column names
+    :param interpolate: (bool) if True, linearly interpolate annual values between timesteps
+       in all data files and compute the differences for all resulting years.
+    :param years: (iterable of 2 values coercible to int) the range of years to include in
+       results.
+    :param startYear: (int) the year at which to begin interpolation, if interpolate is True.
+    :param jobs: (int) the number of processes to use. If 1, queries are processed serially
+       in the current process.
+    :return: (list of str) the pathnames of the difference files written
+    """
+    # A duplicate would be computed twice, possibly by two processes writing the same file
+    policies = list(OrderedDict.fromkeys(policies))
+    queries  = list(OrderedDict.fromkeys(queries))
+
+    kwargs = dict(workingDir=workingDir, skiprows=skiprows, interpolate=interpolate,
+                  years=years, startYear=startYear)
+
+    argList = [(query, baseline, policies, kwargs) for query in queries]
+    jobs = min(jobs, len(argList))
+
+    if jobs > 1:
+        from multiprocessing import Pool
+
+        pool = Pool(jobs)
+        try:
+            results = pool.map(_diffQueryStar, argList, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [_diffQueryStar(args) for args in argList]
+
+    return [outFile for outFiles in results for outFile in outFiles]
+
+def _queriesWithResults(scenario, workingDir='.'):
+    """
+    Return the names of the queries for which results exist for `scenario`.
+    """
+    from glob import glob
+
+    suffix = '-%s.csv' % scenario
+    pattern = pathjoin(workingDir, scenario, QueryResultsDir, '*' + suffix)
+    return sorted([os.path.basename(path)[:-len(suffix)] for path in glob(pattern)])
+
 def diffMain(args):
     workingDir = args.workingDir
     mkdirs(workingDir)
@@ -230,39 +408,38 @@ def diffMain(args):
     queryFile   = args.queryFile
     yearStrs    = args.years.split('-')
 
+    years = None
+    startYear = args.startYear
+
     if len(yearStrs) == 2:
         years = yearStrs
-        startYear = args.startYear
-
-    # If a query file is given, we loop over the query names, computing required arguments to performDiff().
-    if queryFile:
-        if len(args.csvFiles) != 2:
-            raise CommandlineError("When --queryFile is specified, 2 positional arguments--the baseline and policy names--are required.")
-
-        baseline, policy = args.csvFiles
-
-        def makePath(query, scenario):
-            return pathjoin(scenario, QueryResultsDir, '%s-%s.csv' % (query, scenario))
 
-        mainPart, extension = os.path.splitext(queryFile)
-
-        if extension.lower() == '.xml':
-            queryFileObj = QueryFile.parse(queryFile)
-            queries = queryFileObj.queryFilenames()
+    # If a query file is given, or --all is specified, we diff each query for
+    # the baseline and policy scenarios named by the positional arguments.
+    if queryFile or args.all:
+        if len(args.csvFiles) < 2:
+            raise CommandlineError("When --queryFile or --all is specified, the positional arguments must be the baseline name followed by one or more policy names.")
+
+        baseline = args.csvFiles[0]
+        policies = args.csvFiles[1:]
+
+        if queryFile:
+            mainPart, extension = os.path.splitext(queryFile)
+
+            if extension.lower() == '.xml':
+                queryFileObj = QueryFile.parse(queryFile)
+                queries = queryFileObj.queryFilenames()
+            else:
+                with open(queryFile, 'rU') as f:    # 'U' converts line separators to '\n' on Windows
+                    lines = f.read()
+                    queries = filter(None, lines.split('\n'))   # eliminates blank lines
         else:
-            with open(queryFile, 'rU') as f:    # 'U' converts line separators to '\n' on Windows
-                lines = f.read()
-                queries = filter(None, lines.split('\n'))   # eliminates blank lines
-
-        for query in queries:
-            baselineFile = queryCsvPathname(query, baseline, workingDir=workingDir)
-            policyFile   = queryCsvPathname(query, policy,   workingDir=workingDir)
-
-            outFile = diffCsvPathname(query, baseline, policy, workingDir=workingDir, createDir=True)
-            _logger.info("Writing %s", outFile)
+            queries = _queriesWithResults(baseline, workingDir=workingDir)
+            if not queries:
+                raise CommandlineError("No query results found for baseline '%s' in '%s'" % (baseline, workingDir))
 
-            writeDiffsToFile(outFile, baselineFile, [policyFile], ext='.csv', skiprows=skiprows,
-                             interpolate=interpolate, years=years, startYear=startYear)
+        diffScenarios(baseline, policies, queries, workingDir=workingDir, skiprows=skiprows,
+                      interpolate=interpolate, years=years, startYear=startYear, jobs=args.jobs)
     else:
         csvFiles = map(ensureCSV, args.csvFiles)
         referenceFile = csvFiles[0]
@@ -280,7 +457,7 @@ def diffMain(args):
 
         if convertOnly or groupSum or sum:
             if convertOnly:
-                csv2xlsx(csvFiles, outFile, skiprows=skiprows, interpolate=interpolate)
+                csv2xlsx(csvFiles, outFile, skiprows=skiprows, interpolate=interpolate, jobs=args.jobs)
             elif groupSum:
                 sumYearsByGroup(groupSum, csvFiles, skiprows=skiprows, interpolate=interpolate)
             elif sum:
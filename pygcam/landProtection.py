@@ -11,12 +11,13 @@ import sys
 
 from lxml import etree as ET
 
-from .config import getParam
+from .config import getParam, getParamAsFloat
 from .constants import UnmanagedLandClasses, GCAM_32_REGIONS
 from .error import FileFormatError, CommandlineError, PygcamException
 from .log import getLogger
 from .utils import mkdirs, pathjoin, flatten, resourceStream
 from .XMLFile import XMLFile
+from .xmlStore import unshareFile
 
 _logger = getLogger(__name__)
 
@@ -67,7 +68,7 @@ class LandProtection(object):
     def getScenario(self, name):
         return Scenario.getScenario(name)
 
-    def protectLandTree(self, tree, scenarioName):
+    def protectLandTree(self, tree, scenarioName, index=None):
         """
         Apply the protection scenario `scenarioName` to the parsed XML file `tree`.
         This interface is provided so WriteFuncs (which are passed an open XMLInputFile)
@@ -75,23 +76,36 @@ class LandProtection(object):
 
         :param tree: (lxml ElementTree) a tree for a parsed XML input file.
         :param scenarioName: (str) the name of the scenario to apply
+        :param index: (LandIndex) an index of `tree`, which is created if not given.
         :return: none
         """
         _logger.info("Applying protection scenario %s", scenarioName)
 
+        scenario = self._getScenario(scenarioName)
+        self._applyScenario(tree, scenario, index=index)
+
+    @staticmethod
+    def _getScenario(scenarioName):
         scenario = Scenario.getScenario(scenarioName)
         if not scenario:
             raise FileFormatError("Scenario '%s' was not found" % scenarioName)
 
+        return scenario
+
+    @staticmethod
+    def _applyScenario(tree, scenario, index=None):
+        index = index or LandIndex(tree)
+
         # Iterate over all definitions for this scenario, applying the protections
         # incrementally to the tree representing the XML file that was read in.
         for protReg in scenario.protRegDict.values():
             regions = [protReg.name]
             for prot in protReg.protections:
-                createProtected(tree, prot.fraction, landClasses=prot.landClasses, regions=regions)
+                createProtected(tree, prot.fraction, landClasses=prot.landClasses, regions=regions, index=index)
 
     # TBD: test this
-    def protectLand(self, infile, outfile, scenarioName, backup=True, unprotectFirst=False):
+    def protectLand(self, infile, outfile, scenarioName, backup=True, unprotectFirst=False,
+                    streaming=None):
         """
         Generate a copy of `infile` with land protected according to `scenarioName`,
         writing the output to `outfile`.
@@ -102,26 +116,48 @@ class LandProtection(object):
         :param backup: if True, create a backup `outfile`, with a '~' appended to the name,
           before writing a new file.
         :param unprotectFirst: (bool) if True, make all land "unprotected" before protecting.
+        :param streaming: (bool or None) if True, process the file one region at a time
+          (see :py:func:`streamRegions`); if None, do so if the file is larger than
+          ``GCAM.LandProtectionStreamingSize``.
         :return: none
         """
+        def protect(tree):
+            index = LandIndex(tree)
+
+            # Remove any existing land protection, if so requested
+            if unprotectFirst:
+                unProtectLand(tree, otherArable=True, index=index)
+
+            self._applyScenario(tree, scenario, index=index)
+
+        def makeBackup():
+            if backup:
+                try:
+                    # Ensure we're not clobbering reference files.
+                    backupFile = outfile + '~'
+                    os.rename(outfile, backupFile)
+                except Exception as e:
+                    PygcamException('Failed to create backup file "%s": %s', backupFile, e)
+
+        if _useStreaming(infile, streaming):
+            _logger.info("Applying protection scenario %s", scenarioName)
+            scenario = self._getScenario(scenarioName)
+
+            _logger.info("Writing '%s'...", outfile)
+            streamRegions(infile, outfile, protect, beforeReplace=makeBackup)
+            return
+
         parser = ET.XMLParser(remove_blank_text=True)
         tree = ET.parse(infile, parser)
 
-        # Remove any existing land protection, if so requested
-        if unprotectFirst:
-            unProtectLand(tree, otherArable=True)
-
-        self.protectLandTree(tree, scenarioName)
+        _logger.info("Applying protection scenario %s", scenarioName)
+        scenario = self._getScenario(scenarioName)
+        protect(tree)
 
-        if backup:
-            try:
-                # Ensure we're not clobbering reference files.
-                backupFile = outfile + '~'
-                os.rename(outfile, backupFile)
-            except Exception as e:
-                PygcamException('Failed to create backup file "%s": %s', backupFile, e)
+        makeBackup()
 
         _logger.info("Writing '%s'...", outfile)
+        unshareFile(outfile)
         tree.write(outfile, xml_declaration=True, pretty_print=True)
 
 
@@ -239,57 +275,198 @@ def _makeLandClassXpath(landClasses, protected=False):
     _logger.debug('landClassXpath: ' + xpath)
     return xpath
 
-def unProtectLand(tree, landClasses=None, otherArable=False, regions=None):
+# Elements holding land areas that are split between protected and unprotected leaves
+_AreaTags = ('allocation', 'landAllocation')
+
+_ProtectedPrefix = 'Protected'
+
+def _defaultLandClasses(landClasses, otherArable):
+    if not landClasses:
+        return UnmanagedLandClasses + (['OtherArableLand'] if otherArable else [])
+
+    if isinstance(landClasses, (str, unicode)):
+        return [landClasses]
+
+    return landClasses
+
+class LandAllocatorIndex(object):
     """
-    Restore the file to 0% land protection by adding the protected land back
-    into its unprotected counterpart and deleting the protected elements.
+    An index of one ``<LandAllocatorRoot>``, built in a single pass, holding its
+    ``<UnmanagedLandLeaf>`` elements in document order and a map from (leaf name,
+    tag, year) to the first ``<allocation>`` or ``<landAllocation>`` element with
+    that tag and year beneath the leaf with that name. This lets land be protected
+    and unprotected without repeatedly searching the tree.
 
-    :param tree: a tree representing a parsed GCAM land_input XML file
-    :param landClasses: a string or a list of strings, or None. If None, all
-           standard unmanaged land classes are modified.
-    :param otherArable: (bool) if True, land class 'OtherArableLand' is
-        included in default land classes.
-    :param regions: a string or a list of strings, or None. If None, all
-           regions are modified.
-    :return: None
+    :param landRoot: an ``lxml.etree.Element`` representing a ``<LandAllocatorRoot>``
     """
-    regionXpath = _makeRegionXpath(regions) if regions else ''
-    landRoots = tree.xpath(regionXpath + '//LandAllocatorRoot')
+    def __init__(self, landRoot):
+        self.landRoot = landRoot
+        self._build()
 
-    if not landClasses:
-        landClasses = UnmanagedLandClasses + (['OtherArableLand'] if otherArable else [])
+    def _build(self):
+        self.leaves = []
+        self.areas  = {}
+
+        for leaf in self.landRoot.iter('UnmanagedLandLeaf'):
+            self._addLeaf(leaf)
 
-    protectedXpath = _makeLandClassXpath(landClasses, protected=True)
+    def _addLeaf(self, leaf):
+        self.leaves.append(leaf)
+        name = leaf.get('name')
+        areas = self.areas
 
-    for landRoot in landRoots:
-        protectedNodes = landRoot.xpath(protectedXpath)
+        for elt in leaf.iter(*_AreaTags):
+            key = (name, elt.tag, elt.get('year'))
+            if key not in areas:
+                areas[key] = elt
 
-        if len(protectedNodes) == 0:
-            continue
+    def matchingLeaves(self, landClasses, protected=False):
+        """
+        Return the leaves whose names begin with any of the given land classes
+        (prefixed by "Protected" if `protected` is True), in document order.
+        """
+        prefix = _ProtectedPrefix if protected else ''
+        prefixes = tuple([prefix + landClass for landClass in landClasses])
+        return [leaf for leaf in self.leaves if (leaf.get('name') or '').startswith(prefixes)]
+
+    def unprotect(self, landClasses):
+        """
+        Add the land in protected leaves for the given land classes back into their
+        unprotected counterparts, and delete all protected land nodes.
 
-        # Find matching not-protected node and add protected land back in
-        for node in protectedNodes:
-            name = node.get('name')
-            unProtectedName = name[len("Protected"):]
-            prefix = './/UnmanagedLandLeaf[@name="%s"]' % unProtectedName
+        :param landClasses: (list of str) the land classes to unprotect
+        :return: none
+        """
+        protectedLeaves = self.matchingLeaves(landClasses, protected=True)
+        if not protectedLeaves:
+            return
 
-            protectedAllocs = node.xpath(".//allocation|.//landAllocation")
+        areas = self.areas
+        for leaf in protectedLeaves:
+            unProtectedName = leaf.get('name')[len(_ProtectedPrefix):]
+
+            for alloc in leaf.iter(*_AreaTags):
+                unprotectedAlloc = areas.get((unProtectedName, alloc.tag, alloc.get('year')))
+                if unprotectedAlloc is None:
+                    raise FileFormatError('No %s for year %s found for land leaf %s' %
+                                          (alloc.tag, alloc.get('year'), unProtectedName))
 
-            for alloc in protectedAllocs:
-                year = alloc.get('year')
-                xpath = prefix + '//%s[@year="%s"]' % (alloc.tag, year)
-                unprotectedAlloc = landRoot.find(xpath)
                 originalArea = float(unprotectedAlloc.text) + float(alloc.text)
                 unprotectedAlloc.text = str(originalArea)
 
         # Remove all the protected nodes, restoring the file to its original state
-        landNodes = landRoot.xpath('./LandNode[starts-with(@name, "Protected")]')
-        for landNode in landNodes:
-            parent = landNode.getparent()
-            parent.remove(landNode)
+        landRoot = self.landRoot
+        for landNode in landRoot.findall('LandNode'):
+            if (landNode.get('name') or '').startswith(_ProtectedPrefix):
+                landRoot.remove(landNode)
+
+        self._build()
+
+    def protect(self, fraction, landClasses):
+        """
+        Protect a `fraction` of the land in each leaf for the given land classes,
+        by adding a protected copy of each leaf holding the protected land.
+
+        :param fraction: (float) the fraction of land to protect
+        :param landClasses: (list of str) the land classes to protect
+        :return: none
+        """
+        # ensure that we're not protecting an already-protected land class in these regions
+        nodes = self.matchingLeaves(landClasses, protected=True)
+        if nodes:
+            node = nodes[0]
+            regNodes = list(node.iterancestors(tag='region'))
+            region = regNodes[0].get('name')
+            raise FileFormatError('Error: Land class %s is already protected in region %s' % (node.tag, region))
+
+        landRoot = self.landRoot
+        unprotectedFraction = 1 - fraction
+        fractionStr = "%.4f" % fraction
+
+        for node in self.matchingLeaves(landClasses):
+            landnode = ET.SubElement(landRoot, 'LandNode')
+            new = copy.deepcopy(node)
+            newName = _ProtectedPrefix + node.get('name')
+            new.set('name', newName)
+            landnode.set('name', newName)
+            landnode.set('fraction', fractionStr)
+            landnode.append(new)
+
+            # The copy's area elements are in the same order as the original's
+            for orig, prot in zip(list(node.iter(*_AreaTags)), list(new.iter(*_AreaTags))):
+                value = float(orig.text)
+                orig.text = str(value * unprotectedFraction)
+                prot.text = str(value * fraction)
+
+            self._addLeaf(new)
+
+class LandIndex(object):
+    """
+    Locates the ``<LandAllocatorRoot>`` elements in a parsed land input file by
+    region, creating a :py:class:`LandAllocatorIndex` for each the first time
+    it's used. Pass the same LandIndex to successive calls to
+    :py:func:`createProtected` and :py:func:`unProtectLand` on a tree to avoid
+    re-indexing it.
+
+    :param tree: a tree representing a parsed GCAM land_input XML file
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.rootsByRegion = None
+        self.indices = {}       # keyed by LandAllocatorRoot element
+
+    def _index(self, landRoot):
+        index = self.indices.get(landRoot)
+        if index is None:
+            index = self.indices[landRoot] = LandAllocatorIndex(landRoot)
+
+        return index
+
+    def landRoots(self, regions=None):
+        """
+        Return the indices of the ``<LandAllocatorRoot>`` elements in the given regions.
+
+        :param regions: a string or a list of strings, or None. If None, all
+           land allocators are returned.
+        :return: (list of LandAllocatorIndex)
+        """
+        if not regions:
+            return [self._index(landRoot) for landRoot in self.tree.iter('LandAllocatorRoot')]
+
+        if isinstance(regions, (str, unicode)):
+            regions = [regions]
+
+        if self.rootsByRegion is None:
+            self.rootsByRegion = rootsByRegion = {}
+            for region in self.tree.iter('region'):
+                rootsByRegion.setdefault(region.get('name'), []).extend(region.iter('LandAllocatorRoot'))
+
+        landRoots = flatten([self.rootsByRegion.get(region, []) for region in set(regions)])
+        return [self._index(landRoot) for landRoot in landRoots]
+
+def unProtectLand(tree, landClasses=None, otherArable=False, regions=None, index=None):
+    """
+    Restore the file to 0% land protection by adding the protected land back
+    into its unprotected counterpart and deleting the protected elements.
+
+    :param tree: a tree representing a parsed GCAM land_input XML file
+    :param landClasses: a string or a list of strings, or None. If None, all
+           standard unmanaged land classes are modified.
+    :param otherArable: (bool) if True, land class 'OtherArableLand' is
+        included in default land classes.
+    :param regions: a string or a list of strings, or None. If None, all
+           regions are modified.
+    :param index: (LandIndex) an index of `tree`, which is created if not given.
+    :return: None
+    """
+    index = index or LandIndex(tree)
+    landClasses = _defaultLandClasses(landClasses, otherArable)
+
+    for landRoot in index.landRoots(regions):
+        landRoot.unprotect(landClasses)
 
 def createProtected(tree, fraction, landClasses=None, otherArable=False,
-                    regions=None, unprotectFirst=False):
+                    regions=None, unprotectFirst=False, index=None):
     """
     Modify an lxml tree representing a GCAM input file to protect a `fraction`
     of `landClasses` in `regions`.
@@ -304,59 +481,158 @@ def createProtected(tree, fraction, landClasses=None, otherArable=False,
            regions are modified.
     :param unprotectFirst: (bool) if True, make all land "unprotected" before
            protecting.
+    :param index: (LandIndex) an index of `tree`, which is created if not given.
     :return: None
     """
     _logger.debug('createProtected: fraction=%.2f, landClasses=%s, regions=%s, unprotect=%s',
                   fraction, landClasses, regions, unprotectFirst)
 
-    def multiplyValues(nodes, factor):
-        for n in nodes:
-            newValue = float(n.text) * factor
-            n.text = str(newValue)
+    index = index or LandIndex(tree)
 
     # Remove any existing land protection, if so requested
     if unprotectFirst:
-        unProtectLand(tree, landClasses=landClasses, otherArable=otherArable, regions=regions)
+        unProtectLand(tree, landClasses=landClasses, otherArable=otherArable, regions=regions, index=index)
 
-    regionXpath = (_makeRegionXpath(regions) if regions else '') + '//LandAllocatorRoot'
-    landRoots = tree.xpath(regionXpath)
+    landClasses = _defaultLandClasses(landClasses, otherArable)
 
-    if not landClasses:
-        landClasses = UnmanagedLandClasses + (['OtherArableLand'] if otherArable else [])
+    for landRoot in index.landRoots(regions):
+        landRoot.protect(fraction, landClasses)
 
-    unmgdXpath     = _makeLandClassXpath(landClasses)
-    protectedXpath = _makeLandClassXpath(landClasses, protected=True)
+def _useStreaming(infile, streaming=None):
+    """
+    Decide whether to process `infile` one region at a time. If `streaming`
+    is None, stream files larger than ``GCAM.LandProtectionStreamingSize`` MB.
+    """
+    if streaming is None:
+        threshold = getParamAsFloat('GCAM.LandProtectionStreamingSize')
+        streaming = bool(threshold) and os.path.getsize(infile) > threshold * 1024 * 1024
 
-    allocXpath = ".//allocation|.//landAllocation"
+    return streaming
 
-    for landRoot in landRoots:
-        # ensure that we're not protecting an already-protected land class in these regions
-        nodes = landRoot.xpath(protectedXpath)
-        if len(nodes) > 0:
-            node = nodes[0]
-            regNodes = list(node.iterancestors(tag='region'))
-            region = regNodes[0].get('name')
-            raise FileFormatError('Error: Land class %s is already protected in region %s' % (node.tag, region))
+def _startTag(elt):
+    # Let lxml handle the serialization and escaping of attributes
+    shallow = ET.Element(elt.tag, attrib=dict(elt.attrib))
+    shallow.text = 'x'
+    text = ET.tostring(shallow)
+    return text[:text.rindex(b'x</')]
 
-        nodes = landRoot.xpath(unmgdXpath)
+def _serialize(elt, depth):
+    """
+    Serialize `elt` exactly as it appears at nesting level `depth` in a pretty-printed
+    document, by placing it (which removes it from its parent) within `depth` dummy
+    elements and discarding the lines for the dummies.
+    """
+    if depth == 0:
+        return ET.tostring(elt, pretty_print=True)
 
-        for node in nodes:
-            landnode = ET.SubElement(landRoot, 'LandNode')
-            new = copy.deepcopy(node)
-            newName = 'Protected' + node.get('name')
-            new.set('name', newName)
-            landnode.set('name', newName)
-            landnode.set('fraction', "%.4f" %fraction)
-            landnode.append(new)
+    outer = inner = ET.Element('_')
+    for i in range(depth - 1):
+        inner = ET.SubElement(inner, '_')
+
+    inner.append(elt)
+    lines = ET.tostring(outer, pretty_print=True).splitlines(True)
+    return b''.join(lines[depth:-depth])
+
+def streamRegions(infile, outfile, func, beforeReplace=None):
+    """
+    Apply `func` to each ``<region>`` element of XML file `infile`, writing the
+    result to `outfile`. The input is parsed incrementally, and each region is
+    written and discarded once `func` has been applied to it, so memory use is
+    bounded by the size of the largest region rather than the whole file. The
+    result is identical to parsing the file, calling `func` on each region, and
+    writing the tree as :py:func:`protectLand` does.
+
+    The output is written to a temporary file which is renamed to `outfile` on
+    success, so `infile` and `outfile` may be the same file.
+
+    :param infile: (str) the pathname of an XML file, e.g., a GCAM land_input file
+    :param outfile: (str) the pathname of the file to create
+    :param func: (callable) a function of one argument, a ``<region>`` element,
+        which may modify the region's subtree in place.
+    :param beforeReplace: (callable) a function of no arguments called just
+        before the temporary file is renamed to `outfile`, e.g., to make a backup.
+    :return: none
+    """
+    indent = b'  '
+    tmpFile = outfile + '.tmp'
+
+    def writeChildren(out, parent, depth, stop=None):
+        # Write and discard the (complete) children of `parent` preceding `stop`
+        while len(parent) and parent[0] is not stop:
+            out.write(_serialize(parent[0], depth))
+
+    def closeElement(out, elt, depth):
+        writeChildren(out, elt, depth + 1)
+        out.write(indent * depth + b'</' + elt.tag.encode('ascii') + b'>\n')
+
+        parent = elt.getparent()
+        if parent is not None:
+            parent.remove(elt)
+
+    context = ET.iterparse(infile, events=('end',), tag='region', remove_blank_text=True)
+    opened = []     # elements whose start tags have been written, from the root down
+    count = 0
 
-            originalAreas = node.xpath(allocXpath)
-            protectedAreas = new.xpath(allocXpath)
+    try:
+        with open(tmpFile, 'wb') as out:
+            out.write(b"<?xml version='1.0' encoding='ASCII'?>\n")
 
-            multiplyValues(originalAreas, 1 - fraction)
-            multiplyValues(protectedAreas, fraction)
+            for event, region in context:
+                func(region)
+                count += 1
+
+                chain = list(region.iterancestors())
+                chain.reverse()
+
+                common = 0
+                while common < min(len(opened), len(chain)) and opened[common] is chain[common]:
+                    common += 1
+
+                # close elements that aren't ancestors of this region
+                while len(opened) > common:
+                    closeElement(out, opened.pop(), len(opened))
+
+                for elt in chain[common:]:
+                    if opened:
+                        writeChildren(out, opened[-1], len(opened), stop=elt)
+                    else:
+                        for sibling in reversed(list(elt.itersiblings(preceding=True))):
+                            out.write(ET.tostring(sibling) + b'\n')
+
+                    out.write(indent * len(opened) + _startTag(elt) + b'\n')
+                    opened.append(elt)
+
+                if opened:
+                    writeChildren(out, opened[-1], len(opened), stop=region)
+
+                out.write(_serialize(region, len(opened)))
+
+            if opened:
+                root = opened[0]
+                while opened:
+                    closeElement(out, opened.pop(), len(opened))
+
+                for sibling in root.itersiblings():
+                    out.write(ET.tostring(sibling) + b'\n')
+            elif count == 0:
+                # no regions, so the whole document is still in memory
+                out.write(ET.tostring(context.root.getroottree(), pretty_print=True))
+
+    except BaseException:
+        # don't leave a (possibly very large) partial file behind
+        if os.path.lexists(tmpFile):
+            os.remove(tmpFile)
+        raise
+
+    if beforeReplace:
+        beforeReplace()
+
+    if os.path.lexists(outfile):
+        os.remove(outfile)      # required on Windows
+    os.rename(tmpFile, outfile)
 
 def protectLand(infile, outfile, fraction, landClasses=None, otherArable=False,
-                regions=None, unprotectFirst=False):
+                regions=None, unprotectFirst=False, streaming=None):
     """
     Create a copy of `infile` that protects a `fraction` of `landClasses` in `regions`.
 
@@ -371,13 +647,24 @@ def protectLand(infile, outfile, fraction, landClasses=None, otherArable=False,
         regions are modified.
     :param unprotectFirst: (bool) if True, make all land "unprotected" before
         protecting.
+    :param streaming: (bool or None) if True, process the file one region at a time
+        (see :py:func:`streamRegions`); if None, do so if the file is larger than
+        ``GCAM.LandProtectionStreamingSize``.
     :return: None
     """
+    def protect(tree):
+        createProtected(tree, fraction, landClasses=landClasses, otherArable=otherArable,
+                        regions=regions, unprotectFirst=unprotectFirst)
+
+    if _useStreaming(infile, streaming):
+        streamRegions(infile, outfile, protect)
+        return
+
     parser = ET.XMLParser(remove_blank_text=True)
     tree = ET.parse(infile, parser)
 
-    createProtected(tree, fraction, landClasses=landClasses, otherArable=otherArable,
-                    regions=regions, unprotectFirst=unprotectFirst)
+    protect(tree)
+    unshareFile(outfile)
     tree.write(outfile, xml_declaration=True, pretty_print=True)
 
 _LandXmlFiles = ['land2.xml', 'land3.xml']
@@ -395,7 +682,7 @@ def parseLandProtectionFile(scenarioFile=None):
 
 def runProtectionScenario(scenarioName, outputDir=None, workspace=None,
                           scenarioFile=None, xmlFiles=None, inPlace=False,
-                          unprotectFirst=False):
+                          unprotectFirst=False, streaming=None):
     """
     Run the protection named by `scenarioName`, found in `scenarioFile` if given,
     or the value of config variable `GCAM.LandProtectionXmlFile` otherwise. The source
@@ -416,6 +703,9 @@ def runProtectionScenario(scenarioName, outputDir=None, workspace=None,
     :param inPlace: (bool) if True, input and output files may be the same (output overwrites input).
     :param unprotectFirst: (bool) if True, make all land "unprotected" before
            protecting.
+    :param streaming: (bool or None) if True, process files one region at a time
+           (see :py:func:`streamRegions`); if None, do so for files larger than
+           ``GCAM.LandProtectionStreamingSize``.
     :return: none
     """
     _logger.debug("Land-protection scenario '%s'", scenarioName)
@@ -433,7 +723,8 @@ def runProtectionScenario(scenarioName, outputDir=None, workspace=None,
         if not inPlace and os.path.lexists(outFile) and os.path.samefile(inFile, outFile):
             raise CommandlineError("Attempted to overwrite '%s' but --inPlace was not specified." % inFile)
 
-        landProtection.protectLand(inFile, outFile, scenarioName, unprotectFirst=unprotectFirst)
+        landProtection.protectLand(inFile, outFile, scenarioName, unprotectFirst=unprotectFirst,
+                                   streaming=streaming)
 
 def protectLandMain(args):
 
@@ -0,0 +1,317 @@
+'''
+.. The "LOCAL" batch system, which runs the jobs queued by "gt +b" or
+   "gt run --distribute" on this computer rather than on a cluster.
+
+   Jobs are saved as files in the directory given by config variable
+   ``GCAM.LocalQueueDir``, so the queue outlives the process that submits
+   them. Submitting a job starts a runner process, if one isn't running,
+   which runs queued jobs in up to ``GCAM.LocalQueueSlots`` processes at
+   once and exits when the queue is empty. As with the ``afterok``
+   dependency used with SLURM, a job that depends on another is run only
+   after that job succeeds, and is skipped if it fails.
+
+.. Copyright (c) 2017 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+from __future__ import print_function
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+from .error import PygcamException
+
+try:
+    import fcntl        # not available on Windows
+except ImportError:
+    fcntl = None
+
+# Set in each job's environment, like SLURM_JOB_ID
+JOB_ID_VAR = 'LOCAL_JOB_ID'
+
+QUEUED    = 'queued'
+RUNNING   = 'running'
+SUCCEEDED = 'succeeded'
+FAILED    = 'failed'
+SKIPPED   = 'skipped'
+
+_Finished = (SUCCEEDED, FAILED, SKIPPED)
+
+class LocalQueue(object):
+    """
+    A queue of jobs stored in `queueDir`. Each job is a dict saved as
+    ``{queueDir}/jobs/{jobId}.json``. Since a job records the environment it
+    runs in, the queue is readable only by its owner.
+    """
+    def __init__(self, queueDir):
+        self.queueDir = os.path.abspath(queueDir)
+        self.jobDir = os.path.join(self.queueDir, 'jobs')
+        self.runnerLockFile = os.path.join(self.queueDir, 'runner.lock')
+
+    @classmethod
+    def getInstance(cls):
+        """
+        Return the queue in the directory given by config variable ``GCAM.LocalQueueDir``.
+        """
+        from .config import getParam
+        return cls(getParam('GCAM.LocalQueueDir'))
+
+    @contextmanager
+    def _lock(self):
+        """
+        Context manager that serializes access to the queue among processes.
+        """
+        from .utils import mkdirs
+
+        if not fcntl:
+            raise PygcamException("The LOCAL batch system is not supported on Windows")
+
+        mkdirs(self.jobDir)
+        for dirname in (self.queueDir, self.jobDir):
+            os.chmod(dirname, 0o700)
+
+        with open(os.path.join(self.queueDir, '.lock'), 'w') as lockFile:
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+    def _jobPath(self, jobId):
+        return os.path.join(self.jobDir, '%d.json' % jobId)
+
+    def _writeJob(self, job):
+        path = self._jobPath(job['id'])
+        tmpFile = path + '.tmp'
+        fd = os.open(tmpFile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(job, f, indent=2)
+        os.rename(tmpFile, path)
+
+    def jobs(self):
+        """
+        Return all jobs in the queue, including finished ones, in order of submission.
+        """
+        jobs = []
+        for name in os.listdir(self.jobDir) if os.path.isdir(self.jobDir) else []:
+            if name.endswith('.json'):
+                with open(os.path.join(self.jobDir, name)) as f:
+                    jobs.append(json.load(f))
+
+        return sorted(jobs, key=lambda job: job['id'])
+
+    def _nextId(self):
+        path = os.path.join(self.queueDir, 'lastJobId')
+        jobId = 1
+        if os.path.exists(path):
+            with open(path) as f:
+                jobId = int(f.read()) + 1
+
+        with open(path, 'w') as f:
+            f.write('%d\n' % jobId)
+
+        return jobId
+
+    def submit(self, command, jobName='gt', logFile=None, dependsOn=None, slots=1, startRunner=True):
+        """
+        Add a job to the queue and start a runner process if none is running.
+
+        :param command: (str) the shell command to run. It is run in the current
+            directory with the current environment.
+        :param jobName: (str) a name for the job
+        :param logFile: (str) the pathname of a file to which to write the job's
+            output. Any "%j" is replaced by the job ID.
+        :param dependsOn: (int or list of int) the IDs of jobs that must succeed
+            before this job is run.
+        :param slots: (int) the number of jobs to run at once if a runner is started
+        :param startRunner: (bool) if False, don't start a runner
+        :return: (int) the job ID
+        """
+        if dependsOn is None:
+            dependsOn = []
+        elif not isinstance(dependsOn, (list, tuple)):
+            dependsOn = [dependsOn]
+
+        with self._lock():
+            jobId = self._nextId()
+            env = dict(os.environ)
+            env[JOB_ID_VAR] = str(jobId)
+
+            job = {'id'        : jobId,
+                   'name'      : jobName,
+                   'command'   : command,
+                   'cwd'       : os.getcwd(),
+                   'env'       : env,
+                   'logFile'   : logFile.replace('%j', str(jobId)) if logFile else None,
+                   'dependsOn' : [int(dep) for dep in dependsOn],
+                   'state'     : QUEUED,
+                   'submitted' : time.time()}
+            self._writeJob(job)
+
+            if startRunner and not self.runnerActive():
+                self._startRunner(slots)
+
+        return jobId
+
+    def _takeRunnerLock(self):
+        """
+        Take the lock that a runner holds for its lifetime. The OS releases
+        the lock if the runner dies, so unlike a pid file, it can't go stale.
+
+        :return: (file) the open lock file, which releases the lock when
+            closed, or None if another process holds the lock.
+        """
+        lockFile = open(self.runnerLockFile, 'a')
+        try:
+            fcntl.flock(lockFile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            lockFile.close()
+            return None
+
+        return lockFile
+
+    def runnerActive(self):
+        """
+        Return True if a runner is processing the queue.
+        """
+        lockFile = self._takeRunnerLock()
+        if lockFile is None:
+            return True
+
+        lockFile.close()
+        return False
+
+    def _startRunner(self, slots):
+        # If two runners are started before either takes the runner lock,
+        # the one that doesn't get it exits.
+        with open(os.devnull) as devnull, open(os.path.join(self.queueDir, 'runner.log'), 'a') as log:
+            subprocess.Popen([sys.executable, '-m', 'pygcam.localQueue', '--slots', str(slots), self.queueDir],
+                             stdin=devnull, stdout=log, stderr=subprocess.STDOUT,
+                             close_fds=True, preexec_fn=os.setsid)   # survive the submitter's exit
+
+    def _startJob(self, job):
+        from .utils import mkdirs
+
+        logFile = job['logFile'] or os.devnull
+        if job['logFile']:
+            mkdirs(os.path.dirname(logFile))
+
+        with open(logFile, 'a') as log:
+            proc = subprocess.Popen(job['command'], shell=True, cwd=job['cwd'], env=job['env'],
+                                    stdout=log, stderr=subprocess.STDOUT, close_fds=True)
+
+        job.update(state=RUNNING, pid=proc.pid, started=time.time())
+        self._writeJob(job)
+        return proc
+
+    def run(self, slots, pollInterval=1.0):
+        """
+        Run queued jobs, up to `slots` at a time, until none remain. Jobs are
+        started in order of submission once the jobs they depend on have succeeded.
+
+        :param slots: (int) the maximum number of jobs to run at once
+        :param pollInterval: (float) the number of seconds to wait between checks
+            for finished and newly queued jobs
+        :return: none
+        """
+        with self._lock():
+            runnerLock = self._takeRunnerLock()
+            if runnerLock is None:
+                return      # another runner is active
+
+            # Jobs left running by a runner that died can't be tracked
+            for job in self.jobs():
+                if job['state'] == RUNNING:
+                    job.update(state=FAILED, error='runner exited', finished=time.time())
+                    self._writeJob(job)
+
+        try:
+            self._runJobs(slots, pollInterval, runnerLock)
+        finally:
+            runnerLock.close()
+
+    def _runJobs(self, slots, pollInterval, runnerLock):
+        procs = {}      # Popen objects for running jobs, by job ID
+
+        while True:
+            with self._lock():
+                jobs = self.jobs()
+                byId = {job['id'] : job for job in jobs}
+
+                for job in jobs:
+                    proc = procs.get(job['id'])
+                    if proc and proc.poll() is not None:
+                        del procs[job['id']]
+                        job.update(state=SUCCEEDED if proc.returncode == 0 else FAILED,
+                                   exitStatus=proc.returncode, finished=time.time())
+                        self._writeJob(job)
+
+                # Start (or skip) queued jobs in order, repeating until nothing changes
+                # so the dependents of a skipped job are skipped, too.
+                changed = True
+                while changed:
+                    changed = False
+                    for job in jobs:
+                        if job['state'] != QUEUED:
+                            continue
+
+                        states = [byId[dep]['state'] if dep in byId else FAILED for dep in job['dependsOn']]
+
+                        if FAILED in states or SKIPPED in states:
+                            job.update(state=SKIPPED, error='a job it depends on did not succeed',
+                                       finished=time.time())
+                            self._writeJob(job)
+                            changed = True
+
+                        elif all(state == SUCCEEDED for state in states) and len(procs) < slots:
+                            procs[job['id']] = self._startJob(job)
+
+                # Release the runner lock while holding the queue lock, so a job
+                # submitted after this check finds no runner and starts one.
+                if not (procs or any(job['state'] == QUEUED for job in jobs)):
+                    runnerLock.close()
+                    return
+
+            time.sleep(pollInterval)
+
+    def clean(self):
+        """
+        Delete the records of finished jobs.
+
+        :return: (int) the number of records deleted
+        """
+        count = 0
+        with self._lock():
+            for job in self.jobs():
+                if job['state'] in _Finished:
+                    os.remove(self._jobPath(job['id']))
+                    count += 1
+
+        return count
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='''Run, list, or clean up the jobs in a
+                                     local queue. (The runner is normally started automatically.)''')
+    parser.add_argument('queueDir', help='The directory holding the queue')
+    parser.add_argument('-c', '--clean', action='store_true', help='Delete the records of finished jobs')
+    parser.add_argument('-l', '--list', action='store_true', help='List the jobs in the queue')
+    parser.add_argument('-s', '--slots', type=int, default=1, help='The number of jobs to run at once')
+    args = parser.parse_args(argv)
+
+    queue = LocalQueue(args.queueDir)
+
+    if args.list:
+        for job in queue.jobs():
+            print("%6d  %-9s  %-12s  %s" % (job['id'], job['state'], job['name'], job['command']))
+    elif args.clean:
+        print("Deleted %d finished jobs" % queue.clean())
+    else:
+        queue.run(args.slots)
+
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,9 @@ from datetime import datetime
 import pandas as pd
 
 from ..config import getParam
+from ..csvCache import readCachedCsv
 from ..log import getLogger
+from ..queryResult import QueryResult as BaseQueryResult
 from ..XMLFile import XMLFile
 from .error import PygcamMcsUserError, PygcamMcsSystemError, FileMissingError
 from .Database import getDatabase
@@ -47,14 +49,21 @@ class XMLConstraint(XMLWrapper):
             if not self.value:
                 raise PygcamMcsUserError('Constraint with operator "%s" is missing a value' % self.op)
 
+    def _normalizedOp(self):
+        return '==' if self.op in self.equal else ('!=' if self.op in self.notEqual else None)
+
     def asString(self):
-        op = '==' if self.op in self.equal else ('!=' if self.op in self.notEqual else None)
+        op = self._normalizedOp()
 
         if op:
             return "%s %s %r" % (self.column, op, self.value)
 
         return None
 
+    def asTuple(self):
+        op = self._normalizedOp()
+        return (self.column, op, self.value) if op else None
+
 
 class XMLColumn(XMLWrapper):
     def __init__(self, element):
@@ -75,11 +84,14 @@ class XMLResult(XMLWrapper):
         col = self.element.find(COLUMN_ELT_NAME)
         self.column = XMLColumn(col) if col is not None else None
 
-        # Create the "where" clause to use with a DataFrame.query() on the results we'll read in
+        # Create the "where" clause describing the constraints on the results we'll read in
         self.constraints = map(XMLConstraint, self.element.iterfind(CONSTRAINT_ELT_NAME))
         constraintStrings = filter(None, map(XMLConstraint.asString, self.constraints))
         self.whereClause = ' and '.join(constraintStrings)
 
+        # ...and the equivalent (column, op, value) tuples for QueryResult.select()
+        self.selectors = [c.asTuple() for c in self.constraints if c.asTuple()]
+
     def isScalar(self):
         return self.column is not None
 
@@ -161,16 +173,21 @@ class XMLResultFile(XMLFile):
         obj = cls(resultsFile)
         obj.saveOutputDefs()
 
-class QueryResult(object):
+class QueryResult(BaseQueryResult):
     '''
-    Holds the results of an XPath batch query
+    Holds the results of an XPath batch query, in the compact form provided by
+    :py:class:`pygcam.queryResult.QueryResult`.
     '''
     def __init__(self, filename):
         self.filename = filename
-        self.title = None
-        self.df    = None
         self.units = None
-        self.readCSV()
+
+        title, compact = self.readCSV()
+        super(QueryResult, self).__init__(compact.dims, compact.years, compact.values,
+                                          columns=compact.columns, title=title)
+
+        if 'Units' in self.dims:
+            self.units = self.dims['Units'][0]
 
     @staticmethod
     def parseScenarioString(scenStr):
@@ -202,25 +219,27 @@ class QueryResult(object):
         the second line provides the column headings; all subsequent lines are data. Data
         are comma-delimited, and strings with spaces are double-quoted. Assume units are
         the same as in the first row of data.
+
+        :return: (tuple of str, pygcam.queryResult.QueryResult) the title and data
         '''
-        _logger.debug("readCSV: reading %s", self.filename)
-        with open(self.filename) as f:
-            self.title  = f.readline().strip()
-            self.df = pd.read_table(f, sep=',', header=0, index_col=False, quoting=0)
+        def reader(filename):
+            _logger.debug("readCSV: reading %s", filename)
+            with open(filename) as f:
+                title = f.readline().strip()
+                df = pd.read_table(f, sep=',', header=0, index_col=False, quoting=0)
 
-        df = self.df
+            # split the scenario field into two parts; here we create the columns
+            df['ScenarioName'] = None
+            df['ScenarioDate'] = None
 
-        if 'Units' in df.columns:
-            self.units = df.Units[0]
+            if 'scenario' in df.columns:        # not the case for "diff" files
+                name, date = QueryResult.parseScenarioString(df.loc[0].scenario)
+                df['ScenarioName'] = name
+                df['ScenarioDate'] = date
 
-        # split the scenario field into two parts; here we create the columns
-        df['ScenarioName'] = None
-        df['ScenarioDate'] = None
+            return title, BaseQueryResult.fromDataFrame(df)
 
-        if 'scenario' in df.columns:        # not the case for "diff" files
-            name, date = self.parseScenarioString(df.loc[0].scenario)
-            df['ScenarioName'] = name
-            df['ScenarioDate'] = date
+        return readCachedCsv(self.filename, 'QueryResult:compact', reader)
 
     def getFilename(self):
         return self.filename
@@ -229,7 +248,12 @@ class QueryResult(object):
         return self.title
 
     def getData(self):
-        return self.df
+        return self.toDataFrame()
+
+    @property
+    def df(self):
+        # For compatibility; the DataFrame is recreated on each access
+        return self.toDataFrame()
 
 
 def collectResults(context, type):
@@ -291,19 +315,20 @@ def collectResults(context, type):
         paramName   = output.name
         whereClause = output.whereClause
 
-        selected = queryResult.df.query(whereClause) if whereClause else queryResult.df
-        count = selected.shape[0]
+        selected = queryResult.select(output.selectors)
+        count = len(selected)
         if count == 0:
             raise PygcamMcsUserError('Query where clause(%r) matched no results' % whereClause)
 
-        if 'region' in selected.columns:
-            firstRegion = selected.region.iloc[0]
+        if 'region' in selected.dims:
+            regions = selected.column('region')
+            firstRegion = regions[0]
             if count == 1:
                 regionName = firstRegion
             else:
                 _logger.debug(
                     "Query where clause (%r) yielded %d rows; year columns will be summed" % (whereClause, count))
-                regionName = firstRegion if len(selected.region.unique()) == 1 else 'Multiple'
+                regionName = firstRegion if len(set(regions)) == 1 else 'Multiple'
         else:
             regionName = 'global'
 
@@ -312,13 +337,13 @@ def collectResults(context, type):
 
         if output.isScalar():
             colName = output.columnName()
-            value = selected[colName].iloc[0]
+            value = selected.column(colName)[0]
             resultDict['isScalar'] = True
         else:
             # When no column name is specified, assume this is a time-series result, so save all years.
             # Use sum() to collapse values to a single time series; for a single row it helpfully
             # converts the 1-element series to a simple float.
-            value = {colName: selected[yearStr].sum() for colName, yearStr in zip(yearCols, activeYears)}
+            value = {colName: selected.column(yearStr).sum() for colName, yearStr in zip(yearCols, activeYears)}
             resultDict['isScalar'] = False
             resultDict['units'] = queryResult.units
 
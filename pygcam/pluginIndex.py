@@ -0,0 +1,198 @@
+'''
+.. A persistent index of the sub-commands defined by built-in and user plugins,
+   which lets "gt" import and build the parser for only the sub-command it runs.
+
+.. Copyright (c) 2017 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+import argparse
+import json
+import os
+from collections import OrderedDict
+from glob import glob
+from importlib import import_module
+
+from .config import getParam
+from .error import PygcamException
+from .log import getLogger
+from .subcommand import SubcommandABC
+from .version import VERSION
+from .windows import IsWindows
+
+_logger = getLogger(__name__)
+
+PLUGIN_SUFFIX = '_plugin.py'
+
+class _ParserRecorder(object):
+    """
+    Stands in for the object returned by argparse's ``add_subparsers()`` to
+    capture the keyword args (e.g., the help text) a plugin passes to ``add_parser()``.
+    """
+    def __init__(self):
+        self.subparsers = argparse.ArgumentParser().add_subparsers()
+        self.kwargs = {}
+
+    def add_parser(self, name, **kwargs):
+        self.kwargs[name] = kwargs
+        return self.subparsers.add_parser(name, **kwargs)
+
+
+class PluginIndex(object):
+    """
+    Describes each sub-command by the module and class that implement it and its help
+    text, and saves these descriptions in the file named by config variable
+    ``GCAM.PluginIndexFile``. The descriptions of the plugins in a directory are
+    regenerated (by loading each plugin) when the directory's modification time changes,
+    i.e., when a plugin is added, removed, or renamed, and the entire index is regenerated
+    when the pygcam version changes. (Editing a plugin in place doesn't alter the directory,
+    but only the help text could then be stale, and that only in the ``gt -h`` message.)
+
+    An index entry is a dict holding either 'module', the dotted name of a built-in
+    module, or 'path', the pathname of a user's plugin file, plus 'attr', the name of
+    the plugin class in that module, and 'help', the sub-command's help text.
+    """
+    def __init__(self, filename=None):
+        self.filename = getParam('GCAM.PluginIndexFile') if filename is None else filename
+        self.data = self._read()
+        self.changed = False
+        self.modules = {}       # user plugin modules loaded while indexing, by pathname
+
+    def _read(self):
+        if self.filename and os.path.exists(self.filename):
+            try:
+                with open(self.filename) as f:
+                    data = json.load(f, object_pairs_hook=OrderedDict)
+
+                if data.get('version') == VERSION:
+                    return data
+
+            except (IOError, ValueError) as e:
+                _logger.debug("Ignoring plugin index %s: %s", self.filename, e)
+
+        return OrderedDict([('version', VERSION), ('dirs', OrderedDict())])
+
+    def _cached(self, dirname):
+        """
+        Return the commands indexed for `dirname`, or None if they are out of date.
+        """
+        entry = self.data['dirs'].get(dirname)
+        if entry and entry['mtime'] == os.path.getmtime(dirname):
+            return entry['commands']
+
+        return None
+
+    def _update(self, dirname, commands):
+        self.data['dirs'][dirname] = OrderedDict([('mtime', os.path.getmtime(dirname)),
+                                                  ('commands', commands)])
+        self.changed = True
+
+    @staticmethod
+    def _describe(pluginClass, **location):
+        """
+        Instantiate `pluginClass` using a throwaway parser to get its name and help text.
+        """
+        recorder = _ParserRecorder()
+        instances = dict(SubcommandABC.Instances)
+        try:
+            plugin = pluginClass(recorder)
+        finally:
+            # don't leave behind an instance tied to the throwaway parser
+            SubcommandABC.Instances.clear()
+            SubcommandABC.Instances.update(instances)
+
+        location['help'] = recorder.kwargs[plugin.name].get('help', '')
+        return plugin.name, location
+
+    def builtins(self, package, subcommands):
+        """
+        Return index entries for built-in sub-commands.
+
+        :param package: (str) the dotted name of the package holding the plugins,
+            e.g., 'pygcam.built_ins'
+        :param subcommands: (list of (str, str)) the names of the module (within
+            `package`) and class defining each sub-command
+        :return: (OrderedDict) index entries keyed by sub-command name
+        """
+        dirname = os.path.dirname(os.path.abspath(import_module(package).__file__))
+        commands = self._cached(dirname)
+
+        if commands is None:
+            commands = OrderedDict()
+            for modName, className in subcommands:
+                module = package + '.' + modName
+                pluginClass = getattr(import_module(module), className)
+                name, entry = self._describe(pluginClass, module=module, attr=className)
+                commands[name] = entry
+
+            self._update(dirname, commands)
+
+        return commands
+
+    def plugins(self, dirname):
+        """
+        Return index entries for the plugins, i.e., files matching ``*_plugin.py``,
+        in the directory `dirname`.
+
+        :param dirname: (str) a directory from GCAM.PluginPath
+        :return: (OrderedDict) index entries keyed by sub-command name
+        """
+        from .utils import loadModuleFromPath, pathjoin
+
+        dirname = os.path.abspath(dirname)
+        if not os.path.isdir(dirname):
+            return OrderedDict()
+
+        commands = self._cached(dirname)
+
+        if commands is None:
+            commands = OrderedDict()
+            for path in sorted(glob(pathjoin(dirname, '*' + PLUGIN_SUFFIX))):
+                mod = self.modules[path] = loadModuleFromPath(path)
+
+                attrs = [attr for attr in ('PluginClass', 'Plugin') if attr in mod.__dict__]
+                if not attrs:
+                    raise PygcamException('Neither PluginClass nor class Plugin are defined in %s' % path)
+
+                name, entry = self._describe(getattr(mod, attrs[0]), path=path, attr=attrs[0])
+                commands[name] = entry
+
+            self._update(dirname, commands)
+
+        return commands
+
+    def pluginClass(self, entry):
+        """
+        Import the module identified by an index entry and return its plugin class.
+        """
+        from .utils import loadModuleFromPath
+
+        if 'module' in entry:
+            mod = import_module(entry['module'])
+        else:
+            path = entry['path']
+            mod = self.modules.get(path) or loadModuleFromPath(path)
+
+        return getattr(mod, entry['attr'])
+
+    def save(self):
+        """
+        Write the index file if the index has changed. Failure to write it
+        (e.g., to a read-only directory) just means it is rebuilt next time.
+        """
+        if not (self.changed and self.filename):
+            return
+
+        tmpFile = '%s.%d.tmp' % (self.filename, os.getpid())
+        try:
+            with open(tmpFile, 'w') as f:
+                json.dump(self.data, f, indent=2)
+
+            if IsWindows and os.path.exists(self.filename):
+                os.remove(self.filename)    # Windows won't rename over an existing file
+            os.rename(tmpFile, self.filename)
+            self.changed = False
+
+        except (IOError, OSError) as e:
+            _logger.debug("Can't write plugin index %s: %s", self.filename, e)
+            if os.path.exists(tmpFile):
+                os.remove(tmpFile)
@@ -9,17 +9,19 @@
 from __future__ import print_function
 from copy import copy
 import glob
+import json
 import os
 import re
 import shlex
 import sys
+import time
 from os.path import join
 
 from lxml import etree as ET
 
 from .config import getParam, setParam, getConfigDict
 from .constants import LOCAL_XML_NAME, XML_SRC_NAME
-from .error import PygcamException, CommandlineError, FileFormatError
+from .error import PygcamException, CommandlineError, FileFormatError, ProgramExecutionError
 from .log import getLogger
 from .utils import (flatten, shellCommand, getBooleanXML, unixPath,
                     pathjoin, simpleFormat, QueryResultsDir)
@@ -61,6 +63,75 @@ def decacheVariables():
     SimpleVariable.decache()
     _TmpFileBase.decache()
 
+# Records, by step, of the inputs used by steps with check="hash", saved in the scenario dir
+STEP_RECORD_FILE = '.stepInputs.json'
+
+def _readStepRecords(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+def _saveStepRecord(path, key, record):
+    from .utils import mkdirs
+
+    records = _readStepRecords(path)
+    records[key] = record
+
+    mkdirs(os.path.dirname(path))
+    tmpFile = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmpFile, 'w') as f:
+        json.dump(records, f, indent=2)
+
+    if os.path.exists(path):
+        os.remove(path)     # Windows won't rename over an existing file
+    os.rename(tmpFile, path)
+
+def _runScenario(command, logFile):
+    """
+    Run the "gt" command that performs the steps for one scenario, writing
+    its output to `logFile`. Defined at top level for use with TaskGraph.
+    """
+    import subprocess
+    from .utils import mkdirs
+
+    mkdirs(os.path.dirname(logFile))
+    with open(logFile, 'w') as log:
+        exitStatus = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT)
+
+    if exitStatus != 0:
+        raise PygcamException("Exit status %d; see %s" % (exitStatus, logFile))
+
+class _Progress(object):
+    """
+    Logs a summary of the scenarios being run in parallel as each starts and finishes.
+    """
+    def __init__(self, total):
+        self.total = total
+        self.running = []
+        self.succeeded = self.failed = 0
+
+    def summary(self):
+        waiting = self.total - len(self.running) - self.succeeded - self.failed
+        return "running: %s; %d succeeded, %d failed, %d waiting" % \
+               (', '.join(self.running) or 'none', self.succeeded, self.failed, waiting)
+
+    def started(self, name):
+        self.running.append(name)
+        _logger.info("Started scenario %s [%s]", name, self.summary())
+
+    def finished(self, result):
+        if result.name in self.running:
+            self.running.remove(result.name)
+
+        if result.ok():
+            self.succeeded += 1
+            _logger.info("Scenario %s succeeded in %.0f sec [%s]", result.name, result.seconds, self.summary())
+        else:
+            self.failed += 1
+            _logger.error("Scenario %s %s: %s [%s]", result.name, result.status, result.error, self.summary())
+
 class _TmpFileBase(object):
     """
     Defines features common to _TmpFile and Queries.
@@ -181,6 +252,9 @@ class Step(object):
         self.runFor = node.get('runFor', 'all')
         self.group  = node.get('group', None)
         self.optional = getBooleanXML(node.get('optional', 0))
+        self.inputs  = node.get('inputs', '')
+        self.outputs = node.get('outputs', '')
+        self.check   = node.get('check', 'mtime')
         self.command = minWhitespace(node.text)
 
         if not self.command:
@@ -196,7 +270,77 @@ class Step(object):
         return "<Step name='%s' seq='%s' runFor='%s'>%s</Step>" % \
                (self.name, self.seq, self.runFor, self.command)
 
-    def run(self, project, baseline, scenario, argDict, tool, noRun=False):
+    def _files(self, patterns, argDict):
+        """
+        Return the files matching the whitespace-separated glob `patterns`, after
+        substituting variables, including all the files in matching directories,
+        or None if any pattern matches no files.
+        """
+        try:
+            patterns = simpleFormat(patterns, argDict)
+        except KeyError as e:
+            raise FileFormatError("%s -- No such variable exists in the project XML file" % e)
+
+        files = []
+        for pattern in patterns.split():
+            matches = []
+            for path in glob.glob(pattern):
+                if os.path.isdir(path):
+                    for dirpath, _dirnames, filenames in os.walk(path):
+                        matches += [join(dirpath, name) for name in filenames]
+                else:
+                    matches.append(path)
+
+            if not matches:
+                return None
+
+            files += matches
+
+        return sorted(set(files))
+
+    def _record(self, command, argDict):
+        """
+        Return a description of the command and the contents of the inputs of a
+        step with check="hash", or None if any inputs are missing.
+        """
+        from .csvCache import fileDigest
+
+        inputs = self._files(self.inputs, argDict) if self.inputs else []
+        if inputs is None:
+            return None
+
+        return {'command' : command,
+                'inputs'  : {path : fileDigest(path) for path in inputs}}
+
+    def _recordKey(self):
+        return '%s:%s' % (self.seq, self.name)
+
+    def isUpToDate(self, command, argDict):
+        """
+        Return True if the step declares outputs, all of which exist and are (if
+        check="mtime") at least as new as all of the step's inputs, or (if check="hash")
+        were produced by the same command from inputs with the current contents.
+        """
+        if not self.outputs:
+            return False
+
+        outputs = self._files(self.outputs, argDict)
+        if outputs is None:
+            return False
+
+        if self.check == 'hash':
+            records = _readStepRecords(pathjoin(argDict['scenarioDir'], STEP_RECORD_FILE))
+            record = self._record(command, argDict)
+            return record is not None and records.get(self._recordKey()) == record
+
+        inputs = self._files(self.inputs, argDict) if self.inputs else []
+        if inputs is None:
+            return False
+
+        getmtime = os.path.getmtime
+        return not inputs or min(map(getmtime, outputs)) >= max(map(getmtime, inputs))
+
+    def run(self, project, baseline, scenario, argDict, tool, noRun=False, force=False):
         runFor = self.runFor
         isBaseline = (baseline == scenario.name)
         isPolicy = not isBaseline
@@ -214,15 +358,37 @@ class Step(object):
         except KeyError as e:
             raise FileFormatError("%s -- No such variable exists in the project XML file" % e)
 
+        if not force and self.isUpToDate(command, argDict):
+            _logger.info("[%s, %s, %s] Skipping step: outputs are up to date", scenario.name, self.seq, self.name)
+            return
+
         _logger.info("[%s, %s, %s] %s", scenario.name, self.seq, self.name, command)
 
-        if not noRun:
-            if command[0] == '@':       # run internally in gt
-                argList = shlex.split(command[1:])
-                argList = flatten(map(lambda s: glob.glob(s) or [s], argList))  # expand shell wildcards
-                tool.run(argList=argList)
-            else:
-                shellCommand(command, shell=True)   # shell=True to expand shell wildcards and so on
+        if noRun:
+            return
+
+        record = self._record(command, argDict) if (self.outputs and self.check == 'hash') else None
+
+        if project.profiler:
+            with project.profiler.measure(scenario.name, self.name, command):
+                self.runCommand(command, tool)
+        else:
+            self.runCommand(command, tool)
+
+        if record:
+            _saveStepRecord(pathjoin(argDict['scenarioDir'], STEP_RECORD_FILE), self._recordKey(), record)
+
+    @staticmethod
+    def runCommand(command, tool):
+        if command[0] == '@':       # run internally in gt
+            argList = shlex.split(command[1:])
+            argList = flatten(map(lambda s: glob.glob(s) or [s], argList))  # expand shell wildcards
+            tool.run(argList=argList)
+        else:
+            # shell=True to expand shell wildcards and so on
+            exitStatus = shellCommand(command, shell=True, raiseError=False)
+            if exitStatus != 0:
+                raise ProgramExecutionError(command, exitStatus)
 
 class SimpleVariable(object):
     """
@@ -312,6 +478,7 @@ class Project(XMLFile):
         super(Project, self).__init__(xmlFile, schemaPath='etc/project-schema.xsd', conditionalXML=True)
 
         self.scenarioGroupName = groupName
+        self.profiler = None    # set to a StepProfiler to record resource use by step
 
         tree = self.tree
         projectNodes = tree.findall('project[@name="%s"]' % projectName)
@@ -572,6 +739,15 @@ class Project(XMLFile):
         shellArgs = dropArgs(tool.shellArgs, '-S', '--scenario')
         shellArgs = dropArgs(shellArgs, '-D', '--distribute', takesArgs=False)
         shellArgs = dropArgs(shellArgs, '-a', '--allGroups', takesArgs=False)
+        shellArgs = dropArgs(shellArgs, '-j', '--jobs')
+
+        if args.jobs > 1 and not args.distribute:
+            shellArgs = dropArgs(shellArgs, '--profile', '--profile', takesArgs=bool(args.profile))
+            commandArgs = ['+P', projectName] + tool.configArgs + shellArgs + ['-g', scenarioGroupName]
+            scenarios = [name for name in scenarios if self.scenarioDict[name].isActive]
+            logDir = getParam('GCAM.BatchLogDir', section=projectName)
+            self.runParallel(scenarios, commandArgs, logDir, args.jobs, run=run, quitProgram=quitProgram)
+            return
 
         baselineJobId = None
 
@@ -624,13 +800,74 @@ class Project(XMLFile):
                             continue
 
                         argDict['step'] = step.name
-                        step.run(self, baseline, scenario, argDict, tool, noRun=args.noRun)
+                        step.run(self, baseline, scenario, argDict, tool, noRun=args.noRun, force=args.force)
             except PygcamException as e:
                 if quitProgram:
                     raise
                 _logger.error("Error running step '%s': %s", step.name, e)
 
 
+    def runParallel(self, scenarios, commandArgs, logDir, jobs, run=True, quitProgram=True):
+        """
+        Run the steps for each scenario in its own "gt" process, running up to `jobs`
+        scenarios at once. If the baseline is among the `scenarios`, it is run first
+        and the other scenarios are run once it has succeeded. The output of each
+        scenario is written to ``{logDir}/{scenario}.log``.
+
+        :param scenarios: (list of str) the names of the scenarios to run
+        :param commandArgs: (list of str) the "gt" arguments common to all scenarios
+        :param logDir: (str) the directory in which to write log files
+        :param jobs: (int) the maximum number of scenarios to run at once
+        :param run: (bool) if False, just print the commands that would be run
+        :param quitProgram: (bool) if True, raise an error if any scenario fails
+            after the others have finished.
+        :return: none
+        """
+        from .taskGraph import TaskGraph
+
+        baseline = self.baselineName
+        graph = TaskGraph()
+        profileFiles = []
+
+        for name in scenarios:
+            command = ['gt'] + commandArgs + ['-S', name]
+            logFile = pathjoin(logDir, name + '.log')
+
+            if self.profiler:   # each process profiles its scenario; we merge the results
+                profileFile = pathjoin(logDir, name + '-profile.json')
+                command += ['--profile', profileFile]
+                profileFiles.append(profileFile)
+                if run and os.path.exists(profileFile):
+                    os.remove(profileFile)
+
+            if not run:
+                print(' '.join(command), '>', logFile)
+                continue
+
+            dependsOn = [baseline] if (name != baseline and baseline in scenarios) else None
+            graph.addTask(name, _runScenario, args=(command, logFile), dependsOn=dependsOn)
+
+        if not run:
+            return
+
+        _logger.info("Running %d scenarios, up to %d at a time; logs are in %s", len(scenarios), jobs, logDir)
+
+        # Each task waits on a subprocess, so threads suffice
+        progress = _Progress(len(scenarios))
+        results = graph.run(jobs=jobs, processes=False, callback=progress.finished,
+                            startCallback=progress.started)
+
+        for profileFile in profileFiles:
+            if os.path.exists(profileFile):     # absent if the scenario was skipped
+                self.profiler.load(profileFile)
+
+        failed = [result.name for result in results.values() if not result.ok()]
+        if failed:
+            msg = "Steps did not succeed for %d of %d scenarios: %s" % (len(failed), len(scenarios), ', '.join(failed))
+            if quitProgram:
+                raise PygcamException(msg)
+            _logger.error(msg)
+
     def dump(self, steps, scenarios):
         print("Scenario group:", self.scenarioGroupName)
         print("Requested steps:", steps)
@@ -660,8 +897,21 @@ def projectMain(args, tool):
 
     project = Project(args.projectFile, args.projectName, args.group)
 
+    if args.profile is not None and not args.noRun:
+        from .stepProfile import StepProfiler
+        project.profiler = StepProfiler()
+
     groups = project.getKnownGroups() if args.allGroups else [args.group]
 
-    for group in groups:
-        project.setGroup(group)
-        project.run(scenarios, skipScens, steps, skipSteps, args, tool)
+    try:
+        for group in groups:
+            project.setGroup(group)
+            project.run(scenarios, skipScens, steps, skipSteps, args, tool)
+
+    finally:
+        profiler = project.profiler
+        if profiler and profiler.records:
+            profileFile = args.profile or pathjoin(getParam('GCAM.BatchLogDir'),
+                                                   time.strftime('profile-%Y%m%d-%H%M%S.json'))
+            profiler.writeJSON(profileFile)
+            print(profiler.summary())
@@ -7,21 +7,36 @@
 import os
 import re
 import subprocess
+import time
 
+import six
 from lxml import etree as ET
 
 from .Xvfb import Xvfb
-from .config import getParam, getParamAsBoolean, getParamAsFloat
+from .config import getParam, getParamAsBoolean, getParamAsFloat, getParamAsInt
 from .constants import NUM_AEZS, GCAM_32_REGIONS
 from .error import PygcamException, ConfigFileError, FileFormatError, CommandlineError, FileMissingError
 from .log import getLogger
-from .queryFile import QueryFile, RewriteSetParser
+from .queryFile import QueryFile, QueryCatalog, RewriteSetParser
 from .utils import (mkdirs, deleteFile, ensureExtension, ensureCSV, parse_version_info,
                     pathjoin, saveToFile, getExeDir, writeXmldbDriverProperties)
 from .temp_file import TempFile, getTempFile
 
 _logger = getLogger(__name__)
 
+def yearColumns(df, asInt=False):
+    """
+    Get the names of the year columns in `df`, i.e., those whose (string)
+    names are all digits, in the order they appear in `df`.
+
+    :param df: (DataFrame) data of the format returned by batch queries
+    :param asInt: (bool) if True, return the years as ints rather than
+        column names.
+    :return: (list of str or int) the year columns or the years they represent
+    """
+    yearCols = [col for col in df.columns if str.isdigit(col)]
+    return [int(col) for col in yearCols] if asInt else yearCols
+
 def limitYears(df, years):
     """
     Modify df to drop all years outside the range given by `years`.
@@ -31,65 +46,120 @@ def limitYears(df, years):
     :return: (DataFrame) df, modified in place.
     """
     first, last = map(int, years)
-    yearCols  = map(int, filter(str.isdigit, df.columns))
-    dropYears = map(str, filter(lambda y: y < first or y > last, yearCols))
+    dropYears = [col for col in yearColumns(df) if not (first <= int(col) <= last)]
     df.drop(dropYears, axis=1, inplace=True)
     return df
 
+def interpolateMatrix(values, years, startYear=0):
+    """
+    Linearly interpolate annual values between the time-steps given by `years`
+    for all rows of the matrix `values` at once. This is the computational core
+    of :py:func:`interpolateYears`, usable directly by code that holds year data
+    as a NumPy array. Time-steps need not be uniform.
+
+    :param values: (numpy 2-D array-like) one row per series, one column per
+        element of `years`.
+    :param years: (sequence of int) the ascending years corresponding to the
+        columns of `values`.
+    :param startYear: (int) If non-zero, values for years prior to `startYear` are
+        held at the value of the preceding time-step rather than interpolated.
+    :return: (tuple of numpy arrays) the annual years from ``years[0]`` to ``years[-1]``
+        and a float matrix with one column per annual year.
+    """
+    import numpy as np
+
+    values = np.asarray(values, dtype=float)
+    years  = np.asarray(years, dtype=int)
+
+    if len(years) == 0:
+        return years, values.reshape(values.shape[0], 0)
+
+    allYears = np.arange(years[0], years[-1] + 1)
+
+    # For each annual year, find the time-step at or immediately before it, and
+    # the time-step at or after it; for time-step years these are identical.
+    hi = np.searchsorted(years, allYears, side='left')
+    lo = np.where(years[hi] == allYears, hi, hi - 1)
+
+    loYears = years[lo]
+    span = years[hi] - loYears
+    span[span == 0] = 1     # avoid dividing by zero at time-step years, where hi == lo
+
+    # Count the interpolated steps taken since the prior time-step, excluding
+    # those before startYear, which hold the prior time-step's value.
+    steps = allYears - np.maximum(loYears, startYear - 1)
+    steps = np.clip(steps, 0, None)
+    steps[hi == lo] = 0
+
+    loValues = values[:, lo]
+    delta = (values[:, hi] - loValues) / span
+    result = loValues + delta * steps
+
+    return allYears, result
+
 def interpolateYears(df, startYear=0, inplace=False):
     """
     Interpolate linearly between each pair of years in the GCAM output. The
     time-step is calculated from the numerical (string) column headings given
     in the `DataFrame`_ `df`, which are assumed to represent years in the time-series.
     The years to interpolate between are read from `df`, so there's no dependency
-    on any particular time-step, or even on the time-step being constant.
+    on any particular time-step, or even on the time-step being constant. All
+    interpolated years are computed in a single operation on a matrix of the year
+    columns (see :py:func:`interpolateMatrix`).
 
     :param df: (DataFrame) Data of the format returned by batch queries
         on the GCAM XML database
     :param startYear: (int) If non-zero, begin interpolation at this year.
-    :param inplace: (bool) If True, modify `df` in place; otherwise modify a copy.
-    :return: if `inplace` is True, `df` is returned; otherwise a copy
-      of `df` with interpolated values is returned.
+    :param inplace: (bool) If True, the non-year columns of `df` are not copied,
+        i.e., they are shared by `df` and the returned DataFrame.
+    :return: a DataFrame with the non-year columns of `df`, followed by annual
+      year columns, in sorted order, with interpolated values.
     """
-    yearCols = filter(str.isdigit, df.columns)
-    years = map(int, yearCols)
+    import pandas as pd
 
-    for i in range(0, len(years)-1):
-        start = years[i]
-        end   = years[i+1]
-        timestep = end - start
+    yearCols = yearColumns(df)
+    years = sorted(map(int, yearCols))
+    yearCols = [str(year) for year in years]
 
-        if timestep == 1:       # don't interpolate annual results if already annual
-            continue
+    allYears, values = interpolateMatrix(df[yearCols].values, years, startYear=startYear)
 
-        startCol = df[str(start)]
-        endCol   = df[str(end)]
+    nonYearCols = [col for col in df.columns if col not in yearCols]
+    yearDF = pd.DataFrame(values, index=df.index, columns=[str(year) for year in allYears])
 
-        # compute vector of annual deltas for each row
-        delta = (endCol - startCol)/timestep
+    result = pd.concat([df[nonYearCols], yearDF], axis=1, copy=(not inplace))
+    return result
 
-        # interpolate the whole column -- but don't interpolate before the start year
-        for j in range(1, timestep):
-            nextYear = start + j
-            df[str(nextYear)] = df[str(nextYear-1)] + (0 if nextYear < startYear else delta)
+_csvCache = {}
 
-    yearCols = filter(str.isdigit, df.columns)  # get annualized year columns
-    years = map(int, yearCols)       # sort as integers
-    years.sort()
-    yearCols = map(str, years)       # convert back to strings, now sorted
+def _readCsvFile(filename, skiprows=1):
+    """
+    Read a GCAM batch query CSV file into a DataFrame, using the persistent
+    CSV cache (see :py:mod:`pygcam.csvCache`) if it's enabled.
+    """
+    import pandas as pd
+    from .csvCache import readCachedCsv
 
-    nonYearCols = list(set(df.columns) - set(yearCols))
-    result = df.reindex_axis(nonYearCols + yearCols, axis=1, copy=(not inplace))
-    return result
+    def reader(filename):
+        try:
+            _logger.debug("Reading %s", filename)
+            return pd.read_table(filename, sep=',', skiprows=skiprows, index_col=None)
 
-_csvCache = {}
+        except IOError as e:
+            raise FileMissingError(os.path.abspath(filename), e)
+
+        except Exception as e:
+            raise PygcamException('Error reading %s: %s' % (filename, e))
+
+    return readCachedCsv(filename, 'readCsv:skiprows=%d' % skiprows, reader)
 
 def readCsv(filename, skiprows=1, years=None, interpolate=False, startYear=0, cache=False):
     """
     Read a CSV file of the form generated by GCAM batch queries, i.e., skip one
     row and then read column headings and data. Optionally drop all years outside
     the `years` given. Optionally, linearly interpolate annual values between
-    time-steps.
+    time-steps. Unless config variable ``GCAM.CsvCacheDir`` is empty, the parsed
+    file is also stored in a persistent cache so subsequent calls (in this or
+    other processes) needn't re-parse it unless the file has changed.
 
     :param filename: (str) the path to a CSV file
     :param skiprows: (int) the number of rows to skip before reading the data matrix
@@ -97,34 +167,21 @@ def readCsv(filename, skiprows=1, years=None, interpolate=False, startYear=0, ca
         keep; others are dropped
     :param interpolate: (bool) If True, interpolate annual values between time-steps
     :param startYear: (int) If interpolating, the year to begin interpolation
-    :param cache: (bool) If True, file will be sought in, and saved to, a CSV cache.
-       The "raw" file data is cached, so if called with different processing args,
-       the same initial DataFrame is used, but it will be processed correctly.
+    :param cache: (bool) If True, file will be sought in, and saved to, an in-memory
+       CSV cache. The "raw" file data is cached, so if called with different processing
+       args, the same initial DataFrame is used, but it will be processed correctly.
     :return: (DataFrame) the data read in, processed as per arguments
     """
-    import pandas as pd
-
-    found = False
-
     if cache and filename in _csvCache:
         _logger.debug("Found %s in CSV cache", filename)
-        df = _csvCache[filename]
-        found = True
+        df = _csvCache[filename].copy()
 
     else:
-        try:
-            _logger.debug("Reading %s", filename)
-            df = pd.read_table(filename, sep=',', skiprows=skiprows, index_col=None)
-
-        except IOError as e:
-            raise FileMissingError(os.path.abspath(filename), e)
-
-        except Exception as e:
-            raise PygcamException('Error reading %s: %s' % (filename, e))
+        df = _readCsvFile(filename, skiprows=skiprows)
 
-    # Cache a copy, unless it was already in the cache
-    if cache and not found:
-        _csvCache[filename] = df.copy()
+        # Cache a copy, since the caller may modify the returned DataFrame
+        if cache:
+            _csvCache[filename] = df.copy()
 
     if years:
         limitYears(df, years)
@@ -236,17 +293,15 @@ def readRegionMap(filename):
 
     return mapping
 
-def dropExtraCols(df, inplace=True):
+def extraColumns(columns):
     """
-    Drop some columns that GCAM queries sometimes return, but which we generally don't need.
-    The columns to drop are taken from from the configuration file variable ``GCAM.ColumnsToDrop``,
-    which should be a comma-delimited string. The default value is ``scenario,Notes,Date``.
+    Return the names of columns that GCAM queries sometimes return, but which we
+    generally don't need. See :py:func:`dropExtraCols`.
 
-    :param df: a `DataFrame`_ hold the results of a GCAM query.
-    :param inplace: if True, modify `df` in-place; otherwise return a modified copy.
-    :return: the original `df` (if inplace=True) or the modified copy.
+    :param columns: (iterable of str) the names of the columns of a query result
+    :return: (list of str) the names of the columns to drop
     """
-    columns = df.columns
+    columns = list(columns)
     # eliminate any extra (empty) columns that appear to be query artifacts
     dropCols = filter(lambda s: s.startswith('Unnamed:'), columns)
 
@@ -259,8 +314,19 @@ def dropExtraCols(df, inplace=True):
     unneeded = set(colList)
     existing = set(columns)
     dropCols += existing & unneeded    # drop any columns in both sets
+    return dropCols
+
+def dropExtraCols(df, inplace=True):
+    """
+    Drop some columns that GCAM queries sometimes return, but which we generally don't need.
+    The columns to drop are taken from from the configuration file variable ``GCAM.ColumnsToDrop``,
+    which should be a comma-delimited string. The default value is ``scenario,Notes,Date``.
 
-    resultDF = df.drop(dropCols, axis=1, inplace=inplace)
+    :param df: a `DataFrame`_ hold the results of a GCAM query.
+    :param inplace: if True, modify `df` in-place; otherwise return a modified copy.
+    :return: the original `df` (if inplace=True) or the modified copy.
+    """
+    resultDF = df.drop(extraColumns(df.columns), axis=1, inplace=inplace)
     return resultDF
 
 def _removeLevelByName(rewriteList, levelName):
@@ -323,24 +389,6 @@ def _addRewriteSet(rewriteSetList, rewriteParser, rewriteList, title):
 
     rewriteList.set('append-values', 'true' if appendValues else 'false')
 
-def _findQueryByName(tree, title):
-    """
-    Try the title and variations thereof to locate the query by name
-    """
-    # This Xpath supports both Main_Queries-type files and batch query files
-    xpathPattern = '/queries/queryGroup/*[@title="{title}"]|/queries/aQuery/*[@title="{title}"]'
-
-    patterns = (None, '_', '-', '[-_]')
-
-    for pattern in patterns:
-        altTitle = re.sub(pattern, ' ', title) if pattern else title
-        xpath = xpathPattern.format(title=altTitle)
-        elts = tree.xpath(xpath)  # returns empty list or list of elements found
-        if len(elts) != 0:
-            return elts
-
-    return None
-
 def _findOrCreateQueryFile(title, queryPath, regions, outputDir=None, tmpFiles=True,
                            regionMap=None, rewriteSetList=None, rewriteParser=None,
                            delete=True):
@@ -354,8 +402,6 @@ def _findOrCreateQueryFile(title, queryPath, regions, outputDir=None, tmpFiles=T
     sep = os.path.pathsep           # ';' on Windows, ':' on Unix
     items = queryPath.split(sep)
 
-    parser = ET.XMLParser(remove_blank_text=True)
-
     for item in items:
         if os.path.isdir(item):
             pathname = pathjoin(item, title + '.xml')
@@ -364,11 +410,11 @@ def _findOrCreateQueryFile(title, queryPath, regions, outputDir=None, tmpFiles=T
             else:
                 continue
 
-        # Find the query within an XML query file
-        tree = ET.parse(item, parser=parser)
-        elts = _findQueryByName(tree, title)
+        # Find the query within an XML query file, which is parsed only
+        # when its catalog isn't cached or the file has been modified.
+        queryElt = QueryCatalog.getCatalog(item).findQuery(title)
 
-        if elts is None or len(elts) == 0:
+        if queryElt is None:
             continue # to next item in QueryPath
 
         root = ET.Element("queries")
@@ -377,7 +423,6 @@ def _findOrCreateQueryFile(title, queryPath, regions, outputDir=None, tmpFiles=T
         for region in regions:
             aQuery.append(ET.Element('region', name=region))
 
-        queryElt = elts[0]
         aQuery.append(queryElt)
 
         if regionMap or rewriteSetList:
@@ -474,15 +519,23 @@ def _copyToLogFile(logFile, filename, msg=''):
             map(m.write, f.readlines())
 
 
-def _createBatchCommandElement(scenario, queryName, queryPath, outputDir=None, tmpFiles=True,
+def _scenarioFilename(filename, scenario):
+    """
+    Insert "-{scenario}" before the extension of `filename`, to keep files
+    for different scenarios apart.
+    """
+    root, ext = os.path.splitext(filename)
+    return '%s-%s%s' % (root, scenario, ext)
+
+def _createBatchCommandElement(scenarios, queryName, queryPath, outputDir=None, tmpFiles=True,
                                xmldb='', csvFile=None, regions=None, regionMap=None,
                                rewriters=None, rewriteParser=None, noDelete=False, saveAs=None):
     """
-    Generate a <command> element for use in a multi-query batch file. The indicated
-    query will be copied into a temporary file that is referenced by this <command>
-    element.
+    Generate a <command> element for each scenario for use in a multi-query batch
+    file. The indicated query will be copied into a temporary file that is referenced
+    by each <command> element.
 
-    :param scenario: (str) the name of the scenario to perform the query on
+    :param scenarios: (list of str) the names of the scenarios to perform the query on
     :param queryName: (str) the name of a query to execute
     :param queryPath: (str) a list of directories or XML filenames, separated
         by a colon (on Unix) or a semi-colon (on Windows)
@@ -491,6 +544,7 @@ def _createBatchCommandElement(scenario, queryName, queryPath, outputDir=None, t
     :param xmldb: (str) the pathname to the XML database to query, or '' to
         use in-memory DB
     :param csvFile: if None, query results are written to a computed filename.
+        Ignored if there is more than one scenario.
     :param regions: (iterable of str) the regions you want to include in the query
     :param regionMap: (dict-like) keys are the names of regions that should be rewritten.
         The value is the name of the aggregate region to map into.
@@ -502,7 +556,7 @@ def _createBatchCommandElement(scenario, queryName, queryPath, outputDir=None, t
     :param noDelete: (bool) if True, temporary files created by this function are
         not deleted (use for debugging)
     :param saveAs (str): alternative name to use to save the query results as
-    :return: (str) the generated batch command string
+    :return: (list of str) the generated batch command strings, one per scenario
     """
     basename = os.path.basename(queryName)
     mainPart, extension = os.path.splitext(basename)   # strip extension, if any
@@ -521,18 +575,23 @@ def _createBatchCommandElement(scenario, queryName, queryPath, outputDir=None, t
         raise PygcamException("_createBatchCommand: file for query '%s' was not found in '%s'." % \
                               (basename, queryPath))
 
-    if not csvFile:
-        csvFile = "%s-%s.csv" % (saveAs or mainPart, scenario)    # compute default filename
-        csvFile = csvFile.replace(' ', '_')                       # eliminate spaces for convenience
-
     outputDir = outputDir or getParam('GCAM.OutputDir')
     mkdirs(outputDir)
-    csvPath = os.path.abspath(pathjoin(outputDir, csvFile))
 
-    batchCommand = BatchCommandElement.format(scenario=scenario, queryFile=queryFile,
-                                              csvFile=csvPath, xmldb=xmldb)
+    if len(scenarios) > 1:
+        csvFile = None
+
+    commands = []
+    for scenario in scenarios:
+        name = csvFile or "%s-%s.csv" % (saveAs or mainPart, scenario)    # compute default filename
+        name = name.replace(' ', '_')                       # eliminate spaces for convenience
+        csvPath = os.path.abspath(pathjoin(outputDir, name))
+
+        command = BatchCommandElement.format(scenario=scenario, queryFile=queryFile,
+                                             csvFile=csvPath, xmldb=xmldb)
+        commands.append(command)
 
-    return batchCommand
+    return commands
 
 
 def createBatchFile(scenario, queries, xmldb='', queryPath=None, outputDir=None,
@@ -542,8 +601,12 @@ def createBatchFile(scenario, queries, xmldb='', queryPath=None, outputDir=None,
     """
     Create an optionally-temporary XML file that will run multiple queries, by extracting
     queries into separate temp files and referencing them from the batch query file.
+    If several scenarios are given, the batch file runs every query on each of them,
+    so a single ModelInterface invocation (and database open) serves them all. Each
+    query is extracted just once, regardless of the number of scenarios.
 
-    :param scenario: (str) the name of the scenario to perform the query on
+    :param scenario: (str or list of str) the name of the scenario to perform the
+        queries on, or a list of scenario names, all found in the given `xmldb`.
     :param queries: (list of str query names and/or Query instances)
     :param xmldb: (str) path to XMLDB, or '' to use in-memory DB
     :param queryPath: (str) a list of directories or XML filenames, separated
@@ -556,7 +619,8 @@ def createBatchFile(scenario, queries, xmldb='', queryPath=None, outputDir=None,
     :param rewriteParser: (RewriteSetParser instance) parsed representation of
         rewriteSets.xml
     :param batchFileIn: (str) the name of a pre-formed batch file to run
-    :param batchFileOut: (str) where to write output from batchFileIn, if given
+    :param batchFileOut: (str) where to write output from batchFileIn, if given. With
+        multiple scenarios, "-{scenario}" is inserted before the extension.
     :param tmpFiles: (bool) if True temporary files are used and deleted when the
         program exits, otherwise normal files are create in outputDir.
     :param noDelete: (bool) if True, temporary files created by this function are
@@ -565,6 +629,7 @@ def createBatchFile(scenario, queries, xmldb='', queryPath=None, outputDir=None,
     """
     from queryFile import Query
 
+    scenarios = [scenario] if isinstance(scenario, six.string_types) else list(scenario)
     commands = []
 
     for obj in queries:
@@ -590,17 +655,18 @@ def createBatchFile(scenario, queries, xmldb='', queryPath=None, outputDir=None,
             continue
 
         # Extracts the named query into a temp file and returns XML text referencing the file.
-        command = _createBatchCommandElement(scenario, queryName, queryPath, outputDir=outputDir,
-                                             xmldb=xmldb, regions=regions, regionMap=regionMap,
-                                             rewriters=rewriters, rewriteParser=rewriteParser,
-                                             tmpFiles=tmpFiles, noDelete=noDelete, saveAs=saveAs)
-        commands.append(command)
+        commands += _createBatchCommandElement(scenarios, queryName, queryPath, outputDir=outputDir,
+                                               xmldb=xmldb, regions=regions, regionMap=regionMap,
+                                               rewriters=rewriters, rewriteParser=rewriteParser,
+                                               tmpFiles=tmpFiles, noDelete=noDelete, saveAs=saveAs)
 
     # Add command to run pre-formed batch file, if given
     if batchFileIn:
-        command = BatchCommandElement.format(scenario=scenario, queryFile=batchFileIn,
-                                             csvFile=batchFileOut, xmldb=xmldb)
-        commands.append(command)
+        for name in scenarios:
+            csvFile = _scenarioFilename(batchFileOut, name) if len(scenarios) > 1 else batchFileOut
+            command = BatchCommandElement.format(scenario=name, queryFile=batchFileIn,
+                                                 csvFile=csvFile, xmldb=xmldb)
+            commands.append(command)
 
     # Create the file batch-query.xml in the same dir as the CSV files. It can't be
     # a temp file because this step runs separately from the step running GCAM, and
@@ -627,7 +693,9 @@ def runMultiQueryBatch(scenario, queries, xmldb='', queryPath=None, outputDir=No
     Create a single GCAM XML batch file that runs multiple queries, placing the
     each query's results in a file named of the form {queryName}-{scenario}.csv.
 
-    :param scenario: (str) the name of the scenario to perform the query on
+    :param scenario: (str or list of str) the name of the scenario to perform the
+        queries on, or a list of scenario names, all found in the given `xmldb`,
+        which are then queried using a single ModelInterface process.
     :param queries: (list of str query names and/or Query instances)
     :param xmldb: (str) path to XMLDB, or '' to use in-memory DB
     :param queryPath: (str) a list of directories or XML filenames, separated
@@ -652,10 +720,231 @@ def runMultiQueryBatch(scenario, queries, xmldb='', queryPath=None, outputDir=No
                                 rewriteParser=rewriteParser, noDelete=noDelete,
                                 batchFileIn=batchFileIn, batchFileOut=batchFileOut)
 
+    # scenario is used only if no batch file is given, so a list is harmless here
     runModelInterface(scenario, outputDir, xmldb=xmldb, batchFile=batchFile,
                       miLogFile=miLogFile, noDelete=noDelete, noRun=noRun)
 
 
+def _queryFailed(csvPath):
+    """
+    The java program always exits with 0 status, but when the query fails,
+    it writes an error message to the CSV file instead of query results.
+
+    :param csvPath: (str) the pathname of a CSV file written by ModelInterface
+    :return: (bool) True if the file is missing, unreadable, or holds an error message
+    """
+    try:
+        with open(csvPath, 'r') as f:
+            line = f.readline()
+
+        return bool(re.search('java.*Exception', line, flags=re.IGNORECASE))
+
+    except Exception:
+        return True
+
+def _batchOutputFiles(batchFile):
+    """
+    Return the pathnames of the CSV files written by the given batch file.
+    """
+    tree = ET.parse(batchFile)
+    return [elt.text for elt in tree.xpath('//command/outFile') if elt.text]
+
+def _javaHeapBytes(javaArgs):
+    """
+    Return the maximum java heap size set by an "-Xmx" flag in `javaArgs`,
+    in bytes, or None if there is no such flag.
+    """
+    m = re.search(r'-Xmx(\d+)([kKmMgG]?)', javaArgs or '')
+    if not m:
+        return None
+
+    multiplier = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+    return int(m.group(1)) * multiplier[m.group(2).lower()]
+
+def _physicalMemoryBytes():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None     # e.g., on Windows
+
+def _queryWorkerCount(jobs, numScenarios):
+    """
+    Limit the number of concurrent ModelInterface processes to `jobs`, to the
+    number of scenarios, and to the number of JVMs whose maximum heap (per
+    the -Xmx flag in GCAM.MI.JavaArgs) fits in physical memory.
+    """
+    workers = max(1, min(jobs, numScenarios))
+
+    heapBytes = _javaHeapBytes(getParam('GCAM.MI.JavaArgs'))
+    memBytes  = _physicalMemoryBytes()
+
+    if heapBytes and memBytes:
+        maxWorkers = max(1, int(memBytes // heapBytes))
+        if workers > maxWorkers:
+            _logger.warn("Reducing query jobs from %d to %d: each uses up to %d MB (GCAM.MI.JavaArgs)",
+                         workers, maxWorkers, heapBytes // (1024 ** 2))
+            workers = maxWorkers
+
+    return workers
+
+
+class QueryJob(object):
+    """
+    The state and outcome of running ModelInterface on one scenario's batch file.
+    """
+    def __init__(self, scenario, batchFile, miLogFile=None, noRun=False):
+        self.scenario  = scenario
+        self.batchFile = batchFile
+        self.miLogFile = miLogFile
+        self.noRun     = noRun
+        self.seconds   = 0.0
+        self.csvFiles  = []
+        self.failed    = []       # CSV files not produced due to query errors
+        self.error     = None     # exception message, if the job couldn't be run
+
+    def ok(self):
+        return not (self.failed or self.error)
+
+    def run(self):
+        command = _createJavaCommand(self.batchFile, self.miLogFile)
+
+        if self.noRun:
+            print(command)
+            return self
+
+        _logger.debug(command)
+        start = time.time()
+        try:
+            if self.miLogFile:
+                _copyToLogFile(self.miLogFile, self.batchFile, "Batch file: '%s'\n\n" % self.batchFile)
+
+            subprocess.call(command, shell=True)
+
+            self.csvFiles = _batchOutputFiles(self.batchFile)
+            for csvPath in self.csvFiles:
+                if _queryFailed(csvPath):
+                    self.failed.append(csvPath)
+                    _logger.error("Query for scenario '%s' failed. Deleting '%s'", self.scenario, csvPath)
+                    deleteFile(csvPath)
+
+        except Exception as e:
+            self.error = str(e)
+            _logger.error("Queries for scenario '%s' failed: %s", self.scenario, e)
+
+        self.seconds = time.time() - start
+        return self
+
+
+def _runQueryJob(job):
+    return job.run()
+
+def _logQueryTimings(jobs, workers, seconds):
+    _logger.info("Query timing summary: %d batch(es) run by %d worker(s), %.1f sec elapsed",
+                 len(jobs), workers, seconds)
+
+    width = max([len(job.scenario) for job in jobs])
+    for job in jobs:
+        if job.error:
+            status = 'ERROR: %s' % job.error
+        elif job.failed:
+            status = 'FAILED %d of %d queries' % (len(job.failed), len(job.csvFiles))
+        else:
+            status = 'ok'
+
+        _logger.info("  %-*s %8.1f sec  %s", width, job.scenario, job.seconds, status)
+
+def queryScenarios(scenarios, queries, xmldb, jobs=1, queryPath=None, outputDir=None,
+                   miLogFile=None, regions=None, regionMap=None, rewriteParser=None,
+                   batchFileIn=None, batchFileOut=None, noRun=False, noDelete=False):
+    """
+    Run the same queries on multiple scenarios, running up to `jobs` ModelInterface
+    processes concurrently. Each query's results are written to a file named of the
+    form {queryName}-{scenario}.csv, as in :py:func:`runMultiQueryBatch`. A timing
+    summary is logged when all scenarios have been processed.
+
+    :param scenarios: (list of str) the names of the scenarios to query
+    :param queries: (list of str query names and/or Query instances)
+    :param xmldb: (str or dict) path to the XMLDB holding all the scenarios, or a dict
+        mapping each scenario name to the path of its XMLDB. In the former case, the
+        scenarios are divided among the jobs, each of which queries its share of the
+        scenarios using one ModelInterface process (see :py:func:`createBatchFile`).
+    :param jobs: (int) the maximum number of ModelInterface processes to run at once.
+        This is further limited by the number of scenarios and by the number of JVMs
+        whose maximum heap size, given by the -Xmx flag in GCAM.MI.JavaArgs, fits in
+        physical memory.
+    :param queryPath: (str) a list of directories or XML filenames, separated
+        by a colon (on Unix) or a semi-colon (on Windows)
+    :param outputDir: (str) the directory in which to write the .CSV
+        with query results, default is value of GCAM.OutputDir.
+    :param miLogFile: (str) optional name of a log file to write ModelInterface output
+        to. When running concurrently, each scenario's output is written to a separate
+        file, named by inserting "-{scenario}" before the file's extension.
+    :param regions: (iterable of str) the regions you want to include in the query
+    :param regionMap: (dict-like) keys are the names of regions that should be rewritten.
+        The value is the name of the aggregate region to map into.
+    :param rewriteParser: (RewriteSetParser instance) parsed representation of
+        rewriteSets.xml
+    :param batchFileIn: (str) the name of a pre-formed batch file to run
+    :param batchFileOut: (str) where to write output from batchFileIn, if given
+    :param noRun: (bool) if True, print the commands that would be executed, but
+        don't run them.
+    :param noDelete: (bool) if True, temporary files created by this function are
+        not deleted (use for debugging)
+    :return: (list of QueryJob) the jobs run. Each job's `scenario` attribute holds
+        the comma-delimited names of the scenarios it queried.
+    """
+    from multiprocessing.pool import ThreadPool
+
+    workers = _queryWorkerCount(jobs, len(scenarios))
+
+    # Scenarios in a shared database are divided among the workers, each running
+    # a single batch file for its share, so no more JVMs are started than needed.
+    if isinstance(xmldb, dict):
+        groups = [([scenario], xmldb[scenario]) for scenario in scenarios]
+    else:
+        groups = [(scenarios[i::workers], xmldb) for i in range(workers)]
+
+    # Batch files are generated serially since query extraction uses shared state
+    queryJobs = []
+    for names, dbPath in groups:
+        label = ','.join(names)
+        multiple = len(groups) > 1
+
+        logFile = _scenarioFilename(miLogFile, names[0]) if (miLogFile and multiple) else miLogFile
+        if logFile and multiple:
+            deleteFile(logFile)
+
+        outFile = _scenarioFilename(batchFileOut, names[0]) \
+            if (batchFileIn and multiple and len(names) == 1) else batchFileOut
+
+        batchFile = createBatchFile(names, queries, xmldb=dbPath, queryPath=queryPath,
+                                    outputDir=outputDir, regions=regions, regionMap=regionMap,
+                                    rewriteParser=rewriteParser, noDelete=noDelete,
+                                    batchFileIn=batchFileIn, batchFileOut=outFile)
+
+        queryJobs.append(QueryJob(label, batchFile, miLogFile=logFile, noRun=noRun))
+
+    _logger.info("Running queries for %d scenario(s) using %d job(s)", len(scenarios), workers)
+    start = time.time()
+
+    # Each job spends its time waiting on a java subprocess, so threads suffice
+    pool = ThreadPool(workers)
+    try:
+        if getParamAsBoolean('GCAM.MI.UseVirtualBuffer'):   # deprecated as of GCAM 4.3
+            with Xvfb():
+                queryJobs = pool.map(_runQueryJob, queryJobs, chunksize=1)
+        else:
+            queryJobs = pool.map(_runQueryJob, queryJobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    if not noRun:
+        _logQueryTimings(queryJobs, workers, time.time() - start)
+
+    return queryJobs
+
+
 # TBD: Test queryText and asDataFrame.
 def runModelInterface(scenario, outputDir, csvFile=None, batchFile=None,
                       queryFile=None, queryText=None,  xmldb='',
@@ -759,21 +1048,10 @@ def runModelInterface(scenario, outputDir, csvFile=None, batchFile=None,
         # The java program always exits with 0 status, but when the query fails,
         # it writes an error message to the CSV file. If this occurs, we delete
         # the file.
-        if csvPath:
-            try:
-                with open(csvPath, 'r') as f:
-                    line = f.readline()
-
-                if re.search('java.*Exception', line, flags=re.IGNORECASE):
-                    failed = True
-
-            except Exception:
-                failed = True
-
-            finally:
-                if failed:
-                    _logger.error("Batch file '%s' failed. Deleting '%s'", queryFile, csvPath)
-                    deleteFile(csvPath)
+        if csvPath and _queryFailed(csvPath):
+            failed = True
+            _logger.error("Batch file '%s' failed. Deleting '%s'", queryFile, csvPath)
+            deleteFile(csvPath)
     except:
         raise
 
@@ -872,28 +1150,69 @@ def _runSingleQueryBatch(scenario, xmldb='', queryNames=[], queryNodes=[], query
                       rewriters=rewriters, rewriteParser=rewriteParser,
                       noRun=noRun, noDelete=noDelete, saveAs=saveAs)
 
+def readCsvChunks(filename, skiprows=1, interpolate=False, startYear=0, chunksize=None):
+    """
+    Read a CSV file of the form generated by GCAM batch queries in chunks of
+    at most `chunksize` rows, so that the memory required is proportional to the
+    chunk size rather than the file size. The CSV cache is not used.
+
+    :param filename: (str) the path to a CSV file
+    :param skiprows: (int) the number of rows to skip before reading the data matrix
+    :param interpolate: (bool) If True, interpolate annual values between time-steps
+    :param startYear: (int) If interpolating, the year to begin interpolation
+    :param chunksize: (int) the maximum number of rows per chunk. Defaults to the
+        value of config variable ``GCAM.CsvChunkSize``.
+    :return: (generator of DataFrame) the successive chunks of the file, processed
+        as per arguments
+    """
+    import pandas as pd
+
+    chunksize = chunksize or getParamAsInt('GCAM.CsvChunkSize')
+
+    try:
+        _logger.debug("Reading %s in chunks of %d rows", filename, chunksize)
+        reader = pd.read_table(filename, sep=',', skiprows=skiprows, index_col=None,
+                               chunksize=chunksize)
+
+    except IOError as e:
+        raise FileMissingError(os.path.abspath(filename), e)
+
+    except Exception as e:
+        raise PygcamException('Error reading %s: %s' % (filename, e))
+
+    for chunk in reader:
+        yield interpolateYears(chunk, startYear=startYear) if interpolate else chunk
+
 def sumYears(files, skiprows=1, interpolate=False):
     """
     For each file given, sum all values in each year column and create
     a file holding the result. Each resulting filename has the same basename
-    as the input file but ending with '-sum.csv'.
+    as the input file but ending with '-sum.csv'. Files are processed one at
+    a time, and each is read in chunks (see :py:func:`readCsvChunks`), so
+    memory use is independent of the size and number of the files.
 
     :param files: (list of str) Filenames to process
     :param skiprows: (int) the number of rows to skip prior to column headers
     :param interpolate: (bool) if True, interpolate annual values between time-steps
     :return: none
     """
-    csvFiles = map(ensureCSV, files)
-    dframes  = map(lambda fname: readCsv(fname, skiprows=skiprows, interpolate=interpolate), csvFiles)
-
     # TBD: preserve columns that have a single value only? Maybe this collapses into sumYearsByGroup()?
-    for df, fname in zip(dframes, csvFiles):
+    for fname in files:
+        fname = ensureCSV(fname)
+        sums = None
+
+        for chunk in readCsvChunks(fname, skiprows=skiprows, interpolate=interpolate):
+            chunkSums = chunk[yearColumns(chunk)].sum()
+            sums = chunkSums if sums is None else sums + chunkSums
+
+        if sums is None:    # no data rows
+            df = readCsv(fname, skiprows=skiprows, interpolate=interpolate)
+            sums = df[yearColumns(df)].sum()
+
         root, ext = os.path.splitext(fname)
         outFile = root + '-sum' + ext
-        yearCols = filter(str.isdigit, df.columns)
 
         with open(outFile, 'w') as f:
-            sums = df[yearCols].sum()
             csvText = sums.to_csv(None)
             f.write("%s\n%s\n" % (outFile, csvText))
 
@@ -907,7 +1226,10 @@ def sumYearsByGroup(groupCol, files, skiprows=1, interpolate=False):
     with the name formed by the basename of the original file, followed by
     "-groupby-" and the groupCol. For example, given the file "foobar.csv" and
     groupCol "region", the file "foobar-groupby-region.csv" would be generated.
-    Tests that all rows have the same units; otherwise raises an error.
+    Tests that all rows have the same units; otherwise raises an error. As with
+    :py:func:`sumYears`, files are processed one at a time, in chunks, and each
+    chunk's per-group sums are added to a running total, so memory use is bounded
+    by one chunk plus one row per group.
 
     :param groupCol: (str) the column with categorical data to group by.
     :param files: (list of str) Filenames to process
@@ -918,11 +1240,20 @@ def sumYearsByGroup(groupCol, files, skiprows=1, interpolate=False):
     """
     import numpy as np
 
-    csvFiles = map(ensureCSV, files)
-    dframes  = map(lambda fname: readCsv(fname, skiprows=skiprows, interpolate=interpolate), csvFiles)
+    for fname in files:
+        fname = ensureCSV(fname)
+        units = []
+        df2 = None
+
+        for chunk in readCsvChunks(fname, skiprows=skiprows, interpolate=interpolate):
+            units += [u for u in chunk['Units'].unique() if u not in units]
+            if len(units) > 1:
+                break
+
+            cols = [groupCol] + yearColumns(chunk)
+            part = chunk[cols].groupby(groupCol).aggregate(np.sum)
+            df2 = part if df2 is None else df2.add(part, fill_value=0)
 
-    for df, fname in zip(dframes, csvFiles):
-        units = df['Units'].unique()
         if len(units) != 1:
             raise CommandlineError("Can't sum results; rows have different units: %s" % units)
 
@@ -930,9 +1261,6 @@ def sumYearsByGroup(groupCol, files, skiprows=1, interpolate=False):
         name = groupCol.replace(' ', '_')     # eliminate spaces for general convenience
         outFile = '%s-groupby-%s%s' % (root, name, ext)
 
-        cols = [groupCol] + filter(str.isdigit, df.columns)
-        grouped = df[cols].groupby(groupCol)
-        df2 = grouped.aggregate(np.sum)
         df2['Units'] = units[0]         # add these units to all rows
 
         with open(outFile, 'w') as f:
@@ -940,10 +1268,55 @@ def sumYearsByGroup(groupCol, files, skiprows=1, interpolate=False):
             label = outFile
             f.write("%s\n%s\n" % (label, csvText))
 
-def csv2xlsx(inFiles, outFile, skiprows=0, interpolate=False, years=None, startYear=0):
+def _readSheetData(args):
+    """
+    Read and prepare the data for one worksheet generated by :py:func:`csv2xlsx`.
+    Defined at top level so it can be run in a worker process.
+    """
+    fname, kwargs = args
+    try:
+        df = readCsv(fname, **kwargs)
+    except Exception as e:
+        raise CommandlineError("readCsv failed: %s" % e)
+
+    dropExtraCols(df, inplace=True)
+    return df
+
+def _prefetch(func, argList, jobs):
+    """
+    Generate the results of applying `func` to each element of `argList`, in
+    order, using a pool of `jobs` processes that works at most 2 * `jobs`
+    items ahead of the consumer, which bounds the number of results in memory.
+    If `jobs` is 1, results are computed in this process as they're consumed.
+    """
+    if jobs <= 1:
+        for args in argList:
+            yield func(args)
+        return
+
+    from collections import deque
+    from multiprocessing import Pool
+
+    pool = Pool(jobs)
+    try:
+        pending = deque()
+        for args in argList:
+            pending.append(pool.apply_async(func, (args,)))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+def csv2xlsx(inFiles, outFile, skiprows=0, interpolate=False, years=None, startYear=0, jobs=1):
     """
     Convert a set of CSV files representing GCAM query results into an XLSX file
     with an index page linked by the file names to the sheets with the results.
+    The workbook is written in xlsxwriter's "constant memory" mode, one sheet at a
+    time, so only the data for the sheets being prepared is held in memory.
 
     :param inFiles: (list of str) the names of CSV files to read.
     :param outFile: (str) the name of the XLSX file to create
@@ -952,28 +1325,30 @@ def csv2xlsx(inFiles, outFile, skiprows=0, interpolate=False, years=None, startY
     :param years: (str) the years to extract from the CSV files; must be of the form
       XXXX-YYYY, e.g. 2010-2050.
     :param startYear: (int) If interpolating, the year to begin interpolation
+    :param jobs: (int) the number of worker processes used to read and prepare the
+      data for upcoming sheets while the current one is written.
     :return: none
     """
-    import pandas as pd
+    import xlsxwriter
 
-    csvFiles = map(ensureCSV, inFiles)
-
-    try:
-        dframes  = map(lambda fname: readCsv(fname, skiprows=skiprows, interpolate=interpolate,
-                                             years=years, startYear=startYear), csvFiles)
-    except Exception as e:
-        raise CommandlineError("readCsv failed: %s" % e)
+    csvFiles = [ensureCSV(fname) for fname in inFiles]
+    basenames = [os.path.basename(fname) for fname in csvFiles]
 
     formatStr = getParam('GCAM.ExcelNumberFormat')
 
-    basenames = map(os.path.basename, csvFiles)
-    sheetNum = 1
+    kwargs = dict(skiprows=skiprows, interpolate=interpolate, years=years, startYear=startYear)
+    argList = [(fname, kwargs) for fname in csvFiles]
+    dframes = _prefetch(_readSheetData, argList, jobs)
+
     outFile = ensureExtension(outFile, '.xlsx')
-    with pd.ExcelWriter(outFile, engine='xlsxwriter') as writer:
-        workbook = writer.book
+    workbook = xlsxwriter.Workbook(outFile, {'constant_memory': True})
+    try:
         numFormat = workbook.add_format({'num_format': formatStr}) if formatStr else None
         linkFmt   = workbook.add_format({'font_color': 'blue', 'underline': True})
 
+        # Same style pandas uses for column headings
+        headerFmt = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+
         # Create an index sheet
         indexSheet = workbook.add_worksheet('index')
         indexSheet.write_string(0, 1, 'Links to query results')
@@ -985,23 +1360,34 @@ def csv2xlsx(inFiles, outFile, skiprows=0, interpolate=False, years=None, startY
             indexSheet.write(row, 0, row)
             indexSheet.write_url(row, 1, "internal:%d!A1" % row, linkFmt, name)
 
-        for df, fname in zip(dframes, basenames):
-            sheetName = str(sheetNum)
-            sheetNum += 1
-            dropExtraCols(df, inplace=True)
-            df.to_excel(writer, index=None, sheet_name=sheetName, startrow=3, startcol=0)
-            worksheet = writer.sheets[sheetName]
+        for sheetNum, (df, fname) in enumerate(zip(dframes, basenames)):
+            worksheet = workbook.add_worksheet(str(sheetNum + 1))
 
             if numFormat:
                 # get the numerical indices of all column names that are numeric (i.e., years)
-                yearIndices = map(lambda pair: pair[0], filter(lambda pair: str.isdigit(pair[1]), enumerate(df.columns)))
+                yearCols = set(yearColumns(df))
+                yearIndices = [idx for idx, col in enumerate(df.columns) if col in yearCols]
                 for idx in yearIndices:
                     worksheet.set_column(idx, idx, None, numFormat)
 
+            # In constant memory mode, rows must be written in order
             worksheet.write_string(0, 0, "Filename:")
             worksheet.write_string(0, 1, fname)
             worksheet.write_url(1, 0, "internal:index!A1", linkFmt, "Back to index")
 
+            startRow = 3
+            for col, name in enumerate(df.columns):
+                worksheet.write(startRow, col, name, headerFmt)
+
+            # Rows are generated one at a time, as python types; NaN is written as an empty cell
+            for row, values in enumerate(df.itertuples(index=False, name=None)):
+                worksheet.write_row(startRow + 1 + row, 0, [None if value != value else value for value in values])
+
+            del df
+    finally:
+        dframes.close()     # terminates the worker pool, if any
+        workbook.close()
+
 
 # TBD: Move to query_plugin.py?
 def queryMain(args):
@@ -1014,7 +1400,9 @@ def queryMain(args):
     miLogFile   = getParam('GCAM.MI.LogFile')
     outputDir   = args.outputDir or getParam('GCAM.OutputDir')
     groupDir    = args.groupDir
-    scenario    = args.scenario
+    scenarios   = args.scenario.split(',')
+    scenario    = scenarios[0]
+    jobs        = args.jobs
     sandbox     = args.workspace or pathjoin(getParam('GCAM.SandboxDir'), groupDir, scenario)
     xmldb       = args.xmldb     or pathjoin(sandbox, 'output', getParam('GCAM.DbFile'))
     queryPath   = args.queryPath or getParam('GCAM.QueryPath')
@@ -1051,6 +1439,9 @@ def queryMain(args):
     if not (xmldb or inMemory):
         raise CommandlineError('Must specify xmldb if not using in-memory database')
 
+    if prequery and len(scenarios) > 1:
+        raise CommandlineError('The pre-query step must be run for one scenario at a time')
+
     if queryNames:
         _logger.debug("Query names: %s", queryNames)
 
@@ -1092,7 +1483,27 @@ def queryMain(args):
     # If not a prequery step, we're running queries post-GCAM, which means a database on disk
     # For now, we support running multiple queries in a single batch file, or the old way,
     # running each one individually. The latter is probably not needed, except for debugging.
-    if batchMultiple:
+    if len(scenarios) > 1 or jobs > 1:
+        # An explicit database or workspace holds all the scenarios; otherwise,
+        # each scenario is found in its own sandbox.
+        if args.xmldb or args.workspace:
+            dbPaths = xmldb
+        else:
+            dbPaths = {name: os.path.abspath(pathjoin(getParam('GCAM.SandboxDir'), groupDir, name,
+                                                      'output', getParam('GCAM.DbFile')))
+                       for name in scenarios}
+
+        queryJobs = queryScenarios(scenarios, queries, dbPaths,
+                                   jobs=jobs, queryPath=queryPath, outputDir=outputDir,
+                                   miLogFile=miLogFile, regions=regions, regionMap=regionMap,
+                                   batchFileIn=batchFileIn, batchFileOut=batchFileOut,
+                                   rewriteParser=rewriteParser, noRun=args.noRun, noDelete=noDelete)
+
+        failed = [job.scenario for job in queryJobs if not job.ok()]
+        if failed:
+            raise PygcamException("Queries failed for scenario(s): %s" % ', '.join(failed))
+
+    elif batchMultiple:
         runMultiQueryBatch(scenario, queries, xmldb=xmldb, queryPath=queryPath, outputDir=outputDir,
                            miLogFile=miLogFile, regions=regions, regionMap=regionMap,
                            batchFileIn=batchFileIn, batchFileOut=batchFileOut,
@@ -3,13 +3,19 @@
 .. Copyright (c) 2016 Richard Plevin
    See the https://opensource.org/licenses/MIT for license details.
 '''
+import re
 from collections import defaultdict
+from lxml import etree as ET
 
 from .config import getParam
+from .csvCache import FileCache, fileSignature
 from .error import PygcamException
+from .log import getLogger
 from .utils import getBooleanXML, resourceStream
 from .XMLFile import XMLFile
 
+_logger = getLogger(__name__)
+
 #
 # Classes to parse queryFiles and the <queries> element of project.xml
 # (see pygcam/etc/queries-schema.xsd). These are in a separate file
@@ -61,6 +67,98 @@ class QueryFile(object):
         xmlFile = XMLFile(filename, schemaPath='etc/queries-schema.xsd', conditionalXML=True)
         return cls(xmlFile.tree.getroot())
 
+#
+# Index of the queries defined in XML query files (e.g., Main_queries.xml)
+#
+class QueryCatalog(object):
+    """
+    Maps query titles to the XML text of the queries defined in one query
+    file, structured either like Main_queries.xml or like a batch query file.
+    The file is parsed only once per process, and the index is persisted in
+    the directory given by config variable ``GCAM.QueryCatalogDir`` (unless it
+    is empty) so other processes needn't parse it at all. Both copies are
+    discarded if the file's size or modification time changes.
+    """
+    # instances by absolute pathname
+    cache = {}
+
+    # This Xpath supports both Main_Queries-type files and batch query files
+    xpath = '/queries/queryGroup/*[@title]|/queries/aQuery/*[@title]'
+
+    # Persisted catalogs are small; this just keeps abandoned ones from accumulating
+    maxCacheBytes = 100 * 1024 * 1024
+
+    def __init__(self, filename, index):
+        self.filename = filename
+        self.signature = fileSignature(filename)
+        self.index = index
+
+    @classmethod
+    def getCatalog(cls, filename):
+        """
+        Return the catalog for `filename`, parsing the file only if neither
+        an in-memory nor a persisted catalog matches the current file.
+
+        :param filename: (str) the pathname of an XML query file
+        :return: a QueryCatalog instance
+        """
+        sig = fileSignature(filename)
+        obj = cls.cache.get(sig and sig[0])
+        if obj and obj.signature == sig:
+            return obj
+
+        catalogDir = getParam('GCAM.QueryCatalogDir', raiseError=False)
+        fileCache = FileCache(catalogDir, cls.maxCacheBytes) if catalogDir else None
+        tag = 'QueryCatalog'
+
+        index = fileCache.load(filename, tag) if fileCache else None
+        if index is None:
+            index = cls._buildIndex(filename)
+            if fileCache:
+                fileCache.save(filename, tag, index)
+
+        obj = cls(filename, index)
+        if sig:
+            cls.cache[sig[0]] = obj
+
+        return obj
+
+    @classmethod
+    def _buildIndex(cls, filename):
+        _logger.debug("Indexing queries in '%s'", filename)
+        parser = ET.XMLParser(remove_blank_text=True)
+        tree = ET.parse(filename, parser=parser)
+
+        index = {}
+        for elt in tree.xpath(cls.xpath):
+            # if a title appears more than once, the first one is used
+            title = elt.get('title')
+            if title not in index:
+                index[title] = ET.tostring(elt, with_tail=False)
+
+        return index
+
+    def titles(self):
+        return self.index.keys()
+
+    def findQuery(self, title):
+        """
+        Find the query with the given title, trying the variants formed by
+        replacing '_', '-', and both with spaces, in that order.
+
+        :param title: (str) the title of a query
+        :return: (lxml.etree.Element) a new element holding the query definition,
+           which the caller is free to modify, or None if the query is not found.
+        """
+        for pattern in (None, '_', '-', '[-_]'):
+            altTitle = re.sub(pattern, ' ', title) if pattern else title
+            text = self.index.get(altTitle)
+            if text is not None:
+                parser = ET.XMLParser(remove_blank_text=True)
+                return ET.fromstring(text, parser=parser)
+
+        return None
+
 #
 # Classes to parse rewriteSets.xml (see pygcam/etc/rewriteSets-schema.xsd)
 #
@@ -101,6 +199,7 @@ class RewriteSetParser(object):
         rewriteSets = map(RewriteSet, node.findall('rewriteSet'))
         self.rewriteSets = {obj.name : obj for obj in rewriteSets}
         self.filename = filename # for error messages only
+        self.signature = fileSignature(filename)
 
     def getRewriteSet(self, name):
         try:
@@ -119,7 +218,7 @@ class RewriteSetParser(object):
         filename = filename or getParam('GCAM.RewriteSetsFile')
 
         obj = cls.cache.get(filename)
-        if obj:
+        if obj and obj.signature == fileSignature(filename):
             return obj
 
         xmlFile = XMLFile(filename, schemaPath='etc/rewriteSets-schema.xsd')
@@ -0,0 +1,349 @@
+'''
+.. Compact in-memory representation of GCAM query results.
+
+   A query result is stored as a set of categorical "dimension" columns
+   (e.g., region, sector, technology), each holding small integer codes
+   into a list of distinct values, plus a single contiguous float matrix
+   holding the values for all year columns. This typically requires a
+   fraction of the memory of the equivalent object-dtype DataFrame, and
+   selecting rows by dimension values compares integer codes rather than
+   evaluating a query string against every row.
+
+.. Copyright (c) 2017 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+import os
+import re
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .error import PygcamException, FileFormatError, FileMissingError
+from .log import getLogger
+from .query import yearColumns, interpolateMatrix
+
+_logger = getLogger(__name__)
+
+def _readCompact(filename, skiprows=1):
+    """
+    Parse a GCAM batch query CSV file into a QueryResult. The column headings
+    are read first so the non-year columns can be parsed directly as
+    categoricals, which avoids building an object-dtype column for each.
+    """
+    import csv
+
+    try:
+        with open(filename) as f:
+            for _ in range(skiprows):
+                f.readline()
+            header = next(csv.reader(f))
+
+    except IOError as e:
+        raise FileMissingError(os.path.abspath(filename), e)
+
+    except StopIteration:
+        raise FileFormatError("%s has no column headings" % filename)
+
+    dtypes = {name : 'category' for name in header if name and not name.isdigit()}
+
+    try:
+        _logger.debug("Reading %s", filename)
+        df = pd.read_csv(filename, skiprows=skiprows, index_col=None, dtype=dtypes)
+
+    except Exception as e:
+        raise PygcamException('Error reading %s: %s' % (filename, e))
+
+    return QueryResult.fromDataFrame(df)
+
+_Comparison = re.compile(r"""^\s*(\w+)\s*(==|!=)\s*(?:'([^']*)'|"([^"]*)")\s*$""")
+
+def parseConstraint(constraint):
+    """
+    Convert a constraint string of the form used with ``DataFrame.query()``,
+    comprising comparisons of columns with quoted strings joined by "and",
+    e.g., ``"region == 'USA' and sector != 'biomass'"``, to the equivalent
+    list of tuples for :py:meth:`QueryResult.select`.
+
+    :param constraint: (str) the constraint string
+    :return: (list of (column, op, value) tuples) the constraints, or None if
+        `constraint` includes any other type of expression.
+    """
+    constraints = []
+    for term in re.split(r'\s+and\s+', constraint.strip()):
+        match = _Comparison.match(term)
+        if not match:
+            return None
+
+        name, op, single, double = match.groups()
+        constraints.append((name, op, double if single is None else single))
+
+    return constraints
+
+class QueryResult(object):
+    """
+    The data from a GCAM query result, with each non-year column stored as a
+    ``pandas.Categorical`` and the year columns as a 2-D float array with one
+    row per result row and one column per year.
+
+    Slicing a QueryResult with a ``slice`` (e.g., ``qr[10:20]``) returns a view
+    sharing the original data; :py:meth:`groups` uses such views when the rows
+    are already ordered by the grouping column, as is usual for the "region"
+    column of ModelInterface output.
+    """
+    def __init__(self, dims, years, values, columns=None, title=None):
+        """
+        :param dims: (OrderedDict of str -> pandas.Categorical) the non-year columns
+        :param years: (numpy array of int) the years corresponding to the columns
+            of `values`
+        :param values: (numpy 2-D array of float) the year data
+        :param columns: (list of str) the names of all columns in the order they
+            should appear in a DataFrame. Defaults to the dimensions followed by
+            the years.
+        :param title: (str) the title of the query, if known
+        """
+        self.dims   = dims
+        self.years  = np.asarray(years, dtype=int)
+        self.values = values
+        self.title  = title
+        self.columns = columns or (list(dims.keys()) + [str(y) for y in self.years])
+
+    @classmethod
+    def fromDataFrame(cls, df, title=None):
+        """
+        Create a QueryResult from a DataFrame in the format returned by
+        :py:func:`pygcam.query.readCsv`.
+
+        :param df: (pandas.DataFrame) query results
+        :param title: (str) the title of the query, if known
+        :return: a QueryResult instance
+        """
+        yearCols = yearColumns(df)
+        yearSet = set(yearCols)
+
+        dims = OrderedDict([(col, pd.Categorical(df[col])) for col in df.columns if col not in yearSet])
+        years = [int(col) for col in yearCols]
+        values = np.ascontiguousarray(df[yearCols].values, dtype=float)
+
+        return cls(dims, years, values, columns=list(df.columns), title=title)
+
+    @classmethod
+    def read(cls, filename, skiprows=1, years=None, interpolate=False, startYear=0):
+        """
+        Read a CSV file of the form generated by GCAM batch queries, with the
+        same arguments as :py:func:`pygcam.query.readCsv`. The file is parsed
+        directly into compact form, and unless config variable ``GCAM.CsvCacheDir``
+        is empty, the result is stored in the persistent CSV cache.
+
+        :return: a QueryResult instance
+        """
+        from .csvCache import readCachedCsv
+
+        obj = readCachedCsv(filename, 'QueryResult:skiprows=%d' % skiprows,
+                            lambda filename: _readCompact(filename, skiprows=skiprows))
+        if years:
+            obj.limitYears(years)
+
+        if interpolate:
+            obj.interpolate(startYear=startYear)
+
+        return obj
+
+    def toDataFrame(self, categorical=False):
+        """
+        Convert to a DataFrame with the original column order. Year values are
+        always floats.
+
+        :param categorical: (bool) if True, dimension columns are returned as
+            pandas categoricals, otherwise as ordinary (e.g., object) columns.
+        :return: (pandas.DataFrame) the data
+        """
+        data = OrderedDict()
+        for name, cat in self.dims.items():
+            data[name] = cat if categorical else np.asarray(cat)
+
+        for i, year in enumerate(self.years):
+            data[str(year)] = self.values[:, i]
+
+        return pd.DataFrame(data, columns=self.columns)
+
+    def drop(self, names):
+        """
+        Return a QueryResult without the given dimensions, sharing this instance's data.
+
+        :param names: (iterable of str) the names of dimensions to drop; names
+            that aren't dimensions are ignored.
+        :return: a QueryResult instance
+        """
+        names = set(names)
+        dims = OrderedDict([(name, cat) for name, cat in self.dims.items() if name not in names])
+        columns = [col for col in self.columns if col not in names]
+        return QueryResult(dims, self.years, self.values, columns=columns, title=self.title)
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def __getitem__(self, key):
+        """
+        Return the rows selected by `key`. If `key` is a slice, the result is a
+        view sharing data with this instance; otherwise `key` must be an array
+        of row indices and the rows are copied.
+        """
+        if isinstance(key, slice):
+            dims = OrderedDict([(name, cat[key]) for name, cat in self.dims.items()])
+            return self._derive(dims, self.values[key])
+
+        return self.take(key)
+
+    def _derive(self, dims, values):
+        # Subclasses may have different constructors, so derived results use this class
+        return QueryResult(dims, self.years, values, columns=self.columns, title=self.title)
+
+    def take(self, indices):
+        """
+        Return a new QueryResult with copies of the rows with the given indices.
+        """
+        indices = np.asarray(indices, dtype=int)
+        dims = OrderedDict([(name, cat.take(indices)) for name, cat in self.dims.items()])
+        return self._derive(dims, self.values[indices])
+
+    def column(self, name):
+        """
+        Return the values in the named column, which can be a dimension or a year.
+
+        :param name: (str) the name of a column
+        :return: (numpy array) the column values
+        """
+        if name in self.dims:
+            return np.asarray(self.dims[name])
+
+        if not str(name).isdigit():
+            raise PygcamException("Query result has no column named '%s'" % name)
+
+        matches = np.flatnonzero(self.years == int(name))
+        if len(matches) == 0:
+            raise PygcamException("Query result has no column for year %s" % name)
+
+        return self.values[:, matches[0]]
+
+    def mask(self, name, value, op='=='):
+        """
+        Compute a boolean array indicating the rows in which the dimension `name`
+        is equal (or, if `op` is '!=', not equal) to `value`.
+        """
+        if op not in ('==', '!='):
+            raise PygcamException("Unknown operator '%s' in query result selection" % op)
+
+        try:
+            cat = self.dims[name]
+        except KeyError:
+            raise PygcamException("Query result has no dimension named '%s'" % name)
+
+        categories = list(cat.categories)
+        codes = cat.codes
+
+        if value in categories:
+            match = (codes == categories.index(value))
+        else:
+            match = np.zeros(len(codes), dtype=bool)
+
+        return match if op == '==' else ~match
+
+    def select(self, constraints=None, **kwargs):
+        """
+        Return the rows satisfying all of the given constraints. If the rows
+        selected are contiguous, the result is a view; otherwise they're copied.
+
+        :param constraints: (list of (column, op, value) tuples) where `op`
+            is '==' or '!='.
+        :param kwargs: keyword arguments are treated as equality constraints,
+            e.g., ``select(region='USA')``.
+        :return: a QueryResult instance with the selected rows
+        """
+        constraints = list(constraints or []) + [(name, '==', value) for name, value in kwargs.items()]
+
+        selected = np.ones(len(self), dtype=bool)
+        for name, op, value in constraints:
+            selected &= self.mask(name, value, op=op)
+
+        indices = np.flatnonzero(selected)
+        count = len(indices)
+
+        if count and indices[-1] - indices[0] + 1 == count:
+            return self[indices[0]:indices[-1] + 1]
+
+        return self.take(indices)
+
+    def groups(self, name):
+        """
+        Generate the rows having each distinct value of dimension `name`, in the
+        order of the dimension's categories, similar to ``DataFrame.groupby()``.
+        If the rows are not already ordered by `name`, they are reordered once.
+
+        :param name: (str) the name of a dimension column
+        :return: (generator of (value, QueryResult) tuples) each QueryResult is a
+            view of the rows having the given value.
+        """
+        cat = self.dims[name]
+        codes = cat.codes
+
+        order = np.argsort(codes, kind='mergesort')     # stable, so row order is preserved
+        ordered = self if np.all(order == np.arange(len(order))) else self.take(order)
+        sortedCodes = codes[order]
+
+        bounds = np.flatnonzero(np.diff(sortedCodes)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends   = np.concatenate((bounds, [len(sortedCodes)]))
+
+        for start, end in zip(starts, ends):
+            if end > start and sortedCodes[start] >= 0:     # code -1 means NaN
+                yield cat.categories[sortedCodes[start]], ordered[start:end]
+
+    def yearSums(self):
+        """
+        Return the sum of each year's values across all rows.
+
+        :return: (pandas.Series) the sums, indexed by year column name
+        """
+        return pd.Series(self.values.sum(axis=0), index=[str(y) for y in self.years])
+
+    def limitYears(self, years):
+        """
+        Drop all years outside the range given by `years`, in place.
+        See :py:func:`pygcam.query.limitYears`.
+
+        :param years: a sequence of two years (str or int); only values in this
+            range (inclusive) are kept.
+        :return: self
+        """
+        first, last = map(int, years)
+        keep = (self.years >= first) & (self.years <= last)
+
+        dropped = set(str(y) for y in self.years[~keep])
+        self.columns = [col for col in self.columns if col not in dropped]
+        self.years  = self.years[keep]
+        self.values = np.ascontiguousarray(self.values[:, keep])
+        return self
+
+    def interpolate(self, startYear=0):
+        """
+        Linearly interpolate annual values between time-steps, in place.
+        See :py:func:`pygcam.query.interpolateYears`.
+
+        :param startYear: (int) the year at which to begin interpolation
+        :return: self
+        """
+        allYears, matrix = interpolateMatrix(self.values, self.years, startYear=startYear)
+
+        oldYearCols = set(str(y) for y in self.years)
+        self.columns = [col for col in self.columns if col not in oldYearCols] + [str(y) for y in allYears]
+        self.years  = allYears
+        self.values = np.ascontiguousarray(matrix)
+        return self
+
+    def nbytes(self):
+        """
+        Return the approximate number of bytes used by the data.
+        """
+        dimBytes = sum([cat.codes.nbytes + cat.categories.nbytes for cat in self.dims.values()])
+        return self.values.nbytes + dimBytes
@@ -112,7 +112,7 @@ def _workspaceLinkOrCopy(src, srcWorkspace, dstWorkspace, copyFiles=False):
             symlinkOrCopyFile(srcPath, dstPath)
 
 
-def createSandbox(sandbox, srcWorkspace=None, forceCreate=False, mcsMode=None):
+def createSandbox(sandbox, srcWorkspace=None, forceCreate=False, mcsMode=None, copyRefWorkspace=True):
     '''
     Set up a run-time sandbox in which to run GCAM. This involves copying
     from or linking to files and directories in `workspace`, which defaults
@@ -123,6 +123,8 @@ def createSandbox(sandbox, srcWorkspace=None, forceCreate=False, mcsMode=None):
     :param forceCreate: (bool) if True, delete and recreate the sandbox
     :param mcsMode: ('gensim', 'trial', or None) perform setup appropriate
        for pygcam-mcs trials.
+    :param copyRefWorkspace: (bool) if False, assume the caller has already
+       created `srcWorkspace` by calling :py:func:`copyWorkspace`.
     :return: none
     '''
     if not srcWorkspace:
@@ -131,7 +133,7 @@ def createSandbox(sandbox, srcWorkspace=None, forceCreate=False, mcsMode=None):
 
     # MCS "new" sub-command creates its ref workspace; for non-MCS
     # we do it here, on demand, i.e., if it doesn't exist already.
-    if not mcsMode:
+    if not mcsMode and copyRefWorkspace:
         copyWorkspace(srcWorkspace)
 
     if mcsMode and getParamAsBoolean('GCAM.CopyAllFiles'):
@@ -258,3 +260,201 @@ def copyWorkspace(newWorkspace, refWorkspace=None, forceCreate=False, mcsMode=Fa
 
     # if successful, remove semaphore
     os.remove(semaphoreFile)
+
+
+def setupScenario(args, mcsMode=None, copyRefWorkspace=True):
+    '''
+    Create the sandbox for a scenario and generate its XML files by running
+    the setup class defined for it, as for the "setup" sub-command.
+
+    :param args: (argparse.Namespace) the arguments to the "setup" sub-command
+    :param mcsMode: ('gensim', 'trial', or None) perform setup appropriate
+       for pygcam-mcs trials.
+    :param copyRefWorkspace: (bool) passed to :py:func:`createSandbox`
+    :return: none
+    '''
+    from importlib import import_module
+    from .utils import loadModuleFromPath
+
+    scenario = args.scenario or args.baseline
+    if not scenario:
+        raise SetupException('At least one of --baseline (-b) / --scenario (-s) must be used.')
+
+    projectDir = getParam('GCAM.ProjectDir')
+    groupName = args.group if args.useGroupDir else ''
+    srcGroupDir = args.srcGroupDir or groupName
+
+    if args.workspace:
+        workspace = args.workspace
+    else:
+        groupDir  = os.path.normpath(pathjoin(projectDir, groupName))
+        workspace = pathjoin(groupDir, scenario)
+
+    forceCreate = args.forceCreate or bool(mcsMode)
+
+    if not mcsMode or mcsMode == 'trial':
+        createSandbox(workspace, srcWorkspace=args.refWorkspace, forceCreate=forceCreate,
+                      mcsMode=mcsMode, copyRefWorkspace=copyRefWorkspace)
+
+    xmlSourceDir = args.xmlSourceDir or getParam('GCAM.XmlSrc')
+
+    # If a setup XML file is defined, use the defined (or default) XMLEditor subclass
+    setupXml = args.setupXml or getParam('GCAM.ScenarioSetupFile')
+    if setupXml:
+        from .xmlSetup import createXmlEditorSubclass
+        _logger.debug('Setup using %s, mcsMode=%s', setupXml, mcsMode)
+        scenClass = createXmlEditorSubclass(setupXml, mcsMode=mcsMode)
+
+    else:
+        # If neither is defined, we assume a custom scenarios.py file is used
+        try:
+            if args.moduleSpec:
+                module = import_module(args.moduleSpec, package=None)
+            else:
+                modulePath = args.modulePath or pathjoin(xmlSourceDir, srcGroupDir, 'scenarios.py')
+                _logger.debug('Setup using %s', modulePath)
+                module = loadModuleFromPath(modulePath)
+
+        except Exception as e:
+            moduleName = args.moduleSpec or modulePath
+            raise SetupException('Failed to load scenarioMapper or ClassMap from module %s: %s' % (moduleName, e))
+
+        try:
+            # First look for a function called scenarioMapper
+            scenarioMapper = getattr(module, 'scenarioMapper', None)
+            if scenarioMapper:
+                scenClass = scenarioMapper(scenario)
+
+            else:
+                # Look for 'ClassMap' in the specified module
+                classMap  = getattr(module, 'ClassMap')
+                scenClass = classMap[scenario]
+
+        except KeyError:
+            raise SetupException('Failed to map scenario "%s" to a class in %s' % (scenario, module.__file__))
+
+    subdir = args.subdir or scenario
+    refWorkspace  = args.refWorkspace or getParam('GCAM.RefWorkspace')
+    xmlOutputRoot = args.xmlOutputRoot or workspace
+
+    # When called from gcammcs in 'trial' mode, we only run dynamic setup. When run
+    # in 'gensim' mode, we do only static setup.
+    args.dynamicOnly = args.dynamicOnly or mcsMode == 'trial'
+
+    if mcsMode == 'gensim':
+        args.dynamicOnly = False
+        args.staticOnly  = True
+
+    # TBD: Document that all setup classes must conform to this protocol
+    obj = scenClass(args.baseline, args.scenario, xmlOutputRoot, xmlSourceDir,
+                    refWorkspace, groupName, srcGroupDir, subdir)
+
+    obj.mcsMode = mcsMode
+    obj.setup(args)
+
+
+def _setupScenarioTask(args, mcsMode):
+    '''
+    Set up one scenario for :py:func:`setupScenarios`. Each scenario starts
+    with an empty XML file cache, so no edits are shared between scenarios.
+    '''
+    from .xmlEditor import CachedFile
+
+    CachedFile.clear(write=False)
+    setupScenario(args, mcsMode=mcsMode, copyRefWorkspace=False)
+
+
+def scenarioDependencies(args, scenarios=None):
+    '''
+    Identify the baseline on which each of the given scenarios is based.
+
+    :param args: (argparse.Namespace) the arguments to the "setup" sub-command
+    :param scenarios: (list of str) the scenarios to set up. If empty, and a
+       scenario setup XML file is used, all active scenarios in the group
+       identified by ``args.group`` (or the default group) are set up.
+    :return: (list of (str, str)) pairs of scenario name and the name of its
+       baseline, which is None for the baseline itself.
+    :raises SetupException: if a scenario is not in the group, or if the baseline
+       cannot be determined.
+    '''
+    setupXml = args.setupXml or getParam('GCAM.ScenarioSetupFile')
+
+    if setupXml:
+        from .xmlSetup import ScenarioSetup
+
+        scenarioSetup = ScenarioSetup.parse(setupXml)
+        groupName = args.group or scenarioSetup.defaultGroup
+        try:
+            group = scenarioSetup.groupDict[groupName]
+        except KeyError:
+            raise SetupException('Scenario group "%s" is not defined in %s' % (groupName, setupXml))
+
+        baseline = group.baseline
+        if scenarios:
+            unknown = [name for name in scenarios if name not in group.finalDict]
+            if unknown:
+                raise SetupException('Scenarios not found in group "%s": %s' % (groupName, ', '.join(unknown)))
+        else:
+            scenarios = [name for name, scen in group.finalDict.items() if scen.isActive]
+    else:
+        baseline = args.baseline
+        if not (baseline and scenarios):
+            raise SetupException('Without a scenario setup XML file, the baseline (-b) and scenarios (-s) must be given')
+
+    return [(name, None if name == baseline else baseline) for name in scenarios]
+
+
+def setupScenarios(args, scenarios=None, jobs=1, mcsMode=None):
+    '''
+    Set up several scenarios, running up to `jobs` at a time in separate processes.
+    A policy scenario builds on its baseline's local-xml files, so it is set up after
+    its baseline if both are being set up; otherwise scenarios are independent. A
+    baseline defined in another group (via the group's "baselineSource" attribute)
+    must already have been set up.
+
+    :param args: (argparse.Namespace) the arguments to the "setup" sub-command
+    :param scenarios: (list of str) the scenarios to set up; see :py:func:`scenarioDependencies`
+    :param jobs: (int) the maximum number of scenarios to set up at once
+    :param mcsMode: ('gensim', 'trial', or None) perform setup appropriate
+       for pygcam-mcs trials.
+    :return: (OrderedDict of str -> TaskResult) the outcome for each scenario
+    :raises SetupException: if setup failed for any scenario, or was skipped
+       because its baseline failed.
+    '''
+    from argparse import Namespace
+    from .taskGraph import TaskGraph
+
+    if args.workspace or args.xmlOutputRoot or args.subdir:
+        raise SetupException('--workspace, --xmlOutputRoot, and --subdir can be used only when setting up one scenario')
+
+    pairs = scenarioDependencies(args, scenarios)
+    names = [name for name, _ in pairs]
+
+    # Create the reference workspace once, rather than concurrently in each worker
+    if not mcsMode:
+        copyWorkspace(args.refWorkspace or getParam('GCAM.SandboxRefWorkspace'))
+
+    graph = TaskGraph()
+
+    for name, baseline in pairs:
+        scenArgs = Namespace(**vars(args))
+        scenArgs.baseline, scenArgs.scenario = (baseline, name) if baseline else (name, None)
+        dependsOn = [baseline] if baseline in names else None
+        graph.addTask(name, _setupScenarioTask, args=(scenArgs, mcsMode), dependsOn=dependsOn)
+
+    def report(result):
+        if result.ok():
+            _logger.info('Setup of scenario %s succeeded (%.1f sec)', result.name, result.seconds)
+        else:
+            _logger.error('Setup of scenario %s %s: %s', result.name, result.status, result.error)
+
+    _logger.info('Setting up %d scenarios, %d at a time', len(names), max(1, min(jobs, len(names))))
+
+    # Use a fresh process for each scenario so no state carries over between them
+    results = graph.run(jobs=jobs, maxTasksPerChild=1, callback=report)
+
+    failed = [result.name for result in results.values() if not result.ok()]
+    if failed:
+        raise SetupException('Setup failed for %d of %d scenarios: %s' % (len(failed), len(names), ', '.join(failed)))
+
+    return results
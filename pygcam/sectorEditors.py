@@ -4,7 +4,7 @@
 '''
 from os import path
 from .log import getLogger
-from .xmlEditor import XMLEditor, xmlEdit, extractStubTechnology, callableMethod, ENERGY_TRANSFORMATION_TAG
+from .xmlEditor import XMLEditor, xmlEditLater, extractStubTechnology, callableMethod, ENERGY_TRANSFORMATION_TAG
 
 _logger = getLogger(__name__)
 
@@ -99,7 +99,7 @@ class BioenergyEditor(XMLEditor):
                  (fractHarvested + "[@price='%s']/@price" % loTarget, loPrice),
                  (fractHarvested + "[@price='%s']/@price" % hiTarget, hiPrice)]
 
-        xmlEdit(resbioFileAbs, pairs)
+        xmlEditLater(resbioFileAbs, pairs)
         self.updateScenarioComponent("residue_bio", resbioFileRel)
 
     @callableMethod
@@ -108,7 +108,7 @@ class BioenergyEditor(XMLEditor):
 
         xpath = "//region[@name='%s']/renewresource/smooth-renewable-subresource[@name='generic waste biomass']/%s" % (region, parameter)
 
-        xmlEdit(resourcesFileAbs, [(xpath, value)])
+        xmlEditLater(resourcesFileAbs, [(xpath, value)])
 
         self.updateScenarioComponent("resources", resourcesFileRel)
 
@@ -118,12 +118,12 @@ class BioenergyEditor(XMLEditor):
 
         resourcesFileRel, resourcesFileAbs = self.getLocalCopy(RESOURCES_TAG)
 
-        xmlEdit(resourcesFileAbs, [("//region[@name='%s']/renewresource[@name='biomass']/market" % region, region)])
+        xmlEditLater(resourcesFileAbs, [("//region[@name='%s']/renewresource[@name='biomass']/market" % region, region)])
         self.updateScenarioComponent("resources", resourcesFileRel)
 
         agForPastBioFileRel, agForPastBioFileAbs = self.getLocalCopy(AG_BASE_TAG)
 
-        xmlEdit(agForPastBioFileAbs, [("//region[@name='%s']/AgSupplySector[@name='biomass']/market" % region, region)])
+        xmlEditLater(agForPastBioFileAbs, [("//region[@name='%s']/AgSupplySector[@name='biomass']/market" % region, region)])
         self.updateScenarioComponent("ag_base", agForPastBioFileRel)
 
     # TBD: generalize this as setInputCoefficients(self, (('wholesale gas', x), ('elect_td_ind', y)))
@@ -142,7 +142,7 @@ class BioenergyEditor(XMLEditor):
 
         enSupplyFileRel, enSupplyFileAbs = self.getLocalCopy(ENERGY_SUPPLY_TAG)
 
-        xmlEdit(enSupplyFileAbs, [(cornCoefXpath, cornCoef)])
+        xmlEditLater(enSupplyFileAbs, [(cornCoefXpath, cornCoef)])
 
         self.updateScenarioComponent(ENERGY_SUPPLY_TAG, enSupplyFileRel)
 
@@ -159,7 +159,7 @@ class BioenergyEditor(XMLEditor):
                 elecCoefXpath = xpath % 'elect_td_ind'
                 pairs.append((elecCoefXpath, elecCoef))
 
-            xmlEdit(enTransFileAbs, pairs)
+            xmlEditLater(enTransFileAbs, pairs)
             self.updateScenarioComponent("energy_transformation", enTransFileRel)
 
     # deprecated?
@@ -194,7 +194,7 @@ class BioenergyEditor(XMLEditor):
         if region == 'global':
              region='*'
 
-        xmlEdit(landInput3Abs, [("//region[@name='%s']//isNewTechnology[@year='2020']" % region, 0)])
+        xmlEditLater(landInput3Abs, [("//region[@name='%s']//isNewTechnology[@year='2020']" % region, 0)])
         self.updateScenarioComponent(LAND_INPUT3_TAG, landInput3Rel)
 
     #
@@ -222,7 +222,7 @@ class BioenergyEditor(XMLEditor):
                  (fractHarvested + "[@price='1.5']/@price", hiPrice),
                  (fractHarvested + "[@price='1.2']", loFract),
                  (fractHarvested + "[@price='1.5']", hiFract)]
-        xmlEdit(resbioFileAbs, pairs)
+        xmlEditLater(resbioFileAbs, pairs)
 
         # Do the same for supplysector="NonFoodDemand_Forest"
         xPrefix = "//region[@name='%s']/supplysector[@name='NonFoodDemand_Forest']/subsector[@name='Forest']/stub-technology[@name='Forest']" % region
@@ -232,7 +232,7 @@ class BioenergyEditor(XMLEditor):
                  ("%s[@price='1.5']/@price" % fractHarvested, hiPrice),
                  ("%s[@price='1.2']" % fractHarvested, loFract),
                  ("%s[@price='1.5']" % fractHarvested, hiFract)]
-        xmlEdit(resbioFileAbs, pairs)
+        xmlEditLater(resbioFileAbs, pairs)
 
         self.updateScenarioComponent("residue_bio", resbioFileRel)
 
@@ -250,9 +250,9 @@ class BioenergyEditor(XMLEditor):
 
         yearConstraint = ">= 2015" if year == 'all' else ("=" + year)
 
-        xmlEdit(self.cellEthanolUsaAbs,
-                [("//stub-technology[@name='cellulosic ethanol']/period[@year%s]/share-weight" % yearConstraint,
-                  shareweight)])
+        xmlEditLater(self.cellEthanolUsaAbs,
+                     [("//stub-technology[@name='cellulosic ethanol']/period[@year%s]/share-weight" % yearConstraint,
+                       shareweight)])
 
         self.updateScenarioComponent("cell-etoh-USA", self.cellEthanolUsaRel)
 
@@ -321,7 +321,7 @@ class BioenergyEditor(XMLEditor):
            pairs.append((prefix + ("/period[@year='%s']" % year) + suffix, price))
 
         abspath = pathMap[fuel]
-        xmlEdit(abspath, pairs)
+        xmlEditLater(abspath, pairs)
 
     @callableMethod
     def setCornEthanolCoefficientsUSA(self, cornCoef, gasCoef=None, elecCoef=None):
@@ -347,7 +347,7 @@ class BioenergyEditor(XMLEditor):
             elecCoefXpath = xpath % 'elect_td_ind'
             pairs.append((elecCoefXpath,  elecCoef))
 
-        xmlEdit(self.cornEthanolUsaAbs, pairs)
+        xmlEditLater(self.cornEthanolUsaAbs, pairs)
         # config update handled in localize...()
 
     @callableMethod
@@ -362,5 +362,5 @@ class BioenergyEditor(XMLEditor):
         for year, coef in tuples:
             pairs.append(("%s/period[@year='%s']/%s" % (prefix, year, suffix), coef))
 
-        xmlEdit(self.cellEthanolUsaAbs, pairs)
+        xmlEditLater(self.cellEthanolUsaAbs, pairs)
         # config update handled in localize...()
@@ -0,0 +1,166 @@
+'''
+.. Record the wall time, CPU time, memory use, and exit status of the project
+   steps run by the "run" sub-command, and report them as JSON and as a table.
+
+.. Copyright (c) 2017 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+from __future__ import print_function
+import json
+import os
+import platform
+import sys
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .log import getLogger
+from .utils import mkdirs
+from .version import VERSION
+
+try:
+    import resource     # not available on Windows
+except ImportError:
+    resource = None
+
+_logger = getLogger(__name__)
+
+# ru_maxrss is in kilobytes on Linux but in bytes on macOS
+_RssPerMB = 1024.0 * 1024 if sys.platform == 'darwin' else 1024.0
+
+def _usage():
+    """
+    Return the CPU seconds used by this process and by its terminated children,
+    and the peak resident set size (in MB) of this process or any one child, or
+    None if the resource module is unavailable.
+    """
+    if not resource:
+        return None
+
+    own  = resource.getrusage(resource.RUSAGE_SELF)
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (own.ru_utime + own.ru_stime,
+            kids.ru_utime + kids.ru_stime,
+            max(own.ru_maxrss, kids.ru_maxrss) / _RssPerMB)
+
+
+class StepProfiler(object):
+    """
+    Accumulates one record per (scenario, step) run. Each record holds:
+
+    - ``seconds``: elapsed (wall) time
+    - ``cpuSeconds``: CPU time used by ``gt`` itself, e.g., by internal ("@") steps
+    - ``childCpuSeconds``: CPU time used by programs run by the step, e.g., GCAM
+    - ``peakRssMB``: the largest resident set size of ``gt`` or any one program it
+      has run so far. Since this is a high-water mark, a step's value reflects that
+      step only if it exceeds the value of the preceding steps.
+    - ``exitStatus``: 0 on success, otherwise the exit status of the failed program
+      or 1 if the step failed for another reason.
+
+    CPU and memory use are not available on Windows.
+    """
+    def __init__(self):
+        self.started = time.time()
+        self.records = []
+
+    @contextmanager
+    def measure(self, scenario, step, command):
+        """
+        Context manager that records the resources used by the enclosed code.
+
+        :param scenario: (str) the name of the scenario
+        :param step: (str) the name of the step
+        :param command: (str) the step's command
+        :return: none
+        """
+        record = OrderedDict([('scenario', scenario), ('step', step), ('command', command)])
+        before = _usage()
+        start = time.time()
+        try:
+            yield
+            record['exitStatus'] = 0
+
+        except BaseException as e:
+            record['exitStatus'] = getattr(e, 'exitCode', 1)
+            raise
+
+        finally:
+            record['seconds'] = time.time() - start
+            after = _usage()
+            if after:
+                record['cpuSeconds']      = after[0] - before[0]
+                record['childCpuSeconds'] = after[1] - before[1]
+                record['peakRssMB']       = after[2]
+
+            self.records.append(record)
+
+    def load(self, filename):
+        """
+        Add the records from a report written by :py:meth:`writeJSON`, e.g., by
+        a ``gt`` process that ran one scenario when running scenarios in parallel.
+
+        :param filename: (str) the pathname of the report
+        :return: none
+        """
+        with open(filename) as f:
+            data = json.load(f, object_pairs_hook=OrderedDict)
+
+        self.records.extend(data['steps'])
+
+    def writeJSON(self, filename):
+        """
+        Write the records to `filename` as JSON, along with the pygcam version,
+        host name, and start time, to allow comparison across runs.
+
+        :param filename: (str) the pathname of the report to write
+        :return: none
+        """
+        data = OrderedDict([('pygcamVersion', VERSION),
+                            ('host', platform.node()),
+                            ('started', time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started))),
+                            ('seconds', time.time() - self.started),
+                            ('steps', self.records)])
+
+        dirname = os.path.dirname(filename)
+        if dirname:
+            mkdirs(dirname)
+
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=2)
+
+        _logger.info("Wrote step profile to %s", filename)
+
+    def summary(self):
+        """
+        Return a table of the records, followed by the totals.
+        """
+        def fmt(value, format):
+            return '-' if value is None else format % value
+
+        def total(key):
+            values = [rec[key] for rec in self.records if key in rec]
+            return sum(values) if values else None
+
+        headings = ('Scenario', 'Step', 'Exit', 'Wall sec', 'CPU sec', 'Child CPU', 'Peak MB')
+        rows = [(rec['scenario'], rec['step'], str(rec['exitStatus']),
+                 fmt(rec['seconds'], '%.1f'),
+                 fmt(rec.get('cpuSeconds'), '%.1f'),
+                 fmt(rec.get('childCpuSeconds'), '%.1f'),
+                 fmt(rec.get('peakRssMB'), '%.0f')) for rec in self.records]
+
+        peaks = [rec['peakRssMB'] for rec in self.records if 'peakRssMB' in rec]
+        rows.append(('Total', '', '',
+                     fmt(total('seconds'), '%.1f'),
+                     fmt(total('cpuSeconds'), '%.1f'),
+                     fmt(total('childCpuSeconds'), '%.1f'),
+                     fmt(max(peaks) if peaks else None, '%.0f')))
+
+        widths = [max(len(row[i]) for row in rows + [headings]) for i in range(len(headings))]
+        formats = ['%-*s'] * 2 + ['%*s'] * (len(headings) - 2)
+
+        def line(row):
+            return '  '.join(f % (w, col) for f, w, col in zip(formats, widths, row)).rstrip()
+
+        rule = '  '.join('-' * w for w in widths)
+        lines = [line(headings), rule] + [line(row) for row in rows[:-1]] + [rule, line(rows[-1])]
+        return '\n'.join(lines)
@@ -0,0 +1,279 @@
+'''
+.. Run named tasks in dependency order, running independent tasks concurrently.
+
+.. Copyright (c) 2017 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+import os
+import time
+import traceback
+from collections import OrderedDict
+
+from six.moves import cPickle as pickle
+
+from .error import PygcamException
+from .log import getLogger
+
+_logger = getLogger(__name__)
+
+SUCCEEDED = 'succeeded'
+FAILED    = 'failed'
+SKIPPED   = 'skipped'
+
+# Seconds between checks for finished tasks when running tasks in a pool
+PollInterval = 0.1
+
+# Seconds to wait for the result of a task whose worker process has exited
+# before deciding that the worker died (e.g., was killed for using too much
+# memory) and the result will never arrive.
+LostWorkerGrace = 5.0
+
+# In worker processes, a shared array in which _runTask records the pid of the
+# process running each task. (A lock-free array can't be left locked by a worker
+# that dies, as a queue could.)
+_TaskPids = None
+
+def _initWorker(taskPids):
+    global _TaskPids
+    _TaskPids = taskPids
+
+class TaskResult(object):
+    """
+    The outcome of running one task in a :py:class:`TaskGraph`.
+    """
+    def __init__(self, name, status, error=None, value=None, seconds=0.0):
+        self.name    = name
+        self.status  = status       # SUCCEEDED, FAILED, or SKIPPED
+        self.error   = error        # error message, if status is FAILED or SKIPPED
+        self.value   = value        # the task function's return value
+        self.seconds = seconds
+
+    def ok(self):
+        return self.status == SUCCEEDED
+
+    def __str__(self):
+        if self.ok():
+            return "%s: %s (%.1f sec)" % (self.name, self.status, self.seconds)
+
+        return "%s: %s -- %s" % (self.name, self.status, self.error)
+
+def _runTask(name, func, args, kwargs, index=None):
+    """
+    Run one task, returning its outcome rather than raising an exception.
+    Defined at top level so it can be run in a worker process.
+    """
+    if _TaskPids is not None:
+        _TaskPids[index] = os.getpid()
+
+    start = time.time()
+    try:
+        value = func(*args, **kwargs)
+        error = None
+
+        # A result that can't be pickled would never reach the parent process
+        if _TaskPids is not None:
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    except KeyboardInterrupt:
+        raise
+
+    except BaseException as e:      # including SystemExit, e.g., from sys.exit() in the task
+        _logger.debug("Task %s failed:\n%s", name, traceback.format_exc())
+        value = None
+        error = "%s: %s" % (e.__class__.__name__, e)
+
+    return name, error, value, time.time() - start
+
+class TaskGraph(object):
+    """
+    A set of named tasks and the dependencies among them. When run, each task
+    starts once all the tasks it depends on have succeeded, and tasks whose
+    dependencies are satisfied run concurrently, up to a given number at a time.
+    A task that depends on a failed (or skipped) task is skipped.
+    """
+    def __init__(self):
+        self.tasks = OrderedDict()      # name -> (func, args, kwargs)
+        self.deps  = OrderedDict()      # name -> list of names of tasks it depends on
+
+    def addTask(self, name, func, args=(), kwargs=None, dependsOn=None):
+        """
+        Add a task to the graph.
+
+        :param name: (str) a unique name for the task
+        :param func: (callable) the function to run. To run tasks in worker processes,
+            this must be a module-level function and its arguments must be picklable.
+        :param args: (tuple) positional arguments to `func`
+        :param kwargs: (dict) keyword arguments to `func`
+        :param dependsOn: (list of str) the names of tasks that must succeed before
+            this task is run.
+        :return: none
+        """
+        if name in self.tasks:
+            raise PygcamException("Task '%s' was defined twice" % name)
+
+        self.tasks[name] = (func, tuple(args), kwargs or {})
+        self.deps[name] = list(dependsOn or [])
+
+    def dependents(self, name):
+        return [other for other, deps in self.deps.items() if name in deps]
+
+    def _validate(self):
+        for name, deps in self.deps.items():
+            for dep in deps:
+                if dep not in self.tasks:
+                    raise PygcamException("Task '%s' depends on undefined task '%s'" % (name, dep))
+
+    def run(self, jobs=1, processes=True, maxTasksPerChild=None, callback=None, startCallback=None):
+        """
+        Run all tasks in dependency order.
+
+        :param jobs: (int) the maximum number of tasks to run at once. If 1, tasks
+            are run serially in the calling process.
+        :param processes: (bool) if True, tasks are run in a pool of worker processes,
+            otherwise in a pool of threads.
+        :param maxTasksPerChild: (int) if not None, the number of tasks each worker
+            process runs before being replaced by a new one. Use 1 to run each task in a
+            fresh process.
+        :param callback: (callable) if given, called with each TaskResult as tasks
+            finish or are skipped.
+        :param startCallback: (callable) if given, called with the name of each task
+            as it is started.
+        :return: (OrderedDict of str -> TaskResult) the results, in the order the tasks
+            were added.
+        :raises PygcamException: if a dependency is undefined or the dependencies are circular
+        """
+        self._validate()
+
+        results = {}
+        waiting = OrderedDict([(name, set(deps)) for name, deps in self.deps.items()])
+        running = set()
+        finished = []               # outcomes of finished tasks, not yet processed
+        pending = OrderedDict()     # name -> AsyncResult, for tasks running in the pool
+        missing = {}                # name -> time the task's worker was found to have exited
+        lost = []                   # names of tasks whose worker died
+
+        jobs = max(1, min(jobs, len(waiting)))
+        pool = taskPids = None
+        indices = {name : i for i, name in enumerate(self.tasks)}
+
+        if jobs > 1:
+            if processes:
+                from multiprocessing import Pool, RawArray
+                taskPids = RawArray('i', len(self.tasks))
+                pool = Pool(jobs, maxtasksperchild=maxTasksPerChild,
+                            initializer=_initWorker, initargs=(taskPids,))
+            else:
+                from multiprocessing.pool import ThreadPool
+                pool = ThreadPool(jobs)
+
+        def record(result):
+            results[result.name] = result
+            if callback:
+                callback(result)
+
+        def skipDependents(name):
+            for other in self.dependents(name):
+                if other in waiting:
+                    del waiting[other]
+                    record(TaskResult(other, SKIPPED, error="depends on '%s', which did not succeed" % name))
+                    skipDependents(other)
+
+        def startReadyTasks():
+            ready = [name for name, deps in waiting.items() if not deps]
+            for name in ready:
+                if pool and len(running) >= jobs:
+                    break
+
+                del waiting[name]
+                running.add(name)
+                func, args, kwargs = self.tasks[name]
+
+                if startCallback:
+                    startCallback(name)
+
+                if pool:
+                    pending[name] = pool.apply_async(_runTask, (name, func, args, kwargs, indices[name]))
+                else:
+                    finished.append(_runTask(name, func, args, kwargs))
+
+        def workerLost(name):
+            """
+            Return True if the worker process running task `name` exited more
+            than LostWorkerGrace seconds ago without delivering a result.
+            """
+            from multiprocessing import active_children
+
+            if taskPids is None:
+                return False
+
+            pid = taskPids[indices[name]]
+            if pid == 0 or pid in [proc.pid for proc in active_children()]:
+                return False
+
+            now = time.time()
+            return now - missing.setdefault(name, now) > LostWorkerGrace
+
+        def poll():
+            """
+            Return the outcomes of tasks that finished in the pool, treating any error
+            in retrieving a task's result, or the loss of its worker, as a failure.
+            """
+            outcomes = []
+            for name, result in list(pending.items()):
+                if result.ready():
+                    try:
+                        outcomes.append(result.get(0))
+                    except Exception as e:
+                        outcomes.append((name, "%s: %s" % (e.__class__.__name__, e), None, 0.0))
+
+                elif workerLost(name):
+                    lost.append(name)
+                    outcomes.append((name, "worker process exited unexpectedly", None, 0.0))
+
+                else:
+                    continue
+
+                del pending[name]
+
+            return outcomes
+
+        try:
+            startReadyTasks()
+
+            while running:
+                if pool:
+                    finished.extend(poll())
+
+                if not finished:
+                    time.sleep(PollInterval)
+                    continue
+
+                name, error, value, seconds = finished.pop(0)
+                running.discard(name)
+
+                if error is None:
+                    record(TaskResult(name, SUCCEEDED, value=value, seconds=seconds))
+                    for deps in waiting.values():
+                        deps.discard(name)
+                else:
+                    record(TaskResult(name, FAILED, error=error, seconds=seconds))
+                    skipDependents(name)
+
+                startReadyTasks()
+
+            if pool:
+                if lost:
+                    pool.terminate()    # join() would wait forever for the lost tasks
+                else:
+                    pool.close()
+                    pool.join()
+
+        except BaseException:
+            if pool:
+                pool.terminate()
+            raise
+
+        if waiting:
+            raise PygcamException("Circular dependencies among tasks: %s" % ', '.join(waiting.keys()))
+
+        return OrderedDict([(name, results[name]) for name in self.tasks])
@@ -10,10 +10,10 @@ import os
 import pipes
 import re
 import subprocess
-from glob import glob
+import sys
+from collections import OrderedDict
 
-from .built_ins import BuiltinSubcommands
-from .config import (getParam, getConfig, getParamAsBoolean, getParamAsFloat,
+from .config import (getParam, getConfig, getParamAsBoolean, getParamAsFloat, getParamAsInt,
                      setParam, getSection, setSection, getSections,
                      DEFAULT_SECTION, usingMCS)
 from .error import PygcamException, ProgramExecutionError, ConfigFileError, CommandlineError
@@ -32,44 +32,58 @@ class GcamTool(object):
     # plugin instances by command name
     _plugins = {}
 
-    # cached plugin paths by command name
-    _pluginPaths = {}
+    # PluginIndex entries, describing how to load each plugin, by command name
+    _pluginEntries = OrderedDict()
 
     @classmethod
     def getPlugin(cls, name):
-        if name not in cls._plugins:
-            cls._loadCachedPlugin(name)
+        if name not in cls._plugins and name in cls._pluginEntries:
+            cls._loadIndexedPlugin(name)
 
         return cls._plugins.get(name, None)
 
     @classmethod
-    def _loadCachedPlugin(cls, name):
-        # see if it's already loaded
-        path = cls._pluginPaths[name]
+    def _loadIndexedPlugin(cls, name):
         tool = cls.getInstance()
-        tool.loadPlugin(path)
+        pluginClass = tool.pluginIndex.pluginClass(cls._pluginEntries[name])
+        tool.instantiatePlugin(pluginClass)
 
-    @classmethod
-    def _cachePlugins(cls):
+    def _indexPlugins(self, loadBuiltins=True, loadPlugins=True):
         '''
-        Find all plugins via GCAM.PluginPath and create a dict
-        of plugin pathnames keyed by command name so the plugin
-        can be loaded on-demand.
+        Find the built-in plugins and those in the directories in GCAM.PluginPath,
+        and record how to load each, by command name, so plugins can be loaded on
+        demand. Built-in sub-commands take precedence over plugins of the same name.
         :return: none
         '''
-        from .utils import pathjoin
+        from .pluginIndex import PluginIndex
+
+        self.pluginIndex = index = PluginIndex()
+        entries = OrderedDict()
 
-        pluginDirs = cls._getPluginDirs()
+        if loadBuiltins:
+            from .built_ins import BuiltinSubcommands
+            entries.update(index.builtins('pygcam.built_ins', BuiltinSubcommands))
 
-        suffix = '_plugin.py'
-        suffixLen = len(suffix)
+        # If using MCS, include that set of built-ins, too
+        if usingMCS():
+            from .mcs.built_ins import MCSBuiltins
+            entries.update(index.builtins('pygcam.mcs.built_ins', MCSBuiltins))
 
-        for d in pluginDirs:
-            pattern = pathjoin(d, '*' + suffix)
-            for path in glob(pattern):
-                basename = os.path.basename(path)
-                command = basename[:-suffixLen]
-                cls._pluginPaths[command] = path
+        if loadPlugins:
+            builtins = set(entries.keys())
+            for d in self._getPluginDirs():
+                for name, entry in index.plugins(d).items():
+                    if name not in builtins:
+                        entries[name] = entry
+
+        index.save()
+        GcamTool._pluginEntries = entries
+
+    def loadAllPlugins(self):
+        """
+        Load all known plugins, e.g., to generate documentation or the GUI.
+        """
+        map(self.getPlugin, self._pluginEntries.keys())
 
     _instance = None
 
@@ -87,7 +101,7 @@ class GcamTool(object):
         if reload:
             GcamTool._instance = None
             GcamTool._plugins = {}
-            GcamTool._pluginPaths = {}
+            GcamTool._pluginEntries = OrderedDict()
 
         if not GcamTool._instance:
             GcamTool._instance = cls(loadPlugins=loadPlugins)
@@ -96,34 +110,29 @@ class GcamTool(object):
 
     @classmethod
     def pluginGroup(cls, groupName, namesOnly=False):
+        cls.getInstance().loadAllPlugins()
         objs = filter(lambda obj: obj.getGroup() == groupName, cls._plugins.values())
         result = sorted(map(lambda obj: obj.name, objs)) if namesOnly else objs
         return result
 
     def __init__(self, loadPlugins=True, loadBuiltins=True):
-        from .project import decacheVariables
-
-        # address re-entry issue
-        decacheVariables()
+        # address re-entry issue. (If the project module hasn't been loaded,
+        # there's nothing to decache, so don't import it just to do so.)
+        project = sys.modules.get('pygcam.project')
+        if project:
+            project.decacheVariables()
 
         self.mcsMode = ''
         self.shellArgs = None
+        self.configArgs = []
 
         self.parser = self.subparsers = None
         self.addParsers()
 
-        # load all built-in sub-commands
-        if loadBuiltins:
-            map(self.instantiatePlugin, BuiltinSubcommands)
-
-        # If using MCS, load that set of built-ins, too
-        if usingMCS():
-            from .mcs.built_ins import MCSBuiltins
-            map(self.instantiatePlugin, MCSBuiltins)
-
-        # Load external plug-ins found in plug-in path
-        if loadPlugins:
-            self._cachePlugins()
+        # Plugins are loaded (and their sub-parsers built) only when needed
+        self.pluginIndex = None
+        self._stubs = set()
+        self._indexPlugins(loadBuiltins=loadBuiltins, loadPlugins=loadPlugins)
 
     def addParsers(self):
         self.parser = parser = argparse.ArgumentParser(prog=PROGRAM, prefix_chars='-+')
@@ -204,6 +213,17 @@ class GcamTool(object):
         plugin = pluginClass(self.subparsers)
         self._plugins[plugin.name] = plugin
 
+    def _addStubParsers(self):
+        '''
+        Add a sub-parser with only the help text from the plugin index for
+        each sub-command not yet loaded, so the sub-commands are listed in the
+        main help message and recognized when validating the command-line.
+        '''
+        for name, entry in self._pluginEntries.items():
+            if not (name in self._plugins or name in self._stubs):
+                self.subparsers.add_parser(str(name), help=entry['help'])   # not unicode
+                self._stubs.add(name)
+
     @staticmethod
     def _getPluginDirs():
         pluginPath = getParam('GCAM.PluginPath')
@@ -244,19 +264,17 @@ class GcamTool(object):
 
         ns, otherArgs = parser.parse_known_args(args=argv)
 
-        # For top-level help, or if no args, load all plugins
-        # so the generated help messages includes all subcommands
-        if ns.help or not otherArgs:
-            map(self._loadCachedPlugin, self._pluginPaths.keys())
-        else:
-            # Otherwise, load any referenced sub-command
-            for command in self._pluginPaths.keys():
-                if command in otherArgs:
-                    self.getPlugin(command)
+        # Load any referenced sub-command
+        required = [command for command in self._pluginEntries.keys() if command in otherArgs]
+        map(self.getPlugin, required)
+
+        # For help, or if no sub-command was given, list all sub-commands
+        # in the help or error message without loading their plugins.
+        if ns.help or not required:
+            self._addStubParsers()
 
     def validateGcamVersion(self):
         from .utils import pathjoin, pushd, parse_version_info
-        from .gcam import setJavaPath
 
         exeDir  = pathjoin(getParam('GCAM.RefWorkspace'), 'exe')
         exeName = getParam('GCAM.Executable')
@@ -275,6 +293,8 @@ class GcamTool(object):
                 with open(versionFile, 'r') as f:
                     versionNum = f.readline().strip()
             else:
+                from .gcam import setJavaPath
+
                 setJavaPath(exeDir)
                 with pushd(exeDir):
                     try:
@@ -361,10 +381,13 @@ class GcamTool(object):
         minutes   = minutes   or getParamAsFloat('GCAM.Minutes')
 
         batchSystem = getParam('GCAM.BatchSystem')
-        known = ('SLURM', 'LSF', 'PBS')
+        known = ('SLURM', 'LSF', 'PBS', 'LOCAL')
         if batchSystem not in known:
             raise ConfigFileError('GCAM.Scheduler value (%s) is not recognized. Must be one of %s.' % (batchSystem, known))
 
+        if batchSystem == 'LOCAL':
+            return GcamTool.runLocal(shellArgs, jobName=jobName, logFile=logFile, dependsOn=dependsOn, run=run)
+
         # The LSF scheduler needs HH:MM; SLURM needs HH:MM:SS
         format = "%02d:%02d" if batchSystem == 'LSF' else "%02d:%02d:00"
         walltime  = format % (minutes / 60, minutes % 60)
@@ -417,6 +440,36 @@ class GcamTool(object):
         except Exception as e:
             raise PygcamException("Error running command '%s': %s" % (command, e))
 
+    @staticmethod
+    def runLocal(shellArgs, jobName='gt', logFile=None, dependsOn=None, run=True):
+        """
+        Queue a "gt" command to the LOCAL batch system, which runs jobs on this
+        computer. See :py:mod:`pygcam.localQueue`.
+        """
+        from multiprocessing import cpu_count
+        from .localQueue import LocalQueue
+        from .utils import pathjoin
+
+        _logger = getLogger(__name__)
+
+        if logFile:
+            logFile = os.path.normpath(pathjoin(getParam('GCAM.BatchLogDir'), logFile))
+
+        scriptCommand = "gt " + ' '.join(shellArgs)
+
+        if not run:
+            after = ' after job %s' % dependsOn if dependsOn else ''
+            print('Queue locally%s: %s > %s' % (after, scriptCommand, logFile))
+            return
+
+        queue = LocalQueue.getInstance()
+        slots = getParamAsInt('GCAM.LocalQueueSlots') or cpu_count()
+        jobId = queue.submit(scriptCommand, jobName=jobName, logFile=logFile,
+                             dependsOn=dependsOn, slots=slots)
+
+        _logger.info('Queued local job %d: %s', jobId, scriptCommand)
+        return jobId
+
     def runBatch(self, shellArgs, run=True):
         import platform
 
@@ -438,6 +491,7 @@ def _getMainParser():
     '''
     getConfig(allowMissing=True)
     tool = GcamTool.getInstance(loadPlugins=False)
+    tool.loadAllPlugins()
     return tool.parser
 
 
@@ -471,7 +525,6 @@ def _setDefaultProject(argv):
         setSection(section)
 
 def _main(argv=None):
-    import sys
     from .config import userConfigPath
 
     configPath = userConfigPath()
@@ -538,6 +591,7 @@ def _main(argv=None):
         tool.runBatch(otherArgs, run=run)
     else:
         tool.shellArgs = otherArgs  # save for project run method to use in "distribute" mode
+        tool.configArgs = [arg for value in ns.configVars for arg in ('+s', value)]
         args = tool.parser.parse_args(args=otherArgs)
         tool.run(args=args)
 
@@ -20,18 +20,22 @@
 # no ill effect.)
 #
 import glob
+import inspect
+import json
 import os
 import re
 import shutil
 import six
+from collections import OrderedDict
 from lxml import etree as ET
 
-from .config import getParam, getParamAsBoolean
+from .config import getParam, getParamAsBoolean, getParamAsInt, getParamAsFloat
 from .constants import LOCAL_XML_NAME, DYN_XML_NAME, GCAM_32_REGIONS
 from .error import SetupException, PygcamException
 from .log import getLogger
 from .utils import (coercible, mkdirs, unixPath, pathjoin, printSeries, symlinkOrCopyFile,
                     removeTreeSafely, parse_version_info)
+from .xmlStore import XmlStore, unshareFile
 
 # Names of key scenario components in reference GCAM 4.3 configuration.xml file
 ENERGY_TRANSFORMATION_TAG = "energy_transformation"
@@ -40,6 +44,14 @@ SOLVER_TAG = "solver"
 AttributePattern = re.compile('(.*)/@([-\w]*)$')
 XmlDirPattern    = re.compile('/[^/]*-xml/')
 
+# Records the inputs to and outputs of a scenario's static setup
+SETUP_MANIFEST = '.setupManifest.json'
+
+# Config variables whose values affect the static XML files generated by setup
+_SetupConfigVars = ('GCAM.VersionNumber', 'GCAM.RefWorkspace', 'GCAM.SandboxRefWorkspace',
+                    'GCAM.RefConfigFile', 'GCAM.WritePrices', 'GCAM.WriteDebugFile',
+                    'GCAM.WriteXmlOutputFile', 'GCAM.WriteOutputCsv', 'GCAM.CopyAllFiles')
+
 _logger = getLogger(__name__)
 
 # methods callable from <function name="x">args</function> in
@@ -99,39 +111,199 @@ def copyIfMissing(src, dst, makedirs=False):
         shutil.copy(src, dst)
         os.chmod(dst, 0o644)
 
+# Compiled XPath expressions, keyed by the xpath string passed to xmlEdit or xmlEditLater
+_compiledXPaths = {}
+
+def compileXPath(xpath):
+    """
+    Compile an xpath used to select elements or attributes to edit, caching
+    the result so each distinct expression is compiled only once.
+
+    :param xpath: (str) an xpath selecting elements, or attributes if the final
+        step is of the form "@name".
+    :return: (tuple of (lxml.etree.XPath, str or None)) the compiled xpath selecting
+        elements, and the name of the attribute to set, if any.
+    """
+    compiled = _compiledXPaths.get(xpath)
+
+    if compiled is None:
+        attr = None
+        elementXPath = xpath
+
+        # If it's an attribute update, extract the attribute
+        # and use the rest of the xpath to select the elements.
+        match = re.match(AttributePattern, xpath)
+        if match:
+            attr = match.group(2)
+            elementXPath = match.group(1)
+
+        compiled = _compiledXPaths[xpath] = (ET.XPath(elementXPath), attr)
+
+    return compiled
+
 class CachedFile(object):
+    """
+    A parsed XML file, cached for use by xmlSel, xmlEdit and the XMLEditor methods
+    so that each file is parsed once, however many edits are applied to it. Edited
+    files are written when they are evicted from the cache or when
+    :py:meth:`decacheAll` is called.
+
+    Edits queued by :py:func:`xmlEditLater` are applied together, in a single
+    pass, before the tree is next accessed or the file is written.
+
+    The cache holds the most-recently used files, up to the limits set by config
+    variables ``GCAM.XmlCacheFiles`` and ``GCAM.XmlCacheSize``. A cached tree is
+    re-read if the size or modification time of its file changes on disk.
+    """
     parser = ET.XMLParser(remove_blank_text=True)
 
-    # Store parsed XML trees here and use with xmlSel/xmlEdit if useCache is True
-    cache = {}
+    # Parsed XML trees, keyed by absolute pathname, in least- to most-recently used order
+    cache = OrderedDict()
+
+    # Counters reported by stats()
+    hits = misses = evictions = reloads = 0
 
     def __init__(self, filename):
         self.filename = filename
+        self.key = os.path.abspath(filename)
         self.edited = False
+        self.pending = []
 
         _logger.debug("Reading '%s'", filename)
-        self.tree = ET.parse(filename, self.parser)
-        self.cache[filename] = self
+        self._tree = ET.parse(filename, self.parser)
+        self.signature = self.fileSignature()
+        self.cache[self.key] = self
+
+    def fileSignature(self):
+        try:
+            st = os.stat(self.key)
+        except OSError:
+            return None
+
+        return (st.st_size, st.st_mtime)
 
     @classmethod
     def getFile(cls, filename):
-        if filename in cls.cache:
-            #_logger.debug("Found '%s' in cache", filename)
-            item = cls.cache[filename]
-        else:
+        key = os.path.abspath(filename)
+        item = cls.cache.get(key)
+
+        if item is not None and item.fileSignature() != item.signature:
+            if item.edited or item.pending:
+                _logger.warning("'%s' was modified on disk; keeping the cached copy, which has unsaved edits", filename)
+                item.signature = item.fileSignature()
+            else:
+                _logger.debug("'%s' was modified on disk; re-reading it", filename)
+                del cls.cache[key]
+                cls.reloads += 1
+                item = None
+
+        if item is None:
+            cls.misses += 1
             item = CachedFile(filename)
+            cls.evict()
+        else:
+            cls.hits += 1
+            cls.cache[key] = cls.cache.pop(key)    # move to most-recently-used position
 
         return item
 
+    @classmethod
+    def evict(cls):
+        """
+        Remove the least-recently used files from the cache until it's within
+        the limits set by ``GCAM.XmlCacheFiles`` and ``GCAM.XmlCacheSize``,
+        writing any that have been edited. The most recently used file is
+        always retained.
+        """
+        maxFiles = getParamAsInt('GCAM.XmlCacheFiles')
+        maxBytes = getParamAsFloat('GCAM.XmlCacheSize') * 1024 * 1024
+        totalBytes = sum([item.signature[0] for item in cls.cache.values() if item.signature])
+
+        while len(cls.cache) > 1 and ((maxFiles and len(cls.cache) > maxFiles) or
+                                      (maxBytes and totalBytes > maxBytes)):
+            key, item = cls.cache.popitem(last=False)
+            _logger.debug("Evicting '%s' from XML cache", item.filename)
+            item.decache()
+            cls.evictions += 1
+
+            if item.signature:
+                totalBytes -= item.signature[0]
+
+    @property
+    def tree(self):
+        if self.pending:
+            self.applyEdits()
+
+        return self._tree
+
+    def _register(self):
+        # If the caller held this item while it was evicted, put it back so the edits are written
+        if self.cache.get(self.key) is not self:
+            self.cache[self.key] = self
+
     def setEdited(self):
         self.edited = True
+        self._register()
+
+    def addEdits(self, pairs):
+        """
+        Queue edits to be applied by :py:meth:`applyEdits`.
+
+        :param pairs: (iterable of (xpath, value) pairs) In each pair, the xpath
+            selects elements or attributes to update with the given value.
+        :return: none
+        """
+        pairs = list(pairs)
+
+        # Compile xpaths now so syntax errors are reported by the caller
+        for xpath, value in pairs:
+            compileXPath(xpath)
+
+        self.pending.extend(pairs)
+        self._register()
+
+    def applyEdits(self):
+        """
+        Apply all queued edits to the tree, in the order they were queued.
+
+        :return: (bool) True if any xpath matched an element, in which case the
+            file is marked as edited.
+        """
+        pairs = self.pending
+        self.pending = []
+        tree = self._tree
+
+        updated = False
+        for xpath, value in pairs:
+            compiled, attr = compileXPath(xpath)
+            value = str(value)
+
+            elts = compiled(tree)
+            if len(elts):
+                updated = True
+                if attr:                # conditional outside loop since there may be many elements
+                    for elt in elts:
+                        elt.set(attr, value)
+                else:
+                    for elt in elts:
+                        elt.text = value
+
+        if updated:
+            self.setEdited()
+
+        return updated
 
     def write(self):
         _logger.info("Writing '%s'", self.filename)
+        unshareFile(self.filename)
         self.tree.write(self.filename, xml_declaration=True, encoding='utf-8', pretty_print=True)
         self.edited = False
+        self.signature = self.fileSignature()
 
     def decache(self):
+        if self.pending:
+            self.applyEdits()
+
         if self.edited:
             self.write()
 
@@ -140,6 +312,37 @@ class CachedFile(object):
         for item in cls.cache.values():
             item.decache()
 
+        _logger.debug(cls.statsString())
+
+    @classmethod
+    def clear(cls, write=True):
+        """
+        Empty the cache.
+
+        :param write: (bool) if True, write any edited files first; otherwise
+            unwritten edits are discarded.
+        :return: none
+        """
+        if write:
+            cls.decacheAll()
+        cls.cache.clear()
+
+    @classmethod
+    def stats(cls):
+        """
+        Return the cache's usage counters.
+
+        :return: (dict) the number of cache hits, misses, evictions, and reloads
+            of files modified on disk, and the number of files currently cached.
+        """
+        return {'hits': cls.hits, 'misses': cls.misses, 'evictions': cls.evictions,
+                'reloads': cls.reloads, 'files': len(cls.cache)}
+
+    @classmethod
+    def statsString(cls):
+        return "XML cache: %(files)d files, %(hits)d hits, %(misses)d misses, " \
+               "%(evictions)d evictions, %(reloads)d reloads" % cls.stats()
+
 
 def xmlSel(filename, xpath, asText=False):
     """
@@ -175,39 +378,30 @@ def xmlEdit(filename, pairs, useCache=True):
     :return: True on success, else False
     """
     item = CachedFile.getFile(filename)
-    tree = item.tree
+    item.addEdits(pairs)
 
-    updated = False
+    # Also applies any edits queued by xmlEditLater, preserving their order
+    updated = item.applyEdits()
 
-    # if at least one xpath is found, update and write file
-    for xpath, value in pairs:
-        attr = None
-        value = str(value)
+    if updated and not useCache:
+        item.write()
 
-        # If it's an attribute update, extract the attribute
-        # and use the rest of the xpath to select the elements.
-        match = re.match(AttributePattern, xpath)
-        if match:
-            attr = match.group(2)
-            xpath = match.group(1)
-
-        elts = tree.xpath(xpath)
-        if len(elts):
-            updated = True
-            if attr:                # conditional outside loop since there may be many elements
-                for elt in elts:
-                    elt.set(attr, value)
-            else:
-                for elt in elts:
-                    elt.text = value
+    return updated
 
-    if updated:
-        if useCache:
-            item.setEdited()
-        else:
-            item.write()
+def xmlEditLater(filename, pairs):
+    """
+    Queue edits to the XML file `filename`, to be applied along with all other
+    edits queued for the file in a single pass, when the file is next read
+    (e.g., by :py:func:`xmlSel`) or written. Use this rather than :py:func:`xmlEdit`
+    when applying many sets of edits to the same file. Each distinct xpath is
+    compiled only once.
 
-    return updated
+    :param filename: the file to edit in-place.
+    :param pairs: (iterable of (xpath, value) pairs) In each pair, the xpath selects
+      elements or attributes to update with the given values.
+    :return: none
+    """
+    CachedFile.getFile(filename).addEdits(pairs)
 
 def extractStubTechnology(region, srcFile, dstFile, sector, subsector, technology,
                           sectorElement='supplysector', fromRegion=False):
@@ -267,6 +461,7 @@ def extractStubTechnology(region, srcFile, dstFile, sector, subsector, technolog
 
     _logger.info("Writing '%s'", dstFile)
     newTree = ET.ElementTree(scenarioElt)
+    unshareFile(dstFile)
     newTree.write(dstFile, xml_declaration=True, pretty_print=True)
 
     return True
@@ -519,15 +714,17 @@ class XMLEditor(object):
         scenDir = self.scenario_dir_abs
         mkdirs(scenDir)
 
-        # TBD: there's nothing else now in these dirs, so "xml" subdir is not needed
-        xmlSubdir = pathjoin(self.xmlSourceDir, self.srcGroupDir, self.subdir or self.name, 'xml')
+        xmlSubdir = self.staticXmlSourceDir()
         xmlFiles = glob.glob("%s/*.xml" % xmlSubdir)
 
         if xmlFiles:
             _logger.info("Copy %d static XML files from %s to %s", len(xmlFiles), xmlSubdir, scenDir)
+            store = XmlStore.getInstance()
             for src in xmlFiles:
-                # dst = pathjoin(scenDir, os.path.basename(src))
-                shutil.copy2(src, scenDir)     # copy2 preserves metadata, e.g., timestamp
+                if store:
+                    store.copyFile(src, pathjoin(scenDir, os.path.basename(src)))
+                else:
+                    shutil.copy2(src, scenDir)     # copy2 preserves metadata, e.g., timestamp
         else:
             _logger.info("No XML files to copy in %s", unixPath(os.path.abspath(xmlSubdir)))
 
@@ -537,6 +734,7 @@ class XMLEditor(object):
         parentConfigPath = parent.cfgPath() if parent else getParam('GCAM.RefConfigFile')
 
         _logger.info("Copy %s\n      to %s" % (parentConfigPath, configPath))
+        unshareFile(configPath)
         shutil.copy(parentConfigPath, configPath)
         os.chmod(configPath, 0o664)
 
@@ -571,9 +769,126 @@ class XMLEditor(object):
 
         CachedFile.decacheAll()
 
+    def staticXmlSourceDir(self):
+        """
+        Compute the pathname of the directory holding the scenario's static XML files.
+
+        :return: (str) the pathname of the directory
+        """
+        # TBD: there's nothing else now in these dirs, so "xml" subdir is not needed
+        return pathjoin(self.xmlSourceDir, self.srcGroupDir, self.subdir or self.name, 'xml')
+
+    def manifestPath(self):
+        return pathjoin(self.scenario_dir_abs, SETUP_MANIFEST)
+
+    def setupInputs(self, args):
+        """
+        Describe the inputs to :py:meth:`setupStatic` so that setup can be skipped if
+        none of them has changed. Subclasses that use other inputs should add them to
+        the dictionary returned by this method.
+
+        :param args: (argparse.Namespace) arguments passed from the top-level call
+            to setup sub-command.
+        :return: (dict) JSON-serializable values identifying the inputs, mostly file digests.
+        """
+        from .csvCache import fileDigest
+        from .version import VERSION
+
+        xmlFiles = glob.glob("%s/*.xml" % self.staticXmlSourceDir())
+
+        # A policy scenario starts from its parent's config.xml and local-xml files, which
+        # are described by the parent's manifest, if it was set up incrementally.
+        parent = self.parent
+        if parent:
+            parentDigest = fileDigest(parent.manifestPath()) or fileDigest(parent.cfgPath())
+        else:
+            parentDigest = fileDigest(getParam('GCAM.RefConfigFile'))
+
+        # Source files for setup classes that aren't part of pygcam, e.g., scenarios.py
+        pkgDir = os.path.dirname(os.path.abspath(__file__))
+        classDigests = {}
+        for cls in type(self).__mro__:
+            try:
+                path = inspect.getsourcefile(cls)
+            except TypeError:
+                continue    # a built-in class
+
+            if path and not os.path.abspath(path).startswith(pkgDir):
+                classDigests[cls.__name__] = fileDigest(path)
+
+        return {'version' : VERSION,
+                'classes' : classDigests,
+                'sources' : {os.path.basename(path) : fileDigest(path) for path in xmlFiles},
+                'parent'  : parentDigest,
+                'config'  : {name : getParam(name, raiseError=False) for name in _SetupConfigVars},
+                'args'    : {'stopPeriod' : getattr(args, 'stopPeriod', None)}}
+
+    def _outputSignatures(self):
+        """
+        Return the size and modification time of each file in the scenario's local-xml
+        directory, keyed by pathname relative to that directory.
+        """
+        scenDir = self.scenario_dir_abs
+        sigs = {}
+        for dirpath, _dirnames, filenames in os.walk(scenDir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if name != SETUP_MANIFEST and os.path.exists(path):
+                    st = os.stat(path)
+                    sigs[unixPath(os.path.relpath(path, scenDir))] = [st.st_size, st.st_mtime]
+        return sigs
+
+    def staticSetupIsCurrent(self, inputs):
+        """
+        Check whether the static XML files were generated from the given inputs
+        and haven't been modified since.
+
+        :param inputs: (dict) the value returned by :py:meth:`setupInputs`
+        :return: (bool) True if static setup can be skipped
+        """
+        try:
+            with open(self.manifestPath()) as f:
+                manifest = json.load(f)
+        except (IOError, ValueError):
+            return False
+
+        # round-trip through JSON so lists, strings, and floats compare equal
+        return (manifest.get('inputs') == json.loads(json.dumps(inputs)) and
+                manifest.get('outputs') == self._outputSignatures())
+
+    def saveManifest(self, inputs):
+        """
+        Record the inputs to static setup and the files it generated.
+
+        :param inputs: (dict) the value returned by :py:meth:`setupInputs`
+        :return: none
+        """
+        manifest = {'inputs' : inputs, 'outputs' : self._outputSignatures()}
+
+        path = self.manifestPath()
+        tmpFile = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmpFile, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+        if os.path.lexists(path):
+            os.remove(path)     # Windows won't rename over an existing file
+        os.rename(tmpFile, path)
+
+    def removeManifest(self):
+        path = self.manifestPath()
+        if os.path.lexists(path):
+            os.remove(path)
+
     def setup(self, args):
         """
         Calls setupStatic and/or setupDynamic, depending on flags set in args.
+        If config variable ``GCAM.IncrementalSetup`` is True, static setup is
+        skipped if its inputs (see :py:meth:`setupInputs`) and outputs are
+        unchanged since it was last run, unless ``args.force`` or
+        ``args.forceCreate`` is set. Dynamic setup is always performed, since
+        it may depend on the results of running the baseline. If config variable
+        ``GCAM.XmlStoreDir`` is set, the generated files are then moved to the
+        :py:class:`~pygcam.xmlStore.XmlStore` and linked into place.
 
         :param args: (argparse.Namespace) arguments passed from the top-level call
             to setup
@@ -582,14 +897,35 @@ class XMLEditor(object):
         _logger.debug('Called XMLEditor.setup(%s)', args)
         self.setupArgs = args   # some subclasses/functions might want access to these
 
+        store = XmlStore.getInstance()
+
         if not args.dynamicOnly:
-            self.setupStatic(args)
+            # MCS trials are set up fresh each time
+            inputs = None if self.mcsMode or not getParamAsBoolean('GCAM.IncrementalSetup') \
+                else self.setupInputs(args)
+
+            force = getattr(args, 'force', False) or getattr(args, 'forceCreate', False)
+
+            if inputs and not force and self.staticSetupIsCurrent(inputs):
+                _logger.info("Static XML for scenario %s is up to date", self.name)
+            else:
+                self.removeManifest()   # in case setup fails partway through
+                self.setupStatic(args)
+
+                if store:
+                    store.addTree(self.scenario_dir_abs)
+
+                if inputs:
+                    self.saveManifest(inputs)
 
         if not args.staticOnly:
             self.setupDynamic(args)
 
         CachedFile.decacheAll()
 
+        if store and not args.staticOnly:
+            store.addTree(self.scenario_dyn_dir_abs)
+
     def makeScenarioComponentsUnique(self):
         """
         Give all reference ScenarioComponents a unique "name" tag to facilitate
@@ -726,7 +1062,7 @@ class XMLEditor(object):
         if appendScenarioName is not None:
             pairs.append((prefix + "/@append-scenario-name", int(appendScenarioName)))
 
-        xmlEdit(cfg, pairs)
+        xmlEditLater(cfg, pairs)
 
     @callableMethod
     def setClimateOutputInterval(self, years):
@@ -843,7 +1179,7 @@ class XMLEditor(object):
         _logger.debug("Rename ScenarioComponent name='%s', xmlfile='%s'" % (name, xmlfile))
         cfg = self.cfgPath()
 
-        xmlEdit(cfg, ("//ScenarioComponents/Value[text()='%s']/@name" % xmlfile, name))
+        xmlEditLater(cfg, [("//ScenarioComponents/Value[text()='%s']/@name" % xmlfile, name)])
 
     # TBD dynamic keyword might still be useful if subdir e.g. local-xml/dynamic but policy file would be in local-xml anyway
     @callableMethod
@@ -975,7 +1311,7 @@ class XMLEditor(object):
         if delete:
             args.append((prefix + '/@delete', "1"))
 
-        xmlEdit(enTransFileAbs, args)
+        xmlEditLater(enTransFileAbs, args)
 
         self.updateScenarioComponent("energy_transformation", enTransFileRel)
 
@@ -1036,7 +1372,7 @@ class XMLEditor(object):
         if maxIterations:
             pairs.append((prefix + 'broyden-solver-component/max-iterations', maxIterations))
 
-        xmlEdit(solverFileAbs, pairs)
+        xmlEditLater(solverFileAbs, pairs)
 
         self.updateScenarioComponent("solver", solverFileRel)
 
@@ -1220,7 +1556,7 @@ class XMLEditor(object):
         for year, pop in expandYearRanges(values):
             pairs.append((prefix + ('[@year="%s"]/totalPop' % year), int(round(pop))))
 
-        xmlEdit(fileAbs, pairs)
+        xmlEditLater(fileAbs, pairs)
         self.updateScenarioComponent(tag, fileRel)
 
     # TBD: test
@@ -1259,7 +1595,7 @@ class XMLEditor(object):
         for year, price in expandYearRanges(values):
             pairs.append((prefix + ('/period[@year="%s"]' % year) + suffix, price))
 
-        xmlEdit(enTransFileAbs, pairs)
+        xmlEditLater(enTransFileAbs, pairs)
 
         self.updateScenarioComponent("energy_transformation", enTransFileRel)
 
@@ -1299,7 +1635,7 @@ class XMLEditor(object):
             pairs.append((prefix + "/period[@year='%s']/phased-shutdown-decider/shutdown-rate" % year,
                          coercible(value, float)))
 
-        xmlEdit(enTransFileAbs, pairs)
+        xmlEditLater(enTransFileAbs, pairs)
         self.updateScenarioComponent("energy_transformation", enTransFileRel)
 
     #
@@ -1368,7 +1704,7 @@ class XMLEditor(object):
         for year, value in expandYearRanges(values):
             pairs.append((prefix + '/price-elasticity[@year="%s"]' % year, coercible(value, float)))
 
-        xmlEdit(filenameAbs, pairs)
+        xmlEditLater(filenameAbs, pairs)
         self.updateScenarioComponent(configFileTag, filenameRel)
 
     # TBD: test
@@ -1413,7 +1749,7 @@ class XMLEditor(object):
             pairs.append((prefix + shareWeight.format(technology=stubTechnology, year=year),
                          coercible(value, float)))
 
-        xmlEdit(enTransFileAbs, pairs)
+        xmlEditLater(enTransFileAbs, pairs)
         self.updateScenarioComponent(configFileTag, enTransFileRel)
 
     # TBD: Test
@@ -1450,7 +1786,7 @@ class XMLEditor(object):
         for year, value in expandYearRanges(values):
             pairs.append((prefix + "/period[@year=%s]/share-weight" % year, coercible(value, float)))
 
-        xmlEdit(enTransFileAbs, pairs)
+        xmlEditLater(enTransFileAbs, pairs)
         self.updateScenarioComponent(configFileTag, enTransFileRel)
 
     # TBD: test
@@ -1487,5 +1823,5 @@ class XMLEditor(object):
         for year, coef in expandYearRanges(values):
             pairs.append(("%s/period[@year='%s']/%s" % (prefix, year, suffix), coef))
 
-        xmlEdit(enTransFileAbs, pairs)
+        xmlEditLater(enTransFileAbs, pairs)
         self.updateScenarioComponent("energy_transformation", enTransFileRel)
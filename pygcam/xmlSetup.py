@@ -13,7 +13,7 @@ from .config import getParam, getParamAsBoolean
 from .error import PygcamException, SetupException
 from .log import getLogger
 from .utils import getBooleanXML, resourceStream, symlinkOrCopyFile, pathjoin
-from .xmlEditor import XMLEditor, getCallableMethod, CachedFile
+from .xmlEditor import XMLEditor, getCallableMethod, CachedFile, SETUP_MANIFEST
 from .XMLFile import XMLFile, McsValues
 
 _logger = getLogger(__name__)
@@ -29,6 +29,10 @@ def _classForNode(node):
     cls = classForString(className)
     return cls(node)
 
+def _iteratorNames(iterName):
+    # allow iterator name to be comma-delimited list of iterators
+    return map(str.strip, iterName.split(',')) if iterName else []
+
 def iterateList(scenarioSetup, cls, node, expandFunc, iterators):
     """
     Recursively evaluate iterators for generalized nested loop, adding
@@ -138,8 +142,7 @@ class ScenarioSetup(object):
                 expand(templateGroup)
                 continue
 
-            # allow iterator name to be comma-delimited list of iterators
-            iterators = map(str.strip, iterName.split(','))
+            iterators = _iteratorNames(iterName)
             iterateList(self, ScenarioGroup, templateGroup.node, expand, iterators)
 
     def run(self, editor, directoryDict, dynamic=False):
@@ -250,6 +253,9 @@ class ScenarioGroup(object):
             subdir = scenario.node.get('subdir', default=scenario.name)
             scenario.subdir = subdir.format(**templateDict)
 
+            iterNames = _iteratorNames(self.iteratorName) + _iteratorNames(scenario.iteratorName)
+            scenario.iteratorValues = [(iterName, templateDict[iterName]) for iterName in iterNames]
+
             self.finalDict[name] = scenario
             scenario.formatContent(templateDict)
             if scenario.isBaseline:
@@ -264,8 +270,7 @@ class ScenarioGroup(object):
                 expand(templateScenario)
                 continue
 
-            # allow iterator name to be comma-delimited list of iterators
-            iterators = map(str.strip, iterName.split(','))
+            iterators = _iteratorNames(iterName)
             iterateList(scenarioSetup, Scenario, templateScenario.node, expand, iterators)
 
     def writeXML(self, stream, indent=0):
@@ -287,10 +292,21 @@ class Scenario(object):
         self.iteratorName = node.get('iterator')
         self.actions = map(_classForNode, node)
         self.subdir = node.get('subdir', default=self.name)
+        self.iteratorValues = []    # (name, value) of the iterators that produced this scenario
 
     def __str__(self):
         return "<scenario name='%s'>" % self.name
 
+    def digest(self):
+        """
+        Return a SHA-1 digest of the scenario's definition, i.e., its source
+        element and the values of the iterators used to expand it.
+        """
+        from hashlib import sha1
+        from lxml import etree as ET
+
+        return sha1(ET.tostring(self.node, with_tail=False) + repr(self.iteratorValues).encode('utf-8')).hexdigest()
+
     def run(self, editor, directoryDict, dynamic=False):
         for action in self.actions:
             action.run(editor, directoryDict, dynamic=dynamic)
@@ -529,6 +545,42 @@ def createXmlEditorSubclass(setupFile, mcsMode=None):
 
             CachedFile.decacheAll()
 
+        def scenarioGroup(self, groupName):
+            scenarioSetup = self.scenarioSetup
+            return scenarioSetup.groupDict[groupName or scenarioSetup.defaultGroup]
+
+        def baselineSource(self, groupName):
+            """
+            Return the group and baseline names given by the group's "baselineSource"
+            attribute, or (None, None) if the attribute isn't set.
+            """
+            baselineSource = self.scenarioGroup(groupName).baselineSource
+            if not baselineSource:
+                return None, None
+
+            try:
+                groupName, baselineName = baselineSource.split('/')
+            except ValueError:
+                raise SetupException(
+                    'baselineSource error: "%s"; should be of the form "groupDir/baselineDir"' % baselineSource)
+
+            return groupName, baselineName
+
+        def setupInputs(self, args):
+            from .csvCache import fileDigest
+
+            inputs = super(XmlEditorSubclass, self).setupInputs(args)
+            inputs['definition'] = self.scenarioGroup(args.group).getFinalScenario(self.name).digest()
+
+            # A baseline built on one in another group starts from that one's files
+            if not self.parent:
+                groupName, baselineName = self.baselineSource(args.group)
+                if baselineName:
+                    manifest = pathjoin(self.local_xml_abs, groupName, baselineName, SETUP_MANIFEST)
+                    inputs['parent'] = fileDigest(manifest) or baselineName
+
+            return inputs
+
         def setupStatic(self, args):
             self.groupName = args.group
             scenarioSetup = self.scenarioSetup
@@ -538,15 +590,9 @@ def createXmlEditorSubclass(setupFile, mcsMode=None):
                 # Before calling setupStatic, we set the parent if there is
                 # a declared baseline source. This assumes it is in this
                 # project, in a different group directory.
-                group = scenarioSetup.groupDict[self.groupName or scenarioSetup.defaultGroup]
-                baselineSource = group.baselineSource
-                if baselineSource:
-                    try:
-                        groupName, baselineName = baselineSource.split('/')
-                    except ValueError:
-                        raise SetupException(
-                            'baselineSource error: "%s"; should be of the form "groupDir/baselineDir"' % baselineSource)
-
+                group = self.scenarioGroup(self.groupName)
+                groupName, baselineName = self.baselineSource(self.groupName)
+                if baselineName:
                     parentGroup = scenarioSetup.groupDict[groupName]
                     scenario = parentGroup.getFinalScenario(baselineName)
                     if scenario.isBaseline:
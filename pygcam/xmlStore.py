@@ -0,0 +1,274 @@
+'''
+.. Content-addressed storage of generated XML files.
+
+   When config variable ``GCAM.XmlStoreDir`` is set, files generated by the
+   "setup" sub-command are stored once per distinct content, in a file named
+   by the SHA-1 digest of the content, and hard-linked (or, if that's not
+   possible, symlinked) into each scenario's local-xml and dyn-xml directory.
+   Since stored files are shared, a file must be replaced rather than modified
+   in place; code that writes files in these directories should first call
+   :py:func:`unshareFile`.
+
+.. Copyright (c) 2017 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+import os
+import hashlib
+import shutil
+
+from .config import getParam
+from .log import getLogger
+from .utils import mkdirs
+from .windows import IsWindows
+
+_logger = getLogger(__name__)
+
+def _digest(filename, blockSize=1 << 20):
+    # Not memoized: a file rewritten within the resolution of its modification
+    # time could otherwise be linked to a blob with its old contents.
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(blockSize), b''):
+            sha.update(block)
+
+    return sha.hexdigest()
+
+def _replace(src, dst):
+    if IsWindows and os.path.lexists(dst):
+        os.remove(dst)      # Windows won't rename over an existing file
+    os.rename(src, dst)
+
+    # rename() does nothing if src and dst are links to the same file
+    if os.path.lexists(src):
+        os.remove(src)
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def unshareFile(path):
+    """
+    Remove `path` if it shares its contents with other files, i.e., if it is
+    a hard link or a symlink into an XmlStore, so that writing a new file at
+    `path` doesn't alter the others.
+
+    :param path: (str) the pathname of a file about to be written
+    :return: (bool) True if the file was removed
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+
+    if os.path.islink(path):
+        store = XmlStore.getInstance()
+        if not (store and store.contains(path)):
+            return False
+
+    elif st.st_nlink <= 1:
+        return False
+
+    os.remove(path)
+    return True
+
+
+class XmlStore(object):
+    """
+    A directory of files named by the SHA-1 digest of their contents. Each file
+    is stored as ``{storeDir}/{first 2 hex digits}/{remaining 38 hex digits}``.
+    """
+    _instance = None
+
+    def __init__(self, storeDir):
+        self.storeDir = os.path.abspath(storeDir)
+
+    @classmethod
+    def getInstance(cls):
+        """
+        Return the store in the directory given by config variable ``GCAM.XmlStoreDir``,
+        or None if the variable is empty.
+        """
+        storeDir = getParam('GCAM.XmlStoreDir', raiseError=False)
+        if not storeDir:
+            return None
+
+        obj = cls._instance
+        if obj is None or obj.storeDir != os.path.abspath(storeDir):
+            obj = cls._instance = cls(storeDir)
+
+        return obj
+
+    def blobPath(self, digest):
+        return os.path.join(self.storeDir, digest[:2], digest[2:])
+
+    def contains(self, path):
+        """
+        Return True if `path` is, or is a symlink to, a file in the store.
+        """
+        return os.path.realpath(path).startswith(self.storeDir + os.sep)
+
+    def blobs(self):
+        """
+        Generate the pathnames of all files in the store.
+        """
+        for dirpath, _dirnames, filenames in os.walk(self.storeDir):
+            for name in filenames:
+                if not name.endswith('.tmp'):
+                    yield os.path.join(dirpath, name)
+
+    def _addBlob(self, src, blob, copy=False):
+        """
+        Store the contents of `src` as `blob`, by hard-linking to `src` if
+        possible, or by copying it if `copy` is True.
+        """
+        mkdirs(os.path.dirname(blob))
+        tmpFile = '%s.%d.tmp' % (blob, os.getpid())
+        try:
+            if copy:
+                shutil.copy2(src, tmpFile)
+            else:
+                os.link(src, tmpFile)
+
+        except (OSError, IOError, AttributeError) as e:    # no os.link on Windows in python 2
+            _logger.debug("Can't add %s to XML store: %s", src, e)
+            _remove(tmpFile)
+            return False
+
+        _replace(tmpFile, blob)
+        return True
+
+    def _link(self, blob, path):
+        """
+        Replace `path` with a hard link to `blob`, or a symlink if hard links
+        aren't possible, e.g., across filesystems.
+        """
+        if os.path.exists(path) and os.path.samefile(blob, path):
+            return True
+
+        tmpFile = '%s.%d.tmp' % (path, os.getpid())
+        try:
+            os.link(blob, tmpFile)
+        except (OSError, AttributeError):
+            try:
+                os.symlink(blob, tmpFile)
+            except (OSError, AttributeError) as e:
+                _logger.debug("Can't link %s to %s: %s", path, blob, e)
+                return False
+
+        _replace(tmpFile, path)
+        return True
+
+    def copyFile(self, src, dst):
+        """
+        Make `dst` a copy of `src` by linking it to the stored file with the same
+        contents, copying `src` into the store first if necessary.
+
+        :param src: (str) the pathname of the file to copy
+        :param dst: (str) the pathname of the copy
+        :return: none
+        """
+        blob = self.blobPath(_digest(src))
+
+        if not (os.path.exists(blob) or self._addBlob(src, blob, copy=True)) or not self._link(blob, dst):
+            unshareFile(dst)
+            shutil.copy2(src, dst)
+
+    def addFile(self, path):
+        """
+        Store the contents of the file `path` and replace it with a link to the
+        stored file. If the contents are already stored, the file is replaced by
+        a link to the existing copy.
+
+        :param path: (str) the pathname of a file
+        :return: (int) the number of bytes freed by linking to an existing copy
+        """
+        blob = self.blobPath(_digest(path))
+
+        if not os.path.exists(blob):
+            self._addBlob(path, blob)   # adopt the file itself as the stored copy
+            return 0
+
+        if os.path.samefile(blob, path):
+            return 0
+
+        size = os.path.getsize(path)
+        return size if self._link(blob, path) else 0
+
+    def addTree(self, dirname):
+        """
+        Store all regular files in `dirname` and its subdirectories, replacing each
+        with a link to the stored copy. Symbolic links are ignored.
+
+        :param dirname: (str) the pathname of a directory
+        :return: (tuple of int) the number of files examined and the number of bytes freed
+        """
+        count = freed = 0
+        for dirpath, _dirnames, filenames in os.walk(dirname):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if name.startswith('.') or os.path.islink(path):
+                    continue
+
+                freed += self.addFile(path)
+                count += 1
+
+        if freed:
+            _logger.debug("Stored %d files in %s; freed %d bytes", count, dirname, freed)
+
+        return count, freed
+
+    def collectGarbage(self, roots=None, dryRun=False):
+        """
+        Delete stored files that aren't linked to by any other file. Symlinks to stored
+        files are sought under the directories in `roots`.
+
+        :param roots: (list of str) directories to search for symlinks to stored files.
+            Defaults to the directory containing the store.
+        :param dryRun: (bool) if True, report what would be deleted without deleting anything.
+        :return: (tuple of int) the number of files and bytes deleted
+        """
+        roots = roots or [os.path.dirname(self.storeDir)]
+        symlinked = set()
+
+        for root in roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                if os.path.abspath(dirpath) == self.storeDir:
+                    dirnames[:] = []
+                    continue
+
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    if os.path.islink(path) and self.contains(path):
+                        symlinked.add(os.path.realpath(path))
+
+        count = freed = 0
+        for blob in self.blobs():
+            st = os.stat(blob)
+            if st.st_nlink > 1 or os.path.realpath(blob) in symlinked:
+                continue
+
+            if dryRun:
+                _logger.info("Would delete %s", blob)
+            else:
+                _remove(blob)
+
+            count += 1
+            freed += st.st_size
+
+        return count, freed
+
+    def stats(self):
+        """
+        Return the number and total size of stored files, and the number of links to them.
+        Only hard links are counted.
+        """
+        files = size = links = 0
+        for blob in self.blobs():
+            st = os.stat(blob)
+            files += 1
+            size  += st.st_size
+            links += st.st_nlink - 1
+
+        return {'files' : files, 'bytes' : size, 'links' : links}
@@ -0,0 +1,99 @@
+import os
+import shutil
+import time
+from unittest import TestCase
+
+from pygcam.config import setParam
+from pygcam.utils import mkdirs
+from pygcam.xmlEditor import CachedFile, xmlEdit, xmlEditLater, xmlSel
+
+class TestCachedFile(TestCase):
+    def setUp(self):
+        self.tmpDir = '/tmp/testCachedFile'
+        self.removeTmpDir()
+        mkdirs(self.tmpDir)
+
+        self.files = []
+        for i in range(3):
+            filename = os.path.join(self.tmpDir, 'config%d.xml' % i)
+            shutil.copy('./data/xml/configuration_ref.xml', filename)
+            self.files.append(filename)
+
+        CachedFile.cache.clear()
+        setParam('GCAM.XmlCacheFiles', '2')
+        setParam('GCAM.XmlCacheSize', '0')
+
+    def tearDown(self):
+        CachedFile.cache.clear()
+        setParam('GCAM.XmlCacheFiles', '0')
+        setParam('GCAM.XmlCacheSize', '500')
+        self.removeTmpDir()
+
+    def removeTmpDir(self):
+        try:
+            shutil.rmtree(self.tmpDir)
+        except:
+            pass
+
+    def test_hits(self):
+        before = CachedFile.stats()
+        item = CachedFile.getFile(self.files[0])
+        self.assertIs(CachedFile.getFile(self.files[0]), item)
+
+        stats = CachedFile.stats()
+        self.assertEqual(stats['misses'] - before['misses'], 1)
+        self.assertEqual(stats['hits'] - before['hits'], 1)
+
+    def test_evictionWritesEdits(self):
+        xpath = "//Ints/Value[@name='stop-period']"
+        xmlEdit(self.files[0], [(xpath, -99)])
+
+        before = CachedFile.stats()
+        CachedFile.getFile(self.files[1])
+        CachedFile.getFile(self.files[2])     # evicts files[0], writing the edit
+
+        self.assertEqual(len(CachedFile.cache), 2)
+        self.assertEqual(CachedFile.stats()['evictions'] - before['evictions'], 1)
+
+        with open(self.files[0]) as f:
+            self.assertTrue('>-99<' in f.read())
+
+        self.assertEqual(xmlSel(self.files[0], xpath, asText=True), '-99')
+
+    def test_modifiedOnDisk(self):
+        xpath = "//Ints/Value[@name='stop-period']"
+        original = xmlSel(self.files[0], xpath, asText=True)
+
+        # Change the cached tree without marking it edited, then "modify" the file
+        CachedFile.getFile(self.files[0]).tree.find(xpath).text = 'stale'
+        t = time.time() + 10
+        os.utime(self.files[0], (t, t))
+
+        before = CachedFile.stats()
+        self.assertEqual(xmlSel(self.files[0], xpath, asText=True), original)
+        self.assertEqual(CachedFile.stats()['reloads'] - before['reloads'], 1)
+
+    def test_editLater(self):
+        stopPeriod = "//Ints/Value[@name='stop-period']"
+        writeOutput = "//Files/Value[@name='dbFileName']/@write-output"
+
+        xmlEditLater(self.files[0], [(stopPeriod, 10), (writeOutput, 1)])
+        xmlEditLater(self.files[0], [(stopPeriod, 11)])     # applied in order, so the last value wins
+
+        item = CachedFile.getFile(self.files[0])
+        self.assertEqual(len(item.pending), 3)
+        self.assertFalse(item.edited)
+
+        # Reading the tree applies the queued edits
+        self.assertEqual(xmlSel(self.files[0], stopPeriod, asText=True), '11')
+        self.assertEqual(item.pending, [])
+        self.assertTrue(item.edited)
+
+        xmlEditLater(self.files[0], [("//Ints/Value[@name='no-such-value']", 1)])
+        CachedFile.decacheAll()
+
+        with open(self.files[0]) as f:
+            text = f.read()
+
+        self.assertTrue('<Value name="stop-period">11</Value>' in text)
+        self.assertTrue('write-output="1" append-scenario-name="0" name="dbFileName"' in text)
@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from pygcam.config import getConfig, getConfigDict, getParam, setParam, DEFAULT_SECTION
+
+class TestConfigCache(TestCase):
+    def setUp(self):
+        getConfig()
+        setParam('Test.Dir',  '/a', section=DEFAULT_SECTION)
+        setParam('Test.File', '%(Test.Dir)s/file.xml', section=DEFAULT_SECTION)
+
+    def tearDown(self):
+        getConfig(reload=True)
+
+    def test_invalidation(self):
+        self.assertEqual(getParam('Test.File'), '/a/file.xml')
+        self.assertEqual(getParam('Test.File', raw=True), '%(Test.Dir)s/file.xml')
+
+        # changing a variable changes those that refer to it
+        setParam('Test.Dir', '/b', section=DEFAULT_SECTION)
+        self.assertEqual(getParam('Test.File'), '/b/file.xml')
+
+        # re-reading the config files discards values set in memory
+        getConfig(reload=True)
+        self.assertEqual(getParam('Test.File', raiseError=False), None)
+
+    def test_configDict(self):
+        d = getConfigDict(section=DEFAULT_SECTION)
+        self.assertEqual(d['Test.File'], '/a/file.xml')
+
+        d['Test.File'] = 'modified'     # the cached copy is unaffected
+        self.assertEqual(getConfigDict(section=DEFAULT_SECTION)['Test.File'], '/a/file.xml')
+        self.assertEqual(getParam('Test.File', section=DEFAULT_SECTION), '/a/file.xml')
+
+        setParam('Test.Dir', '/b', section=DEFAULT_SECTION)
+        self.assertEqual(getConfigDict(section=DEFAULT_SECTION)['Test.File'], '/b/file.xml')
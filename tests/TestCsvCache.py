@@ -0,0 +1,89 @@
+import os
+import shutil
+import time
+from glob import glob
+from unittest import TestCase
+
+from pygcam.config import getParam, setParam
+from pygcam.csvCache import CsvCache, fileDigest
+from pygcam.query import readCsv
+from pygcam.utils import mkdirs
+
+class TestCsvCache(TestCase):
+    def setUp(self):
+        self.tmpDir = '/tmp/testCsvCache'
+        self.cacheDir = os.path.join(self.tmpDir, 'cache')
+        self.removeTmpDir()
+        mkdirs(self.tmpDir)
+
+        self.csvFile = os.path.join(self.tmpDir, 'query-base-0.csv')
+        shutil.copy('./data/ws/base-0/queryResults/Purpose-grown_biomass_production-base-0.csv', self.csvFile)
+
+        self.saved = {name : getParam(name, raw=True) for name in ('GCAM.CsvCacheDir', 'GCAM.CsvCacheSize')}
+        setParam('GCAM.CsvCacheDir', self.cacheDir)
+        setParam('GCAM.CsvCacheSize', '1000')
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setParam(name, value)
+
+        self.removeTmpDir()
+
+    def removeTmpDir(self):
+        try:
+            shutil.rmtree(self.tmpDir)
+        except:
+            pass
+
+    def entries(self):
+        return glob(os.path.join(self.cacheDir, '*.pkl'))
+
+    def test_readThroughCache(self):
+        df1 = readCsv(self.csvFile)
+        self.assertEqual(len(self.entries()), 1)
+
+        df2 = readCsv(self.csvFile)
+        self.assertTrue(df1.equals(df2))
+        self.assertEqual(len(self.entries()), 1)
+
+        # Processing args must not alter the cached data
+        readCsv(self.csvFile, years=[2015, 2050])
+        df3 = readCsv(self.csvFile)
+        self.assertTrue(df1.equals(df3))
+
+    def test_changedFile(self):
+        readCsv(self.csvFile)
+
+        with open(self.csvFile, 'a') as f:
+            f.write('\n')
+        t = time.time() + 10
+        os.utime(self.csvFile, (t, t))
+
+        readCsv(self.csvFile)
+        self.assertEqual(len(self.entries()), 2)
+
+    def test_prune(self):
+        readCsv(self.csvFile)
+        readCsv(self.csvFile, skiprows=2)
+        self.assertEqual(len(self.entries()), 2)
+
+        cache = CsvCache(self.cacheDir, maxBytes=1)
+        self.assertEqual(cache.prune(), 2)
+        self.assertEqual(len(self.entries()), 0)
+
+    def test_fileDigest(self):
+        digest = fileDigest(self.csvFile)
+        self.assertEqual(digest, fileDigest(self.csvFile))
+
+        # Same contents in another file have the same digest
+        other = os.path.join(self.tmpDir, 'copy.csv')
+        shutil.copy(self.csvFile, other)
+        self.assertEqual(fileDigest(other), digest)
+
+        with open(other, 'a') as f:
+            f.write('\n')
+        t = time.time() + 10
+        os.utime(other, (t, t))
+        self.assertNotEqual(fileDigest(other), digest)
+
+        self.assertIsNone(fileDigest(os.path.join(self.tmpDir, 'no-such-file.csv')))
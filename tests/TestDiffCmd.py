@@ -1,9 +1,11 @@
 import os
 import shutil
+import numpy as np
 from unittest import TestCase
 
 from pygcam.query import readCsv, readQueryResult
-from pygcam.diff import computeDifference
+from pygcam.diff import computeDifference, diffScenarios, writeDiffsToCSV
+from pygcam.queryResult import QueryResult
 from pygcam.utils import QueryResultsDir, mkdirs
 
 class TestDiffCmd(TestCase):
@@ -51,5 +53,54 @@ class TestDiffCmd(TestCase):
         bools = abs(testDiff[yearCols]) > 1e-8
         self.assertFalse(bools.all().all())
 
+    def test_queryResultDifference(self):
+        batchDir = self.getFilename(self.baseline)
+        baseFile = os.path.join(batchDir, 'Purpose-grown_biomass_production-%s.csv' % self.baseline)
+        baseDF = self.readPurposeGrown(self.baseline)
+        cornDF = self.readPurposeGrown(self.policy)
+
+        expected = computeDifference(baseDF, cornDF, resetIndex=False)
+
+        base = QueryResult.read(baseFile, years=self.years)
+        corn = QueryResult.fromDataFrame(cornDF)
+        diff = computeDifference(base, corn)
+        self.assertIsInstance(diff, QueryResult)
+
+        computed = diff.toDataFrame().set_index(expected.index.names)
+        computed = computed.loc[expected.index, expected.columns]
+        self.assertTrue(np.allclose(computed.values, expected.values))
+
+    def test_diffScenarios(self):
+        workingDir = os.path.join(self.tmpDir, 'ws')
+        query = 'Purpose-grown_biomass_production'
+        other = 'Purpose-grown_biomass_copy'
+        queryDir = os.path.join(workingDir, '%s', QueryResultsDir)
+
+        for scenario in (self.baseline, self.policy):
+            shutil.copytree(self.getFilename(scenario), queryDir % scenario)
+            shutil.copy(os.path.join(queryDir % scenario, '%s-%s.csv' % (query, scenario)),
+                        os.path.join(queryDir % scenario, '%s-%s.csv' % (other, scenario)))
+
+        baseFile   = os.path.join(queryDir % self.baseline, '%s-%s.csv' % (query, self.baseline))
+        policyFile = os.path.join(queryDir % self.policy,   '%s-%s.csv' % (query, self.policy))
+
+        expectedFile = os.path.join(self.tmpDir, 'expected.csv')
+        writeDiffsToCSV(expectedFile, baseFile, [policyFile], years=self.years)
+        with open(expectedFile) as f:
+            expected = f.read()
+
+        for jobs in (1, 2):
+            outFiles = diffScenarios(self.baseline, [self.policy], [query, other],
+                                     workingDir=workingDir, years=self.years, jobs=jobs)
+            self.assertEqual(len(outFiles), 2)
+            with open(outFiles[0]) as f:
+                self.assertEqual(f.read(), expected)
 
+            # the copy differs only in the file names in the first line
+            with open(outFiles[1]) as f:
+                self.assertEqual(f.read().split('\n', 1)[1], expected.split('\n', 1)[1])
 
+        # duplicates are computed once
+        outFiles = diffScenarios(self.baseline, [self.policy, self.policy], [query, query],
+                                 workingDir=workingDir, years=self.years)
+        self.assertEqual(len(outFiles), 1)
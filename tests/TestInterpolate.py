@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from pygcam.query import interpolateYears, interpolateMatrix, limitYears, readCsv
+
+def loopInterpolateYears(df, startYear=0):
+    '''
+    The original column-at-a-time implementation of interpolateYears, used as
+    the reference for testing and benchmarking the vectorized version.
+    '''
+    df = df.copy()
+    yearCols = filter(str.isdigit, df.columns)
+    years = map(int, yearCols)
+
+    for i in range(0, len(years)-1):
+        start = years[i]
+        end   = years[i+1]
+        timestep = end - start
+
+        if timestep == 1:
+            continue
+
+        delta = (df[str(end)] - df[str(start)])/timestep
+
+        for j in range(1, timestep):
+            nextYear = start + j
+            df[str(nextYear)] = df[str(nextYear-1)] + (0 if nextYear < startYear else delta)
+
+    years = sorted(map(int, filter(str.isdigit, df.columns)))
+    yearCols = map(str, years)
+    nonYearCols = [col for col in df.columns if col not in yearCols]
+    return df[nonYearCols + yearCols]
+
+class TestInterpolate(unittest.TestCase):
+    def setUp(self):
+        self.csvFile = './data/ws/base-0/queryResults/Purpose-grown_biomass_production-base-0.csv'
+
+        # non-uniform time-steps, including an annual step
+        years = [1975, 1990, 2005, 2010, 2011, 2015, 2020, 2050]
+        data = {str(y): np.arange(4, dtype=float) * (i + 1) ** 2 for i, y in enumerate(years)}
+        data['region'] = ['A', 'B', 'C', 'D']
+        data['Units'] = 'EJ'
+        self.df = pd.DataFrame(data, columns=['region'] + map(str, years) + ['Units'])
+
+    def assertSameResult(self, df, startYear=0):
+        expected = loopInterpolateYears(df, startYear=startYear)
+        result = interpolateYears(df, startYear=startYear)
+
+        self.assertEqual(list(result.columns), list(expected.columns))
+        self.assertTrue(np.allclose(result[expected.columns[2:]].values.astype(float),
+                                    expected[expected.columns[2:]].values.astype(float)))
+
+    def test_nonUniform(self):
+        self.assertSameResult(self.df)
+
+    def test_startYear(self):
+        for startYear in (1980, 2005, 2012, 2030):
+            self.assertSameResult(self.df, startYear=startYear)
+
+    def test_queryResult(self):
+        df = readCsv(self.csvFile)
+        limitYears(df, (2010, 2050))
+        result = interpolateYears(df)
+        expected = loopInterpolateYears(df)
+        yearCols = [str(y) for y in range(2020, 2051)]
+        self.assertTrue(np.allclose(result[yearCols].values, expected[yearCols].values))
+
+    def test_matrix(self):
+        years, values = interpolateMatrix([[0.0, 10.0, 20.0]], [2010, 2015, 2025])
+        self.assertEqual(list(years), range(2010, 2026))
+        self.assertTrue(np.allclose(values[0], [0, 2, 4, 6, 8, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,10 @@
 import unittest
 import os
 import subprocess
-from pygcam.landProtection import _makeLandClassXpath, _makeRegionXpath, protectLand, runProtectionScenario
+import shutil
+from lxml import etree as ET
+from pygcam.landProtection import (_makeLandClassXpath, _makeRegionXpath, protectLand, runProtectionScenario,
+                                   unProtectLand, LandIndex, parseLandProtectionFile, streamRegions)
 from pygcam.windows import IsWindows
 
 class TestLandProtection(unittest.TestCase):
@@ -54,6 +57,76 @@ class TestLandProtection(unittest.TestCase):
             protectLand(infile, outfile, protectedFraction, landClasses=classes, regions=regions)
             self.assertFilesEqual(outfile, testfile)
 
+    def test_streaming(self):
+        xmlDir = os.path.join('data', 'xml')
+        tmpDir = '/tmp/testLandProtection'
+        shutil.rmtree(tmpDir, ignore_errors=True)
+        os.makedirs(tmpDir)
+
+        landProtection = parseLandProtectionFile(os.path.join(xmlDir, 'protection.xml'))
+
+        for num in (2, 3):
+            infile = os.path.join(xmlDir, 'partial_land_input_%d.xml' % num)
+
+            for streaming in (False, True):
+                outfile = os.path.join(tmpDir, 'out-%s.xml' % streaming)
+                landProtection.protectLand(infile, outfile, 'test', backup=False,
+                                           unprotectFirst=True, streaming=streaming)
+
+            # Output is identical, and in-place editing reads the file before replacing it
+            inPlace = os.path.join(tmpDir, 'inPlace.xml')
+            shutil.copy(infile, inPlace)
+            landProtection.protectLand(inPlace, inPlace, 'test', backup=False,
+                                       unprotectFirst=True, streaming=True)
+
+            with open(os.path.join(tmpDir, 'out-False.xml'), 'rb') as f:
+                expected = f.read()
+
+            for name in ('out-True.xml', 'inPlace.xml'):
+                with open(os.path.join(tmpDir, name), 'rb') as f:
+                    self.assertEqual(f.read(), expected)
+
+        shutil.rmtree(tmpDir, ignore_errors=True)
+
+    def test_streamingFailure(self):
+        tmpDir = '/tmp/testLandProtection'
+        shutil.rmtree(tmpDir, ignore_errors=True)
+        os.makedirs(tmpDir)
+
+        def fail(region):
+            raise ValueError("deliberate failure")
+
+        outfile = os.path.join(tmpDir, 'out.xml')
+        self.assertRaises(ValueError, streamRegions,
+                          os.path.join('data', 'xml', 'partial_land_input_2.xml'), outfile, fail)
+        self.assertEqual(os.listdir(tmpDir), [])
+
+        shutil.rmtree(tmpDir, ignore_errors=True)
+
+    def test_unProtectLand(self):
+        xmlDir = os.path.join('data', 'xml')
+        parser = ET.XMLParser(remove_blank_text=True)
+
+        for num in (2, 3):
+            tree = ET.parse(os.path.join(xmlDir, 'test_scenario_land_input_%d.xml' % num), parser)
+            original = ET.parse(os.path.join(xmlDir, 'partial_land_input_%d.xml' % num), parser)
+
+            index = LandIndex(tree)
+            unProtectLand(tree, otherArable=True, index=index)
+            self.assertEqual(len(tree.xpath('//LandNode[starts-with(@name, "Protected")]')), 0)
+
+            for landRoot in index.landRoots():
+                self.assertEqual(landRoot.matchingLeaves(['Protected'], protected=False), [])
+
+            # Unprotected areas are restored to their original values
+            xpath = '//UnmanagedLandLeaf//allocation|//UnmanagedLandLeaf//landAllocation'
+            restored = [float(elt.text) for elt in tree.xpath(xpath)]
+            expected = [float(elt.text) for elt in original.xpath(xpath)]
+            self.assertEqual(len(restored), len(expected))
+
+            for value, expectedValue in zip(restored, expected):
+                self.assertAlmostEqual(value, expectedValue, places=6)
+
     def test_protection_scenario(self):
         scenarioName = 'test'
         xmlDir = os.path.join('data', 'xml')
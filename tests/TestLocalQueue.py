@@ -0,0 +1,68 @@
+import os
+import shutil
+from unittest import TestCase
+
+from pygcam.localQueue import LocalQueue, QUEUED, SUCCEEDED, FAILED, SKIPPED
+
+class TestLocalQueue(TestCase):
+    def setUp(self):
+        self.tmpDir = '/tmp/testLocalQueue'
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+        self.logFile = os.path.join(self.tmpDir, 'log', 'job-%j.out')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def submit(self, queue, command, dependsOn=None):
+        return queue.submit(command, logFile=self.logFile, dependsOn=dependsOn, startRunner=False)
+
+    def test_dependencies(self):
+        queue = LocalQueue(os.path.join(self.tmpDir, 'queue'))
+
+        base   = self.submit(queue, 'sleep 0.2; echo base')
+        policy = self.submit(queue, 'echo policy $LOCAL_JOB_ID', dependsOn=base)
+        bad    = self.submit(queue, 'exit 3')
+        after  = self.submit(queue, 'echo after', dependsOn=bad)
+        later  = self.submit(queue, 'echo later', dependsOn=[after])
+        self.assertEqual([base, policy, bad, after, later], [1, 2, 3, 4, 5])
+
+        queue.run(2, pollInterval=0.05)
+        self.assertFalse(queue.runnerActive())
+
+        # a new instance reads the state saved by the runner
+        jobs = {job['id'] : job for job in LocalQueue(queue.queueDir).jobs()}
+        self.assertEqual([jobs[i]['state'] for i in range(1, 6)],
+                         [SUCCEEDED, SUCCEEDED, FAILED, SKIPPED, SKIPPED])
+        self.assertEqual(jobs[bad]['exitStatus'], 3)
+        self.assertTrue(jobs[policy]['started'] >= jobs[base]['finished'])
+
+        with open(os.path.join(self.tmpDir, 'log', 'job-2.out')) as f:
+            self.assertEqual(f.read(), 'policy 2\n')
+
+        self.assertFalse(os.path.exists(os.path.join(self.tmpDir, 'log', 'job-4.out')))
+
+        self.assertEqual(queue.clean(), 5)
+        self.assertEqual(queue.jobs(), [])
+        self.assertEqual(self.submit(queue, 'true'), 6)
+
+    def test_runnerLock(self):
+        import stat
+
+        queue = LocalQueue(os.path.join(self.tmpDir, 'queue'))
+        self.submit(queue, 'true')
+
+        self.assertEqual(stat.S_IMODE(os.stat(queue.queueDir).st_mode), 0o700)
+        self.assertEqual(stat.S_IMODE(os.stat(queue._jobPath(1)).st_mode), 0o600)
+
+        # a runner that died leaves no lock behind
+        self.assertFalse(queue.runnerActive())
+
+        lockFile = queue._takeRunnerLock()
+        try:
+            self.assertTrue(queue.runnerActive())
+            queue.run(1, pollInterval=0.05)      # returns at once, since a runner is "active"
+            self.assertEqual(queue.jobs()[0]['state'], QUEUED)
+        finally:
+            lockFile.close()
+
+        self.assertFalse(queue.runnerActive())
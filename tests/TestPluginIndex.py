@@ -0,0 +1,70 @@
+import os
+import shutil
+import time
+from unittest import TestCase
+
+from pygcam.built_ins import BuiltinSubcommands
+from pygcam.pluginIndex import PluginIndex
+from pygcam.subcommand import SubcommandABC
+
+PluginText = '''
+from pygcam.subcommand import SubcommandABC
+
+class HelloCommand(SubcommandABC):
+    def __init__(self, subparsers):
+        super(HelloCommand, self).__init__('hello', subparsers, {'help' : 'Say hello'})
+
+    def addArgs(self, parser):
+        return parser
+
+    def run(self, args, tool):
+        pass
+
+PluginClass = HelloCommand
+'''
+
+class TestPluginIndex(TestCase):
+    def setUp(self):
+        self.tmpDir = '/tmp/testPluginIndex'
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+        self.pluginDir = os.path.join(self.tmpDir, 'plugins')
+        os.makedirs(self.pluginDir)
+        with open(os.path.join(self.pluginDir, 'hello_plugin.py'), 'w') as f:
+            f.write(PluginText)
+
+        self.indexFile = os.path.join(self.tmpDir, 'index.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def index(self):
+        index = PluginIndex(self.indexFile)
+        entries = index.plugins(self.pluginDir)
+        index.save()
+        return index, entries
+
+    def test_plugins(self):
+        index, entries = self.index()
+        self.assertEqual(list(entries.keys()), ['hello'])
+        self.assertEqual(entries['hello']['help'], 'Say hello')
+        self.assertEqual(index.modules.keys(), [entries['hello']['path']])
+        self.assertTrue(SubcommandABC.getInstance('hello') is None)    # no instance left behind
+
+        index, entries = self.index()
+        self.assertEqual(index.modules, {})     # read from the index file without loading the plugin
+        self.assertEqual(index.pluginClass(entries['hello']).__name__, 'HelloCommand')
+
+        # adding a plugin changes the directory's modification time
+        time.sleep(0.01)
+        with open(os.path.join(self.pluginDir, 'goodbye_plugin.py'), 'w') as f:
+            f.write(PluginText.replace("'hello'", "'goodbye'"))
+
+        index, entries = self.index()
+        self.assertEqual(sorted(entries.keys()), ['goodbye', 'hello'])
+
+    def test_builtins(self):
+        entries = PluginIndex('').builtins('pygcam.built_ins', BuiltinSubcommands)
+        self.assertEqual(len(entries), len(BuiltinSubcommands))
+        self.assertEqual(entries['run']['module'], 'pygcam.built_ins.run_plugin')
+        self.assertTrue(entries['xmlstore']['help'])
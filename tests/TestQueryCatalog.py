@@ -0,0 +1,85 @@
+import os
+import shutil
+import time
+from glob import glob
+from unittest import TestCase
+
+from pygcam.config import setParam
+from pygcam.queryFile import QueryCatalog
+from pygcam.utils import mkdirs
+
+QueriesXML = '''<?xml version="1.0"?>
+<queries>
+  <queryGroup name="Group 1">
+    <supplyDemandQuery title="Land Allocation">
+      <axis1 name="LandLeaf">LandLeaf</axis1>
+    </supplyDemandQuery>
+    <supplyDemandQuery title="primary energy consumption">
+      <axis1 name="fuel">input</axis1>
+    </supplyDemandQuery>
+  </queryGroup>
+  <queryGroup name="Group 2">
+    <supplyDemandQuery title="Land Allocation">
+      <axis1 name="duplicate">ignored</axis1>
+    </supplyDemandQuery>
+  </queryGroup>
+</queries>
+'''
+
+class TestQueryCatalog(TestCase):
+    def setUp(self):
+        self.tmpDir = '/tmp/testQueryCatalog'
+        self.catalogDir = os.path.join(self.tmpDir, 'catalog')
+        self.removeTmpDir()
+        mkdirs(self.tmpDir)
+
+        self.queryFile = os.path.join(self.tmpDir, 'Main_queries.xml')
+        with open(self.queryFile, 'w') as f:
+            f.write(QueriesXML)
+
+        setParam('GCAM.QueryCatalogDir', self.catalogDir)
+        QueryCatalog.cache.clear()
+
+    def tearDown(self):
+        self.removeTmpDir()
+
+    def removeTmpDir(self):
+        try:
+            shutil.rmtree(self.tmpDir)
+        except:
+            pass
+
+    def test_findQuery(self):
+        catalog = QueryCatalog.getCatalog(self.queryFile)
+
+        elt = catalog.findQuery('Land_Allocation')
+        self.assertEqual(elt.get('title'), 'Land Allocation')
+        self.assertEqual(elt.find('axis1').get('name'), 'LandLeaf')   # first one wins
+
+        self.assertIsNotNone(catalog.findQuery('primary-energy_consumption'))
+        self.assertIsNone(catalog.findQuery('no such query'))
+
+        # callers may modify the element without affecting the catalog
+        elt.append(elt.makeelement('labelRewriteList'))
+        self.assertIsNone(catalog.findQuery('Land Allocation').find('labelRewriteList'))
+
+    def test_persistence(self):
+        QueryCatalog.getCatalog(self.queryFile)
+        self.assertEqual(len(glob(os.path.join(self.catalogDir, '*.pkl'))), 1)
+
+        QueryCatalog.cache.clear()
+        catalog = QueryCatalog.getCatalog(self.queryFile)
+        self.assertEqual(sorted(catalog.titles()), ['Land Allocation', 'primary energy consumption'])
+
+    def test_modifiedFile(self):
+        catalog = QueryCatalog.getCatalog(self.queryFile)
+        self.assertIs(QueryCatalog.getCatalog(self.queryFile), catalog)
+
+        with open(self.queryFile, 'w') as f:
+            f.write(QueriesXML.replace('primary energy consumption', 'CO2 emissions'))
+        t = time.time() + 10
+        os.utime(self.queryFile, (t, t))
+
+        catalog = QueryCatalog.getCatalog(self.queryFile)
+        self.assertIsNotNone(catalog.findQuery('CO2 emissions'))
+        self.assertIsNone(catalog.findQuery('primary energy consumption'))
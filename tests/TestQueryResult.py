@@ -0,0 +1,76 @@
+import numpy as np
+from unittest import TestCase
+
+from pygcam.query import readCsv, interpolateYears
+from pygcam.queryResult import QueryResult, parseConstraint
+
+class TestQueryResult(TestCase):
+    def setUp(self):
+        self.csvFile = './data/ws/base-0/queryResults/Purpose-grown_biomass_production-base-0.csv'
+        self.df = readCsv(self.csvFile)
+        self.result = QueryResult.fromDataFrame(self.df)
+
+    def test_roundTrip(self):
+        df = self.result.toDataFrame()
+        self.assertEqual(list(df.columns), list(self.df.columns))
+        yearCols = [col for col in df.columns if col.isdigit()]
+        self.assertTrue(np.allclose(df[yearCols].values, self.df[yearCols].values))
+        self.assertEqual(list(df.region), list(self.df.region))
+
+    def test_select(self):
+        region = self.df.region.iloc[-1]
+        selected = self.result.select(region=region)
+        expected = self.df.query('region == "%s"' % region)
+
+        self.assertEqual(len(selected), expected.shape[0])
+        self.assertTrue(np.allclose(selected.column('2050'), expected['2050']))
+
+        others = self.result.select([('region', '!=', region)])
+        self.assertEqual(len(others) + len(selected), len(self.result))
+
+        self.assertEqual(len(self.result.select(region='no such region')), 0)
+
+    def test_groups(self):
+        df = self.df.iloc[::-1]     # not ordered by region
+        result = QueryResult.fromDataFrame(df)
+
+        count = 0
+        for region, group in result.groups('region'):
+            expected = df[df.region == region]
+            self.assertEqual(list(group.column('output')), list(expected.output))
+            count += len(group)
+
+        self.assertEqual(count, len(result))
+
+    def test_sliceIsView(self):
+        view = self.result[1:3]
+        view.values[0, 0] = -1.0
+        self.assertEqual(self.result.values[1, 0], -1.0)
+
+    def test_interpolate(self):
+        result = QueryResult.read(self.csvFile, interpolate=True, startYear=2020)
+        expected = interpolateYears(self.df, startYear=2020)
+
+        df = result.toDataFrame()
+        self.assertEqual(list(df.columns), list(expected.columns))
+        yearCols = [str(y) for y in range(2020, 2051)]
+        self.assertTrue(np.allclose(df[yearCols].values, expected[yearCols].values.astype(float)))
+
+    def test_read(self):
+        result = QueryResult.read(self.csvFile, years=[2020, 2050])
+        expected = readCsv(self.csvFile, years=[2020, 2050])
+
+        self.assertEqual(result.columns, list(expected.columns))
+        self.assertEqual(list(result.years), list(range(2020, 2051, 5)))
+        self.assertTrue(all([cat.dtype.name == 'category' for cat in result.dims.values()]))
+
+        df = result.toDataFrame()
+        self.assertEqual(list(df.region), list(expected.region))
+        self.assertTrue(np.allclose(df['2050'].values, expected['2050'].values))
+
+    def test_parseConstraint(self):
+        self.assertEqual(parseConstraint("""region == 'USA' and sector != "biomass" """),
+                         [('region', '==', 'USA'), ('sector', '!=', 'biomass')])
+        self.assertIsNone(parseConstraint("region in ['USA', 'China']"))
+        self.assertIsNone(parseConstraint("region == 'USA' or region == 'China'"))
+        self.assertIsNone(parseConstraint("sector == 'oil and gas'"))
@@ -0,0 +1,86 @@
+import os
+import shutil
+import time
+from argparse import Namespace
+from unittest import TestCase
+
+from pygcam.config import getParam, setParam
+from pygcam.utils import mkdirs
+from pygcam.xmlEditor import XMLEditor, SETUP_MANIFEST
+
+class TestSetupManifest(TestCase):
+    def setUp(self):
+        self.tmpDir = '/tmp/testSetupManifest'
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+        self.srcDir = os.path.join(self.tmpDir, 'xmlsrc')
+        self.srcFile = os.path.join(self.srcDir, 'base', 'xml', 'protection.xml')
+        mkdirs(os.path.dirname(self.srcFile))
+        shutil.copy('./data/xml/protection.xml', self.srcFile)
+
+        self.refConfig = getParam('GCAM.RefConfigFile')
+        setParam('GCAM.RefConfigFile', os.path.abspath('./data/xml/configuration_ref.xml'))
+
+    def tearDown(self):
+        setParam('GCAM.RefConfigFile', self.refConfig)
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def setup(self, **kwargs):
+        """
+        Run static setup for the scenario "base", returning True if setup was performed.
+        """
+        editor = XMLEditor('base', None, os.path.join(self.tmpDir, 'ws'), self.srcDir,
+                           os.path.join(self.tmpDir, 'ref'), '', '', 'base')
+
+        args = Namespace(dynamicOnly=False, staticOnly=True, stopPeriod=None, force=False, forceCreate=False)
+        vars(args).update(kwargs)
+
+        path = editor.cfgPath()
+        before = os.path.getmtime(path) if os.path.exists(path) else None
+        time.sleep(0.01)
+
+        editor.setup(args)
+        self.assertTrue(os.path.exists(os.path.join(editor.scenario_dir_abs, SETUP_MANIFEST)))
+        return os.path.getmtime(path) != before
+
+    def test_incremental(self):
+        self.assertTrue(self.setup())
+        self.assertFalse(self.setup())                  # nothing changed
+        self.assertTrue(self.setup(stopPeriod=5))       # argument changed
+        self.assertTrue(self.setup(stopPeriod=5, force=True))
+
+        os.utime(self.srcFile, None)                    # same content
+        self.assertFalse(self.setup(stopPeriod=5))
+
+        with open(self.srcFile, 'a') as f:              # new content
+            f.write('\n')
+        self.assertTrue(self.setup(stopPeriod=5))
+
+        os.remove(os.path.join(self.tmpDir, 'ws', 'local-xml', 'base', 'protection.xml'))
+        self.assertTrue(self.setup(stopPeriod=5))       # output was deleted
+
+    def test_scenarioDigest(self):
+        from lxml import etree as ET
+        from pygcam.xmlSetup import ScenarioSetup
+
+        xml = '''<setup>
+          <iterator name="tax" type="list" values="10,20"/>
+          <scenarioGroup name="g">
+            <scenario name="base" baseline="1"/>
+            <scenario name="tax-{tax}" iterator="tax">
+              <add name="policy"%s>{tax}.xml</add>
+            </scenario>
+          </scenarioGroup>
+        </setup>'''
+
+        def digests(dynamic=''):
+            group = ScenarioSetup(ET.fromstring(xml % dynamic)).groupDict['g']
+            return [group.getFinalScenario(name).digest() for name in ('base', 'tax-10', 'tax-20')]
+
+        static = digests()
+        self.assertEqual(static, digests())
+        self.assertEqual(len(set(static)), 3)     # iterator values distinguish the policies
+
+        dynamic = digests(' dynamic="1"')
+        self.assertEqual(static[0], dynamic[0])
+        self.assertNotEqual(static[1:], dynamic[1:])
@@ -0,0 +1,46 @@
+import os
+import shutil
+from unittest import TestCase
+
+from pygcam.error import ProgramExecutionError
+from pygcam.project import Step
+from pygcam.stepProfile import StepProfiler
+
+class TestStepProfile(TestCase):
+    def setUp(self):
+        self.tmpDir = '/tmp/testStepProfile'
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def test_measure(self):
+        profiler = StepProfiler()
+
+        with profiler.measure('base', 'burn', 'python'):
+            Step.runCommand('python -c "sum(range(2000000))"', None)
+
+        with self.assertRaises(ProgramExecutionError):
+            with profiler.measure('base', 'fail', 'exit 3'):
+                Step.runCommand('exit 3', None)
+
+        burn, fail = profiler.records
+        self.assertEqual((burn['step'], burn['exitStatus']), ('burn', 0))
+        self.assertEqual((fail['step'], fail['exitStatus']), ('fail', 3))
+        self.assertTrue(burn['seconds'] > 0)
+        self.assertTrue(burn['childCpuSeconds'] > 0)
+        self.assertTrue(burn['peakRssMB'] > 0)
+
+        filename = os.path.join(self.tmpDir, 'profile.json')
+        profiler.writeJSON(filename)
+
+        merged = StepProfiler()
+        merged.load(filename)
+        merged.load(filename)
+        self.assertEqual(len(merged.records), 4)
+        self.assertEqual(merged.records[1]['exitStatus'], 3)
+
+        lines = merged.summary().split('\n')
+        self.assertEqual(len(lines), 8)     # headings, 2 rules, 4 steps, total
+        self.assertTrue(lines[2].startswith('base'))
+        self.assertTrue(lines[-1].startswith('Total'))
@@ -0,0 +1,73 @@
+import os
+import shutil
+import time
+from unittest import TestCase
+
+from lxml import etree as ET
+
+from pygcam.project import Step
+
+class Scenario(object):
+    name = 'base'
+
+class TestStepUpToDate(TestCase):
+    def setUp(self):
+        self.tmpDir = '/tmp/testStepUpToDate'
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+        os.makedirs(self.tmpDir)
+        self.argDict = {'scenarioDir' : self.tmpDir}
+
+        self.input = os.path.join(self.tmpDir, 'input.txt')
+        self.write(self.input, 'a')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def write(self, path, text):
+        time.sleep(0.01)    # ensure a new modification time
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def step(self, check):
+        xml = '''<step name="copy" inputs="{scenarioDir}/*.txt" outputs="{scenarioDir}/out/"
+                  check="%s">cp {scenarioDir}/input.txt {scenarioDir}/out/copy</step>''' % check
+        step = Step(ET.fromstring(xml))
+        os.makedirs(os.path.join(self.tmpDir, 'out'))
+        return step
+
+    def runStep(self, step, force=False):
+        """
+        Run the step, returning True if it wasn't skipped.
+        """
+        class Project(object):
+            profiler = None
+
+        output = os.path.join(self.tmpDir, 'out', 'copy')
+        before = os.path.getmtime(output) if os.path.exists(output) else None
+        step.run(Project(), 'base', Scenario(), self.argDict, None, force=force)
+        return os.path.getmtime(output) != before
+
+    def test_mtime(self):
+        step = self.step('mtime')
+        self.assertTrue(self.runStep(step))
+        self.assertFalse(self.runStep(step))
+        self.assertTrue(self.runStep(step, force=True))
+
+        time.sleep(0.01)
+        os.utime(self.input, None)      # newer, though unchanged
+        self.assertTrue(self.runStep(step))
+
+    def test_hash(self):
+        step = self.step('hash')
+        self.assertTrue(self.runStep(step))
+        self.assertFalse(self.runStep(step))
+
+        self.write(self.input, 'a')     # newer, but unchanged
+        self.assertFalse(self.runStep(step))
+
+        self.write(self.input, 'b')
+        self.assertTrue(self.runStep(step))
+        self.assertFalse(self.runStep(step))
+
+        self.write(os.path.join(self.tmpDir, 'other.txt'), 'c')     # a new input
+        self.assertTrue(self.runStep(step))
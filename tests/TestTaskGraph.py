@@ -0,0 +1,131 @@
+import os
+import shutil
+import sys
+import time
+from argparse import Namespace
+from unittest import TestCase
+
+from pygcam.error import PygcamException, SetupException
+from pygcam.project import _runScenario
+from pygcam.scenarioSetup import scenarioDependencies
+import pygcam.taskGraph
+from pygcam.taskGraph import TaskGraph, SUCCEEDED, FAILED, SKIPPED
+from pygcam.utils import mkdirs
+
+ScenariosXml = '''<scenarios defaultGroup="group1">
+  <scenarioGroup name="group1">
+    <scenario name="base" baseline="1"/>
+    <scenario name="tax-10"/>
+    <scenario name="tax-20"/>
+    <scenario name="tax-30" active="0"/>
+  </scenarioGroup>
+</scenarios>
+'''
+
+def _stamp(name, seconds=0):
+    time.sleep(seconds)
+    return name, time.time()
+
+def _fail():
+    raise PygcamException("deliberate failure")
+
+def _exit():
+    sys.exit(2)
+
+def _die():
+    os._exit(9)         # as if killed, e.g., for using too much memory
+
+def _unpicklable():
+    return lambda: None
+
+class TestTaskGraph(TestCase):
+    def test_order(self):
+        graph = TaskGraph()
+        graph.addTask('policy1', _stamp, args=('policy1',), dependsOn=['base'])
+        graph.addTask('policy2', _stamp, args=('policy2',), dependsOn=['base'])
+        graph.addTask('base', _stamp, args=('base', 0.2))
+
+        for jobs, processes in ((1, True), (2, True), (2, False)):
+            results = graph.run(jobs=jobs, processes=processes)
+            self.assertEqual(list(results.keys()), ['policy1', 'policy2', 'base'])
+            self.assertTrue(all([result.status == SUCCEEDED for result in results.values()]))
+
+            baseTime = results['base'].value[1]
+            self.assertTrue(results['policy1'].value[1] >= baseTime)
+            self.assertTrue(results['policy2'].value[1] >= baseTime)
+
+    def test_failure(self):
+        graph = TaskGraph()
+        graph.addTask('base', _fail)
+        graph.addTask('policy', _stamp, args=('policy',), dependsOn=['base'])
+        graph.addTask('other', _stamp, args=('other',))
+
+        results = graph.run(jobs=2)
+        self.assertEqual(results['base'].status, FAILED)
+        self.assertTrue('deliberate failure' in results['base'].error)
+        self.assertEqual(results['policy'].status, SKIPPED)
+        self.assertEqual(results['other'].status, SUCCEEDED)
+
+    def test_lostResults(self):
+        graph = TaskGraph()
+        graph.addTask('exit', _exit)
+        graph.addTask('die', _die)
+        graph.addTask('unpicklable', _unpicklable)
+        graph.addTask('policy', _stamp, args=('policy',), dependsOn=['die'])
+        graph.addTask('other', _stamp, args=('other',))
+
+        saved = pygcam.taskGraph.LostWorkerGrace
+        pygcam.taskGraph.LostWorkerGrace = 0.5
+        try:
+            results = graph.run(jobs=2)
+        finally:
+            pygcam.taskGraph.LostWorkerGrace = saved
+
+        self.assertEqual([result.status for result in results.values()],
+                         [FAILED, FAILED, FAILED, SKIPPED, SUCCEEDED])
+        self.assertTrue('SystemExit' in results['exit'].error)
+        self.assertTrue('exited unexpectedly' in results['die'].error)
+
+    def test_errors(self):
+        graph = TaskGraph()
+        graph.addTask('a', _stamp, args=('a',), dependsOn=['b'])
+        self.assertRaises(PygcamException, graph.run)           # undefined dependency
+        self.assertRaises(PygcamException, graph.addTask, 'a', _stamp)
+
+        graph.addTask('b', _stamp, args=('b',), dependsOn=['a'])
+        self.assertRaises(PygcamException, graph.run)           # circular dependency
+
+    def test_scenarioDependencies(self):
+        tmpDir = '/tmp/testTaskGraph'
+        mkdirs(tmpDir)
+        setupXml = os.path.join(tmpDir, 'scenarios.xml')
+        with open(setupXml, 'w') as f:
+            f.write(ScenariosXml)
+
+        try:
+            args = Namespace(setupXml=setupXml, group=None, baseline=None)
+            self.assertEqual(scenarioDependencies(args),
+                             [('base', None), ('tax-10', 'base'), ('tax-20', 'base')])
+            self.assertEqual(scenarioDependencies(args, ['tax-30']), [('tax-30', 'base')])
+            self.assertRaises(SetupException, scenarioDependencies, args, ['no-such-scenario'])
+        finally:
+            shutil.rmtree(tmpDir, ignore_errors=True)
+
+    def test_runScenario(self):
+        tmpDir = '/tmp/testTaskGraph'
+        graph = TaskGraph()
+        graph.addTask('base', _runScenario, args=(['sh', '-c', 'echo base'], os.path.join(tmpDir, 'base.log')))
+        graph.addTask('policy', _runScenario, args=(['false'], os.path.join(tmpDir, 'policy.log')),
+                      dependsOn=['base'])
+        started = []
+
+        try:
+            results = graph.run(jobs=2, processes=False, startCallback=started.append)
+            self.assertEqual(started, ['base', 'policy'])
+            self.assertEqual(results['base'].status, SUCCEEDED)
+            self.assertEqual(results['policy'].status, FAILED)
+
+            with open(os.path.join(tmpDir, 'base.log')) as f:
+                self.assertEqual(f.read(), 'base\n')
+        finally:
+            shutil.rmtree(tmpDir, ignore_errors=True)
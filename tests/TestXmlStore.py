@@ -0,0 +1,69 @@
+import os
+import shutil
+from unittest import TestCase
+
+from pygcam.config import setParam
+from pygcam.utils import mkdirs
+from pygcam.xmlEditor import CachedFile, xmlEdit, xmlSel
+from pygcam.xmlStore import XmlStore, unshareFile
+
+class TestXmlStore(TestCase):
+    def setUp(self):
+        self.tmpDir = '/tmp/testXmlStore'
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+        setParam('GCAM.XmlStoreDir', os.path.join(self.tmpDir, '.xmlStore'))
+        self.store = XmlStore.getInstance()
+
+        self.files = []
+        for scenario in ('base', 'policy'):
+            dirname = os.path.join(self.tmpDir, 'local-xml', scenario)
+            mkdirs(dirname)
+            filename = os.path.join(dirname, 'config.xml')
+            shutil.copy('./data/xml/configuration_ref.xml', filename)
+            self.files.append(filename)
+
+        CachedFile.cache.clear()
+
+    def tearDown(self):
+        CachedFile.cache.clear()
+        setParam('GCAM.XmlStoreDir', '')
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def test_addTree(self):
+        size = os.path.getsize(self.files[0])
+        self.assertEqual(self.store.addTree(os.path.dirname(self.files[0])), (1, 0))
+        self.assertEqual(self.store.addTree(os.path.dirname(self.files[1])), (1, size))
+        self.assertTrue(os.path.samefile(self.files[0], self.files[1]))
+
+        stats = self.store.stats()
+        self.assertEqual((stats['files'], stats['links']), (1, 2))
+
+        # copying a file with the same contents just adds a link
+        copy = os.path.join(self.tmpDir, 'copy.xml')
+        self.store.copyFile('./data/xml/configuration_ref.xml', copy)
+        self.assertTrue(os.path.samefile(copy, self.files[0]))
+
+    def test_unshare(self):
+        self.store.addTree(os.path.join(self.tmpDir, 'local-xml'))
+
+        # editing one scenario's file leaves the other's alone
+        xpath = "//Ints/Value[@name='stop-period']"
+        original = xmlSel(self.files[1], xpath, asText=True)
+        xmlEdit(self.files[0], [(xpath, -99)])
+        CachedFile.decacheAll()
+
+        self.assertFalse(os.path.samefile(self.files[0], self.files[1]))
+        self.assertEqual(xmlSel(self.files[1], xpath, asText=True), original)
+        self.assertFalse(unshareFile(self.files[0]))    # no longer shared
+
+    def test_gc(self):
+        self.store.addTree(os.path.join(self.tmpDir, 'local-xml'))
+        self.assertEqual(self.store.collectGarbage()[0], 0)
+
+        shutil.rmtree(os.path.join(self.tmpDir, 'local-xml'))
+        self.assertEqual(self.store.collectGarbage(dryRun=True)[0], 1)
+        self.assertEqual(self.store.stats()['files'], 1)
+
+        self.assertEqual(self.store.collectGarbage()[0], 1)
+        self.assertEqual(self.store.stats()['files'], 0)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+'''
+Benchmark the vectorized interpolateYears against the original
+column-at-a-time implementation on a frame shaped like a land
+allocation query by AEZ (32 regions x 18 AEZs x ~20 land types).
+
+Usage: python benchInterpolate.py [rows]
+'''
+from __future__ import print_function
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from pygcam.query import interpolateYears
+from TestInterpolate import loopInterpolateYears
+
+def makeFrame(rows):
+    years = [1975, 1990, 2005, 2010] + range(2015, 2101, 5)
+    data = {str(y): np.random.rand(rows) for y in years}
+    data['region'] = ['region%d' % (i % 32) for i in range(rows)]
+    data['land-allocation'] = ['land%d' % i for i in range(rows)]
+    data['Units'] = 'thous km2'
+    return pd.DataFrame(data, columns=['region', 'land-allocation'] + map(str, years) + ['Units'])
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 32 * 18 * 20
+    df = makeFrame(rows)
+    repeat = 5
+
+    for label, func in (('loop', loopInterpolateYears), ('vectorized', interpolateYears)):
+        secs = min(timeit.repeat(lambda: func(df, startYear=2010), number=1, repeat=repeat))
+        print("%-10s %8.4f sec (%d rows, best of %d)" % (label, secs, rows, repeat))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+'''
+Benchmark "gt" startup: the time to run a trivial sub-command in a new
+process when only its plugin is loaded (the default), when the plugin
+index must be rebuilt, and when all plugins are loaded, as gt did before
+plugins were loaded on demand.
+
+Usage: python benchStartup.py [repeat]
+'''
+from __future__ import print_function
+import os
+import subprocess
+import sys
+import time
+
+from pygcam.config import getConfig, getParam
+
+Lazy  = "from pygcam.tool import main; main(%r)"
+Eager = "from pygcam.config import getConfig; getConfig(); from pygcam.tool import GcamTool, main; " \
+        "GcamTool.getInstance().loadAllPlugins(); main(%r)"
+
+def elapsed(code, argv, before=None):
+    if before:
+        before()
+
+    start = time.time()
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call([sys.executable, '-c', code % argv], stdout=devnull, stderr=devnull)
+    return time.time() - start
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    argv = ['config', '-t']
+
+    getConfig()
+    indexFile = getParam('GCAM.PluginIndexFile')
+
+    def removeIndex():
+        if indexFile and os.path.exists(indexFile):
+            os.remove(indexFile)
+
+    elapsed(Lazy, argv)     # make sure the index exists
+
+    for label, code, before in (('lazy', Lazy, None),
+                                ('reindex', Lazy, removeIndex),
+                                ('eager', Eager, None)):
+        secs = min([elapsed(code, argv, before) for _ in range(repeat)])
+        print("%-8s %8.3f sec (gt %s, best of %d)" % (label, secs, ' '.join(argv), repeat))
+
+if __name__ == '__main__':
+    main()